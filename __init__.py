@@ -111,6 +111,7 @@ class ImportPapa(bpy.types.Operator, ImportHelper):
         from . import import_papa
 
         pref = context.preferences.addons[__name__].preferences
+        pref.applyTextureCacheSize()
 
         colours = self.__getColours(pref)
 
@@ -184,6 +185,13 @@ class PapaAddonPreferences(AddonPreferences):
     customColour1: FloatVectorProperty(name="Primary",min=0,max=1, subtype='COLOR', description="The primary custom colour.")
     customColour2: FloatVectorProperty(name="Secondary",min=0,max=1, subtype='COLOR', description="The secondary custom colour.")
 
+    def applyTextureCacheSize(self, context = None):
+        from .papafile import PapaTextureCache
+        PapaTextureCache.getInstance().setBudget(self.textureCacheSize * 1024 * 1024)
+
+    textureCacheSize: IntProperty(name="Texture Cache (MB)", description="Memory kept for decoded textures that several imported files"
+        + " link to, so they are only decoded once. 0 turns the cache off", default=128, min=0, update=applyTextureCacheSize)
+
 class PapaExportMaterialListItem(PropertyGroup):
     exportIndex: IntProperty()
 
@@ -306,7 +314,7 @@ class PapaExportMaterialList(bpy.types.UIList):
 
 class PapaExportProperties:
     def __init__(self, filepath:str, target:object, isCSG: bool, markSharp:bool, shader: str, materialList: list, compressData: bool,
-                        ignoreRoot:bool, ignoreHidden:bool,ignoreNoData:bool,merge:bool, singleMaterial:bool, signature:str):
+                        ignoreRoot:bool, ignoreHidden:bool,ignoreNoData:bool,merge:bool, singleMaterial:bool, signature:str, deduplicate:bool=False):
         self.__filepath = filepath
         self.__targetObject = target
         self.__isCSG = isCSG
@@ -322,6 +330,7 @@ class PapaExportProperties:
         self.__merge = merge
         self.__singleMaterial = singleMaterial
         self.__signature = signature
+        self.__deduplicate = deduplicate
 
     def getFilepath(self) -> str:
         return self.__filepath
@@ -362,6 +371,44 @@ class PapaExportProperties:
     def getSignature(self):
         return self.__signature
 
+    def isDeduplicate(self):
+        return self.__deduplicate
+
+class PapaTextureExportProperties:
+    def __init__(self, filepath:str, image:object, formatIndex:int, srgb:bool, mipmaps:bool, mipFilter:str, highQuality:bool, signature:str):
+        self.__filepath = filepath
+        self.__image = image
+        self.__formatIndex = formatIndex
+        self.__srgb = srgb
+        self.__mipmaps = mipmaps
+        self.__mipFilter = mipFilter
+        self.__highQuality = highQuality
+        self.__signature = signature
+
+    def getFilepath(self) -> str:
+        return self.__filepath
+
+    def getImage(self) -> object:
+        return self.__image
+
+    def getFormatIndex(self) -> int:
+        return self.__formatIndex
+
+    def isSRGB(self):
+        return self.__srgb
+
+    def isMipmaps(self):
+        return self.__mipmaps
+
+    def getMipFilter(self):
+        return self.__mipFilter
+
+    def isHighQuality(self):
+        return self.__highQuality
+
+    def getSignature(self):
+        return self.__signature
+
 class ExportPapaUISettings(PropertyGroup):
 
     def onUpdateCSG(self, context):
@@ -376,6 +423,8 @@ class ExportPapaUISettings(PropertyGroup):
     singleMaterial: BoolProperty(name="Single Material", description="Replaces all materials on the object with a default material", default=True)
     merge: BoolProperty(name="Multi-Mesh", description="Causes selected meshes with the same skeleton to be written to the"
         + " file as one model instead of many. Creates support for >32 bones", default=True)
+    deduplicate: BoolProperty(name="Merge Identical Data", description="Writes vertex buffers, index buffers and materials that are exactly"
+        + " the same only once, shared by every mesh that uses them", default=False)
     isCSG : BoolProperty(name="Export as CSG",description="Exports the selected mesh as a CSG instead of a unit. Cannot be used if multiple meshes are selected",
         update=onUpdateCSG)
 
@@ -452,6 +501,9 @@ class ExportPapa(bpy.types.Operator, ExportHelper):
         row = l.row()
         row.prop(properties,"merge") 
 
+        row = l.row()
+        row.prop(properties,"deduplicate")
+
         row = l.row()
         row.prop(properties,"isCSG")
         row.enabled = self.__isCSGCompatible
@@ -520,7 +572,8 @@ class ExportPapa(bpy.types.Operator, ExportHelper):
         shader = ExportPapaUISettings.shaderOptions[int(properties.CSGExportShader)-1][1] # get the shader by name. bit spaghetti
         prop = PapaExportProperties(self.properties.filepath, self.__objectsList, 
             properties.isCSG,properties.markSharp, shader, ExportPapa.materialList, properties.compress,
-            properties.ignoreRoot, properties.ignoreHidden, properties.ignoreNoData, properties.merge, properties.singleMaterial, properties.signature)
+            properties.ignoreRoot, properties.ignoreHidden, properties.ignoreNoData, properties.merge, properties.singleMaterial, properties.signature,
+            properties.deduplicate)
         return export_papa.write(self, context, prop)
     
     def invoke(self, context, event):
@@ -575,6 +628,84 @@ class ExportPapa(bpy.types.Operator, ExportHelper):
     def getInstance(cls):
         return ExportPapa.currentInstance
 
+class ExportPapaTexture(bpy.types.Operator, ExportHelper):
+    """Export the active image to a PAPA texture file (.papa)"""
+    bl_idname = "export_image.uberent_papa"
+    bl_label = "Export PAPA Texture"
+
+    filename_ext = ".papa"
+    filter_glob: StringProperty(default="*.papa", options={"HIDDEN"})
+
+    filepath: bpy.props.StringProperty(
+        name="File Path", 
+        description="File path used for exporting the PAPA file", 
+        maxlen=1024, default="")
+
+    formatOptions = [
+        ("6", "DXT5", "Compressed colour and alpha", "", 0),
+        ("4", "DXT1", "Compressed colour without alpha", "", 1),
+        ("1", "R8G8B8A8", "Uncompressed colour and alpha", "", 2),
+        ("13", "R8", "Uncompressed red channel only", "", 3),
+    ]
+
+    mipFilterOptions = [
+        ("box", "Box", "Averages the pixels of each level, fast", "", 0),
+        ("kaiser", "Kaiser", "Windowed sinc filter, keeps smaller levels sharper", "", 1),
+    ]
+
+    textureFormat: EnumProperty(name="Format", description="Texture format to write", items=formatOptions)
+    srgb: BoolProperty(name="sRGB", description="Marks the texture as sRGB colour. Turn off for masks, materials and normal maps", default=True)
+    mipmaps: BoolProperty(name="Generate Mipmaps", description="Writes the full mip chain down to 1x1", default=True)
+    mipFilter: EnumProperty(name="Mip Filter", description="Filter used to shrink each mip level", items=mipFilterOptions)
+    highQuality: BoolProperty(name="High Quality Compression", description="Slower DXT compression with less error."
+        + " Needs the texture library", default=False)
+    signature: StringProperty(name="Signature",description="A six letter or less string to embed into the file that for purposes of crediting",maxlen=6,subtype='BYTE_STRING')
+
+    @classmethod
+    def poll(cls, context):
+        return context.space_data and context.space_data.type == "IMAGE_EDITOR" and context.space_data.image
+
+    def draw(self, context):
+        l = self.layout
+
+        row = l.row()
+        row.prop(self,"textureFormat")
+
+        row = l.row()
+        row.prop(self,"srgb")
+
+        row = l.row()
+        row.prop(self,"mipmaps")
+
+        row = l.row()
+        row.prop(self,"mipFilter")
+        row.enabled = self.mipmaps
+
+        row = l.row()
+        row.prop(self,"highQuality")
+        row.enabled = self.textureFormat == "4" or self.textureFormat == "6"
+
+        row = l.row()
+        row.prop(self,"signature")
+
+    def execute(self, context):
+        from . import export_papa
+
+        prop = PapaTextureExportProperties(self.properties.filepath, context.space_data.image, int(self.textureFormat), self.srgb,
+            self.mipmaps, self.mipFilter, self.highQuality, self.signature)
+        return export_papa.writeTexture(self, context, prop)
+
+    def invoke(self, context, event):
+        image = context.space_data.image
+        self.srgb = image.colorspace_settings.name == "sRGB"
+        sourcePath = image.get(PapaExportMaterial.PAPAFILE_SOURCE_EXTENSION, None) # default to where an imported texture came from
+        if sourcePath:
+            self.filepath = sourcePath
+        else:
+            self.filepath = os.path.splitext(bpy.path.clean_name(image.name))[0] + self.filename_ext
+        context.window_manager.fileselect_add(self)
+        return {'RUNNING_MODAL'}
+
 class ExportPapaMenu(bpy.types.Menu):
     bl_idname = "PAPA_MT_UBERENT_PAPA"
     bl_label = "Export PAPA"
@@ -690,10 +821,14 @@ def menu_func_import(self, context):
 def menu_func_export(self, context):
     self.layout.menu(ExportPapaMenu.bl_idname, text="Planetary Annihilation  (.papa)")
 
+def menu_func_texture_export(self, context):
+    self.layout.operator(ExportPapaTexture.bl_idname, text="Export Planetary Annihilation Texture (.papa)")
+
 _classes = (
     ImportPapa,
     ExportPapa,
     ExportPapaMenu,
+    ExportPapaTexture,
     PapaExportMaterialListItem,
     ExportPapaUISettings,
     PapaExportMaterialList,
@@ -707,19 +842,27 @@ def register():
         register_class(cls)
     bpy.types.TOPBAR_MT_file_import.append(menu_func_import)
     bpy.types.TOPBAR_MT_file_export.append(menu_func_export)
-    # bpy.types.IMAGE_MT_image.append(menu_func_texture_export)
+    bpy.types.IMAGE_MT_image.append(menu_func_texture_export)
     # bpy.types.IMAGE_MT_image.append(menu_func_texture_import)
 
     bpy.types.Scene.SCENE_PAPA_MATERIALS_LIST = CollectionProperty(type = PapaExportMaterialListItem)
     bpy.types.Scene.SCENE_PAPA_MATERIALS_LIST_ACTIVE = IntProperty()
     bpy.types.Scene.SCENE_PAPA_EXPORT_SETTINGS = PointerProperty(type=ExportPapaUISettings)
+
+    addon = bpy.context.preferences.addons.get(__name__)
+    if addon != None:
+        addon.preferences.applyTextureCacheSize()
     
 def unregister():
     from bpy.utils import unregister_class
+    from .papafile import PapaTextureCache, PapaBufferPool
+    PapaTextureCache.getInstance().clear()
+    PapaBufferPool.getInstance().clear()
     for cls in reversed(_classes):
         unregister_class(cls)
     bpy.types.TOPBAR_MT_file_import.remove(menu_func_import)
     bpy.types.TOPBAR_MT_file_export.remove(menu_func_export)
+    bpy.types.IMAGE_MT_image.remove(menu_func_texture_export)
 
     del bpy.types.Scene.SCENE_PAPA_MATERIALS_LIST
     del bpy.types.Scene.SCENE_PAPA_MATERIALS_LIST_ACTIVE
@@ -27,6 +27,7 @@ from fractions import Fraction
 from mathutils import * # has vectors and quaternions
 from os import path
 from .papafile import *
+import numpy as np
 import time
 
 class PapaBuildException(Exception): # used as a filter
@@ -114,11 +115,7 @@ def write_papa(properties, context, operator):
         return 'ERROR', str(e)
     
     print("Writing Data...")
-    data = papaFile.compile()
-
-    file = open(filepath, 'wb')
-    file.write(data)
-    file.close()
+    papaFile.write(filepath, deduplicate=properties.isDeduplicate())
 
     for obj in bpy.context.selected_objects:
         obj.select_set(False)
@@ -463,7 +460,12 @@ def createPapaModelData(papaFile:PapaFile, mesh, shadingMap, materialMap, boneWe
     polygons = mesh.data.polygons
     vertices = mesh.data.vertices
 
-    vertexList = [] # the PapaVerticies to be compiled
+    # the vertex buffer to be compiled, one list per field of the vertex format
+    vertexColumns = {"position": [], "normal": [], "texcoord1": []}
+    if properties.isCSG():
+        vertexColumns.update(tangent=[], binormal=[], texcoord2=[])
+    elif papaSkeleton:
+        vertexColumns.update(weights=[], bones=[])
     vertexFaceMap = [] # maps each vertex on each face to it's position in the vertex buffer
     shadingBuckets = [] # each shading region gets a unique bucket (doesn't need to be a map because it's sequential)
 
@@ -527,13 +529,14 @@ def createPapaModelData(papaFile:PapaFile, mesh, shadingMap, materialMap, boneWe
                 binormal = vertexData[2][poly.index][idx]
                 texCoord1 = uvMap[0][poly.index][idx]
                 texCoord2 = uvMap[1][poly.index][idx]
-                v = PapaVertex(pos=loc,norm=normal,binorm=binormal,tan=tangent,texcoord1=texCoord1,texcoord2=texCoord2)
+                vertexColumns["tangent"].append(tangent)
+                vertexColumns["binormal"].append(binormal)
+                vertexColumns["texcoord2"].append(texCoord2)
             elif not papaSkeleton:
                 loc = Vector(vertices[idx].co)
                 normal = vertexData[0][poly.index][idx]
                 texCoord1 = uvMap[0][poly.index][idx]
                 texCoord2 = None # required for buckets
-                v = PapaVertex(pos=loc, norm=normal, texcoord1=texCoord1)
             else:
                 loc = Vector(vertices[idx].co)
                 weightList = [0] * 4
@@ -563,10 +566,13 @@ def createPapaModelData(papaFile:PapaFile, mesh, shadingMap, materialMap, boneWe
                 normal = vertexData[0][poly.index][idx]
                 texCoord1 = uvMap[0][poly.index][idx]
                 texCoord2 = None # required for buckets
-                v = PapaVertex(pos=loc, norm=normal, texcoord1=texCoord1, bones=boneList, weights=weightList)
-            vertexIndex = len(vertexList)
+                vertexColumns["weights"].append(weightList)
+                vertexColumns["bones"].append(boneList)
+            vertexIndex = len(vertexColumns["position"])
             vertexFaceMap[idx][poly.index] = vertexIndex
-            vertexList.append(v)
+            vertexColumns["position"].append(loc)
+            vertexColumns["normal"].append(normal)
+            vertexColumns["texcoord1"].append(texCoord1)
 
             # register in the bucket
             if not bucket.get(idx,False):
@@ -578,7 +584,12 @@ def createPapaModelData(papaFile:PapaFile, mesh, shadingMap, materialMap, boneWe
         vertexFormat = 5
     else:
         vertexFormat = 8
-    vBuffer = PapaVertexBuffer(vertexFormat,vertexList)
+    for name in ("texcoord1", "texcoord2"): # the UVs are flipped across the Y axis, the same as PapaVertex does
+        if name in vertexColumns:
+            texCoords = np.array(vertexColumns[name], dtype=np.float64).reshape(-1, 2)
+            texCoords[:,1] = 1 - texCoords[:,1]
+            vertexColumns[name] = texCoords
+    vBuffer = PapaVertexBuffer.fromColumns(vertexFormat, **vertexColumns)
     print(vBuffer)
 
 
@@ -1137,6 +1148,60 @@ def writeAnimation(armature, properties, papaFile: PapaFile):
     # set the mode back
     bpy.ops.object.mode_set(mode=lastMode)
 
+def getTextureName(filepath: str):
+    # textures are named by their path inside the game directory, or their file name when outside of it
+    filepath = filepath.replace("\\","/")
+    for directory in ("/pa/", "/pa_ex1/"):
+        idx = filepath.find(directory)
+        if idx != -1:
+            return "/pa/" + filepath[idx + len(directory):]
+    return path.basename(filepath)
+
+def write_texture(properties, context, operator):
+    filepath = properties.getFilepath()
+    image = properties.getImage()
+    print("Starting texture export of "+image.name)
+
+    width, height = image.size
+    channels = image.channels
+    if width == 0 or height == 0 or channels == 0:
+        return 'ERROR', "Image \""+image.name+"\" has no pixel data"
+    if width > 0xffff or height > 0xffff:
+        return 'ERROR', "Image \""+image.name+"\" is too large, textures may be at most 65535 pixels wide"
+
+    pixels = np.empty(width * height * channels, dtype=np.float32)
+    image.pixels.foreach_get(pixels) # bottom up, the same layout the importer creates images from
+    if channels != 4:
+        rgba = np.ones((width * height, 4), dtype=np.float32)
+        rgba[:,:min(channels, 3)] = pixels.reshape(-1, channels)[:,:3]
+        if channels == 1: # greyscale
+            rgba[:,1:3] = rgba[:,0:1]
+        pixels = rgba.ravel()
+
+    papaFile = PapaFile(signature=properties.getSignature())
+    nameIndex = papaFile.addString(PapaString(getTextureName(filepath)))
+    try:
+        texture = PapaTexture.fromImageData(nameIndex, properties.getFormatIndex(), properties.isSRGB(), width, height, pixels,
+            mipmaps=properties.isMipmaps(), mipFilter=properties.getMipFilter(), highQuality=properties.isHighQuality())
+    except (ReferenceError, ValueError) as e:
+        return 'ERROR', str(e)
+    papaFile.addTexture(texture)
+    print(texture)
+
+    print("Writing Data...")
+    papaFile.write(filepath)
+
+def writeTexture(operator,context,properties):
+    t = time.time()
+    result = write_texture(properties, context, operator)
+    t = time.time() - t
+    print("Done in "+str(int(t*1000)) + "ms")
+    if result:
+        operator.report({result[0]}, result[1])
+        return {'CANCELLED'}
+    operator.report({"INFO"},"Done in "+str(int(t*1000)) + "ms")
+    return {'FINISHED'}
+
 def write(operator,context,properties):
     t = time.time()
     result = write_papa(properties, context, operator)
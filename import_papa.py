@@ -31,12 +31,25 @@ from .papafile import *
 from . import PapaExportMaterial
 import time
 
+def importSections(info: PapaFileInfo) -> set:
+    # the sections load_papa uses, read from the header so that e.g. an animation only file skips every other table
+    sections = {"strings"}
+    if info.getCount("textures") > 0:
+        sections.add("textures")
+    if info.getCount("models") > 0: # models pull in their meshes, buffers, materials and skeleton
+        sections.update(("vertexBuffers", "indexBuffers", "materials", "meshes", "skeletons", "models"))
+    if info.getCount("animations") > 0:
+        sections.add("animations")
+    return sections
+
 def load_papa(properties, context):
     filepath = properties.getFilepath()
     file_name=path.splitext(path.basename(filepath))[0]
-    print("Starting import of "+file_name)
+    print("Starting import of "+file_name+" ("+PapaFile.getTextureDecoder()+" texture decoder)")
 
-    papaFile = PapaFile(filepath, verbose = True, readLinked = properties.isImportTextures()) # parse the file
+    sections = importSections(PapaFile.peek(filepath))
+    papaFile = PapaFile(filepath, verbose = True, readLinked = properties.isImportTextures(), sections = sections,
+        pixelFormat = "byte") # parse the file
 
     bpy.context.view_layer.objects.active = None  # if something is selected in blender then deselect it
     textureMap = {} # maps a string name to the texture that was made
@@ -49,6 +62,7 @@ def load_papa(properties, context):
                 continue # some textures may be omitted by the importer as to keep indices correct
             name = papaFile.getString(texture.getNameIndex())
             createImageFromData(name, texture.getImageData(),texture.getWidth(),texture.getHeight(), texture.getSRGB(), texture.getFilepath(), texMap=textureMap)
+            texture.releaseImageData() # blender has its own copy now
 
     # try to import the textures in the same directory that match to the model, if the files are found, override the material with it
     importedTexture = None
@@ -100,17 +114,11 @@ def load_papa(properties, context):
                 vertex = vBuffer.getVertex(0)
                 if(vertex.getTexcoord1() != None):
                     uv = blenderMesh.data.uv_layers.new(name="UVMap")
-                    uvLayer = uv.data
-                    for i in range(iBuffer.getNumIndices()):
-                        vertexUV = vBuffer.getVertex(iBuffer.getIndex(i)).getTexcoord1()
-                        uvLayer[i].uv = vertexUV
+                    applyUVsFromData(uv.data, vBuffer, iBuffer, "texcoord1")
                 
                 if(vertex.getTexcoord2() != None):
                     uv = blenderMesh.data.uv_layers.new(name="Shadow Map")
-                    uvLayer = uv.data
-                    for i in range(iBuffer.getNumIndices()):
-                        vertexUV = vBuffer.getVertex(iBuffer.getIndex(i)).getTexcoord2()
-                        uvLayer[i].uv = vertexUV
+                    applyUVsFromData(uv.data, vBuffer, iBuffer, "texcoord2")
 
                 if(vertex.getColour() != None):
                     if(not blenderMesh.data.vertex_colors):
@@ -122,9 +130,13 @@ def load_papa(properties, context):
                             colour_layer.data[idx].color = vBuffer.getVertex(loop.vertex_index).getColour()
 
                 if(properties.isImportNormals() and vertex.getNormal()!=None):
-                    normals = []
-                    for i in range(vBuffer.getNumVertices()):
-                        normals.append(vBuffer.getVertex(i).getNormal())
+                    normals = vBuffer.getColumn("normal")
+                    if normals is not None:
+                        normals = normals.tolist()
+                    else:
+                        normals = []
+                        for i in range(vBuffer.getNumVertices()):
+                            normals.append(vBuffer.getVertex(i).getNormal())
                     blenderMesh.data.use_auto_smooth = True
                     blenderMesh.data.normals_split_custom_set_from_vertices(normals)
 
@@ -382,11 +394,13 @@ def load_papa(properties, context):
                 curvesRot.append(curve)
 
             # apply bone positions and rotations
+            translations = currentBone.getTranslations().tolist()
+            rotations = currentBone.getRotations().tolist()
             for frame in range(animation.getNumFrames()):
                 for i in range(3):
-                    curvesLoc[i].keyframe_points.insert(frame=frame,value=currentBone.getTranslation(frame)[i])
+                    curvesLoc[i].keyframe_points.insert(frame=frame,value=translations[frame][i])
                 for i in range(4):
-                    curvesRot[i].keyframe_points.insert(frame=frame,value=currentBone.getRotation(frame)[i])
+                    curvesRot[i].keyframe_points.insert(frame=frame,value=rotations[frame][i])
 
 def papaTextureFromMaterial(papaFile: PapaFile, material: PapaMaterial, paramName:str):
     param = material.getTextureParamByName(papaFile, paramName)
@@ -406,6 +420,18 @@ def blenderTextureFromMaterial(papaFile: PapaFile, material: PapaMaterial, param
     except Exception as e:
         print("Error finding texture for parameter "+paramName+". Skipping. ("+str(e)+")")
 
+def applyUVsFromData(uvLayer, vBuffer: PapaVertexBuffer, iBuffer: PapaIndexBuffer, field: str):
+    texcoords = vBuffer.getColumn(field)
+    if texcoords is None:
+        for i in range(iBuffer.getNumIndices()):
+            vertex = vBuffer.getVertex(iBuffer.getIndex(i))
+            uvLayer[i].uv = vertex.getTexcoord1() if field == "texcoord1" else vertex.getTexcoord2()
+        return
+    # read the UVs for every loop at once, the UVs are flipped across the Y axis (see PapaVertex)
+    uvs = texcoords[iBuffer.asarray()]
+    uvs[:,1] = 1 - uvs[:,1]
+    uvLayer.foreach_set("uv", uvs.ravel())
+
 def shadeSmoothFromData(blenderMesh, iBuffer: PapaIndexBuffer, vBuffer: PapaVertexBuffer):
     # Every face in PA is smooth shaded, what matters is the vertex normals.
     # For blender, if the vertex normals from the data do not all match eachother, the face should be smooth shaded
@@ -439,15 +465,17 @@ def extractTexture(filepath, append, textureMap, useAlpha, properties):
     if not path.isfile(target): # couldn't find the texture
         return None
 
-    textureFile = PapaFile(target)
+    textureFile = PapaFile(target, sections={"textures"}, pixelFormat="byte")
     print("Auto imported texture file "+target+":")
     print(textureFile.getTexture(0))
 
     if(textureFile.getNumTextures()>0):
         texture = textureFile.getTexture(0) # only import the first
         name = textureFile.getString(texture.getNameIndex())
-        return createImageFromData(name,texture.getImageData(),texture.getWidth(),texture.getHeight(), texture.getSRGB(),
+        img = createImageFromData(name,texture.getImageData(),texture.getWidth(),texture.getHeight(), texture.getSRGB(),
                                     texture.getFilepath(), useAlpha=useAlpha, texMap=textureMap)
+        texture.releaseImageData() # blender has its own copy now
+        return img
     return None
 
 def applyTexturePathsFromData(blenderMaterial, diffuse:PapaTexture, mask:PapaTexture, material:PapaTexture, normal:PapaTexture):
@@ -897,12 +925,14 @@ def createMeshFromData(name: str, vBuffer: PapaVertexBuffer, iBuffer: PapaIndexB
     ob.select_set(True)
 
     verts = []
-    faces = []
-    for i in range(vBuffer.getNumVertices()):
-        verts.append(vBuffer.getVertex(i).getPosition().to_tuple())
+    positions = vBuffer.getColumn("position")
+    if positions is not None:
+        verts = positions.tolist()
+    else:
+        for i in range(vBuffer.getNumVertices()):
+            verts.append(vBuffer.getVertex(i).getPosition().to_tuple())
 
-    for i in range(0, iBuffer.getNumIndices(), 3):
-        faces.append((iBuffer.getIndex(i),iBuffer.getIndex(i + 1),iBuffer.getIndex(i + 2)))
+    faces = iBuffer.asarray().reshape(-1, 3).tolist()
     
     components = transform.decompose()
 
@@ -946,9 +976,14 @@ def getCollection(context, item):
     return context.scene.collection
 
 # https://blender.stackexchange.com/questions/643/is-it-possible-to-create-image-data-and-save-to-a-file-from-a-script
-def createImageFromData(imageName, pixels, width, height, srgb, filepath, texMap = None, useAlpha = True): # assumed data is in RGBA byte array (as floats)
+def createImageFromData(imageName, pixels, width, height, srgb, filepath, texMap = None, useAlpha = True): # RGBA data as floats or bytes
     img = bpy.data.images.new(imageName, width, height,alpha=True)
-    img.pixels = pixels
+    # byte data is only expanded to floats here, into a pooled buffer that is reused once blender has copied it
+    pool = PapaBufferPool.getInstance()
+    floatPixels = PapaTexture.pixelsToFloat(pixels, pool)
+    img.pixels.foreach_set(floatPixels)
+    if floatPixels is not pixels:
+        pool.release(floatPixels)
     img.pack() # by packing the data, we can edit the colour space name
     if not srgb:
         img.colorspace_settings.name = "Linear"
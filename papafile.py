@@ -22,19 +22,36 @@
 # SOFTWARE.
 
 import ctypes
+import itertools
+import mmap
 import struct
 from pathlib import Path
 from mathutils import * # has vectors and quaternions
-from math import ceil, log2
+from math import ceil
 import platform
+import os
+import hashlib
+import shlex
+import shutil
+import subprocess
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from collections import OrderedDict
 from os import path
-from array import array
+import numpy as np
 
 class PapaComponent: # abstract interface meant for compiling
-    def build(self):
-        self.__headerBytes = bytearray(self.headerSize())
-        self.__bodyBytes = bytearray(self.bodySize())
+    def build(self, headerBytes = None, bodyBytes = None):
+        # the compiler passes views of the output file so the component is written in place, otherwise it gets its own buffers
+        self.__headerBytes = bytearray(self.headerSize()) if headerBytes is None else headerBytes
+        self.__bodyBytes = bytearray(self.bodySize()) if bodyBytes is None else bodyBytes
         self.buildComponent()
+
+    def releaseBytes(self):
+        # views into the output keep the whole file alive, so they are dropped once the component is written
+        self.__headerBytes = None
+        self.__bodyBytes = None
     
     def buildComponent(self):
         raise NotImplementedError(type(self))
@@ -95,15 +112,141 @@ class PapaTexture(PapaComponent):
 		6:"DXT5",
 		13:"R8",
     }
+    pixelFormats = ["float", "byte"] # layouts of decoded image data, RGBA float32 from 0 to 1 or RGBA uint8
 
-    def __init__(self, nameIndex: int, formatIndex: int,SRGB: bool, width: int, height: int, imageData: float, filepath = None):
+    def __init__(self, nameIndex: int, formatIndex: int,SRGB: bool, width: int, height: int, imageData: float, filepath = None,
+                mipLevels: list = None, mipLevel: int = 0, pixelFormat: str = "float", linked: bool = False):
         self.__nameIndex = nameIndex
         self.__formatIndex = formatIndex
         self.__SRGB = SRGB
-        self.__width = width
+        self.__width = width # dimensions of the decoded image data, which may be a smaller mip level
         self.__height = height
         self.__imageData = imageData
         self.__filepath = filepath
+        self.__mipLevels = mipLevels # (width, height, raw data) for each level of the mip chain, if read from a file
+        self.__mipLevel = mipLevel # the level that imageData was decoded from
+        self.__pixelFormat = pixelFormat
+        self.__linked = linked # loaded through a link to another file, built as a link again
+        self.__released = False # imageData was handed to the buffer pool and is decoded again when next needed
+
+    @staticmethod
+    def levelDataSize(formatIndex: int, width: int, height: int) -> int:
+        # size in bytes of a single mip level
+        if formatIndex == 13: # R8
+            return width * height
+        elif formatIndex == 1 or formatIndex == 2 or formatIndex == 3:
+            return width * height * 4
+        elif formatIndex == 4: # DXT1
+            return ceil(width / 4) * ceil(height / 4) * 8 # 8 bytes per block
+        elif formatIndex == 5 or formatIndex == 6: # DXT3, DXT5
+            return ceil(width / 4) * ceil(height / 4) * 16 # 16 bytes per block
+        return 0
+
+    @staticmethod
+    def mipLevelDimensions(width: int, height: int, level: int) -> tuple:
+        return max(1, width >> level), max(1, height >> level)
+
+    @staticmethod
+    def mipLevelCount(formatIndex: int, width: int, height: int, mipBits: int, dataSize: int) -> int:
+        # The header only has four bits for the mip count. Use the largest chain that fits in the stored data, this
+        # handles files that count the base level in the mip bits and ones that don't.
+        levels = mipBits + 1
+        while levels > 1 and PapaTexture.mipChainSize(formatIndex, width, height, levels) > dataSize:
+            levels -= 1
+        return levels
+
+    @staticmethod
+    def mipChainSize(formatIndex: int, width: int, height: int, levels: int) -> int:
+        size = 0
+        for level in range(levels):
+            size += PapaTexture.levelDataSize(formatIndex, *PapaTexture.mipLevelDimensions(width, height, level))
+        return size
+
+    mipFilters = ["box", "kaiser"]
+
+    @staticmethod
+    def fullMipLevelCount(width: int, height: int) -> int:
+        # levels down to 1x1, the header has room for 16
+        return min(16, max(width, height).bit_length())
+
+    @staticmethod
+    def __srgbToLinear(pixels):
+        rgb = pixels[...,0:3]
+        rgb[:] = np.where(rgb <= 0.04045, rgb / 12.92, ((rgb + 0.055) / 1.055) ** 2.4)
+
+    @staticmethod
+    def __linearToSrgb(pixels):
+        rgb = np.clip(pixels[...,0:3], 0, 1)
+        pixels[...,0:3] = np.where(rgb <= 0.0031308, rgb * 12.92, 1.055 * rgb ** (1 / 2.4) - 0.055)
+
+    @staticmethod
+    def __mipFilterTaps(size: int, newSize: int, mipFilter: str):
+        # returns (newSize, taps) source indices and weights for shrinking one axis, edges are clamped
+        scale = size / newSize
+        centers = (np.arange(newSize) + 0.5) * scale # in source pixels, pixel x covers [x, x+1)
+        radius = scale / 2 if mipFilter == "box" else scale * 2
+        first = np.floor(centers - radius).astype(np.intp)
+        indices = first[:,np.newaxis] + np.arange(int(np.ceil(radius * 2)) + 1)
+        if mipFilter == "box": # coverage of each source pixel
+            weights = np.minimum(indices + 1, (centers + radius)[:,np.newaxis]) - np.maximum(indices, (centers - radius)[:,np.newaxis])
+            weights = np.maximum(weights, 0)
+        else: # Kaiser windowed sinc, two destination pixels wide on each side, alpha 4
+            distance = (indices + 0.5 - centers[:,np.newaxis]) / scale
+            window = np.sqrt(np.maximum(0, 1 - (distance / 2) ** 2))
+            weights = np.sinc(distance) * np.i0(4 * window) / np.i0(4)
+            weights[np.abs(distance) >= 2] = 0
+        weights /= weights.sum(axis=1, keepdims=True)
+        used = np.any(weights != 0, axis=0) # drop taps that never contribute
+        return np.clip(indices[:,used], 0, size - 1), weights[:,used].astype(np.float32)
+
+    @staticmethod
+    def __shrinkAxis(pixels, axis: int, newSize: int, mipFilter: str):
+        size = pixels.shape[axis]
+        if size == newSize:
+            return pixels
+        indices, weights = PapaTexture.__mipFilterTaps(size, newSize, mipFilter)
+        shape = [1] * pixels.ndim
+        shape[axis] = newSize
+        result = np.zeros(pixels.shape[:axis] + (newSize,) + pixels.shape[axis+1:], dtype=np.float32)
+        for tap in range(indices.shape[1]):
+            result += np.take(pixels, indices[:,tap], axis=axis) * weights[:,tap].reshape(shape)
+        return result
+
+    @staticmethod
+    def generateMipChain(pixels, width: int, height: int, srgb: bool = False, mipFilter: str = "box", levels: int = None) -> list:
+        # Filters bottom up RGBA pixels of either pixel format into a mip chain, returning (width, height, pixels) for every
+        # level with float pixels in the same layout. sRGB colour is filtered in linear space. Each level is made from the
+        # one before it, down to 1x1 unless levels is given.
+        if not mipFilter in PapaTexture.mipFilters:
+            raise ValueError("Unknown mip filter \"" + str(mipFilter) + "\"")
+        if levels == None:
+            levels = PapaTexture.fullMipLevelCount(width, height)
+        current = np.asarray(PapaTexture.pixelsToFloat(pixels), dtype=np.float32).reshape(height, width, 4)
+        chain = [(width, height, current.ravel())]
+        if levels > 1 and srgb:
+            current = current.copy()
+            PapaTexture.__srgbToLinear(current)
+
+        for level in range(1, levels):
+            levelWidth, levelHeight = PapaTexture.mipLevelDimensions(width, height, level)
+            current = PapaTexture.__shrinkAxis(current, 0, levelHeight, mipFilter)
+            current = PapaTexture.__shrinkAxis(current, 1, levelWidth, mipFilter)
+            levelPixels = np.clip(current, 0, 1)
+            if srgb:
+                PapaTexture.__linearToSrgb(levelPixels)
+            chain.append((levelWidth, levelHeight, levelPixels.ravel()))
+        return chain
+
+    @classmethod
+    def fromImageData(cls, nameIndex: int, formatIndex: int, SRGB: bool, width: int, height: int, imageData, mipmaps: bool = True,
+            mipFilter: str = "box", highQuality: bool = False, filepath = None):
+        # builds an embedded texture from bottom up RGBA pixels, encoding the full mip chain when mipmaps is set
+        levels = PapaTexture.fullMipLevelCount(width, height) if mipmaps else 1
+        mipLevels = []
+        for levelWidth, levelHeight, levelPixels in PapaTexture.generateMipChain(imageData, width, height, SRGB, mipFilter, levels):
+            mipLevels.append((levelWidth, levelHeight, PapaFile.encodeTextureData(levelPixels, levelWidth, levelHeight, formatIndex, highQuality)))
+        pixelFormat = "byte" if isinstance(imageData, np.ndarray) and imageData.dtype == np.uint8 else "float"
+        return cls(nameIndex, formatIndex, SRGB, width, height, imageData, filepath, mipLevels=mipLevels, pixelFormat=pixelFormat)
     
     def getNameIndex(self):
         return self.__nameIndex
@@ -123,47 +266,139 @@ class PapaTexture(PapaComponent):
     def getHeight(self):
         return self.__height
     
-    def getImageData(self): # RGBA float array
+    def getImageData(self): # RGBA array in the layout given by getPixelFormat
+        if self.__released:
+            if self.__mipLevels == None:
+                raise ReferenceError("PapaTexture image data was released and there is no raw data to decode it again")
+            width, height, rawData = self.__mipLevels[self.__mipLevel]
+            self.__imageData = PapaFile.decodeTextureData(rawData, width, height, self.__formatIndex, pixelFormat=self.__pixelFormat)
+            self.__released = False
         return self.__imageData
 
+    def getPixelFormat(self) -> str:
+        return self.__pixelFormat
+
+    def getFloatImageData(self): # RGBA float array, converted from bytes if needed
+        return PapaTexture.pixelsToFloat(self.getImageData())
+
+    def releaseImageData(self):
+        # hands the decoded pixels to the buffer pool once they have been copied elsewhere, e.g. into a Blender image.
+        # The raw mip levels are kept, getImageData decodes them again if the pixels are needed later
+        if self.__released:
+            return
+        PapaBufferPool.getInstance().release(self.__imageData)
+        self.__imageData = []
+        self.__released = True
+
+    @staticmethod
+    def pixelsToFloat(pixels, pool: "PapaBufferPool" = None):
+        # byte pixels are converted into a new array, or one from pool that should be released once it has been copied
+        if isinstance(pixels, np.ndarray) and pixels.dtype == np.uint8:
+            out = pool.acquire(pixels.size, np.float32) if pool != None else None
+            return np.divide(pixels, np.float32(255), out=out, dtype=np.float32)
+        return pixels
+
+    def getNumMipLevels(self) -> int:
+        if self.__mipLevels == None:
+            return 1
+        return len(self.__mipLevels)
+
+    def getMipLevel(self) -> int:
+        return self.__mipLevel
+
+    def getMipLevels(self) -> list:
+        return self.__mipLevels
+
+    def getMipLevelDimensions(self, level: int) -> tuple:
+        if self.__mipLevels == None:
+            return PapaTexture.mipLevelDimensions(self.__width, self.__height, level - self.__mipLevel)
+        return self.__mipLevels[level][0], self.__mipLevels[level][1]
+
+    def getMipLevelData(self, level: int) -> bytes: # raw, still encoded data of a mip level
+        if self.__mipLevels == None:
+            return None
+        return self.__mipLevels[level][2]
+
+    def decodeMipLevel(self, level: int):
+        # decodes any level of the chain in the same layout as getImageData
+        if level == self.__mipLevel:
+            return self.getImageData()
+        if self.__mipLevels == None:
+            raise ReferenceError("PapaTexture has no mip level " + str(level))
+        width, height, rawData = self.__mipLevels[level]
+        return PapaFile.decodeTextureData(rawData, width, height, self.__formatIndex, pixelFormat=self.__pixelFormat)
+
     def hasFilepath(self):
         return self.__filepath != None
 
+    def isLinked(self):
+        # textures without raw data can only be written as a link to their name
+        return self.__linked or self.__mipLevels == None
+
     def getFilepath(self):
         if not self.hasFilepath():
             raise ReferenceError("Papatexture has no filepath")
         return self.__filepath
 
     def hasData(self):
+        if self.__released:
+            return self.__mipLevels != None
         return len(self.__imageData) != 0
 
     def __str__(self):
         return "PapaTexture: \n\tFormat: "+self.getFormatString() +"\n\tName index: "+str(self.getNameIndex()) \
-            + "\n\tDimensions: ("+str(self.getWidth()) +", "+str(self.getHeight())+")"
+            + "\n\tDimensions: ("+str(self.getWidth()) +", "+str(self.getHeight())+")" \
+            + ("\n\tMip Level: "+str(self.getMipLevel())+" of "+str(self.getNumMipLevels()) if self.getNumMipLevels() > 1 else "")
 
-    # only linked textures may be built
     def buildComponent(self):
-        struct.pack_into('<hbbhhq', self.getHeaderBytes(), 0, self.getNameIndex(),0,0,0,0,0)
+        if self.isLinked():
+            struct.pack_into('<hbbhhq', self.getHeaderBytes(), 0, self.getNameIndex(),0,0,0,0,0)
+            return
+
+        # the mip bits count the levels after the first
+        width, height, _ = self.__mipLevels[0]
+        mipInfo = (0b1000_0000 if self.__SRGB else 0) | (len(self.__mipLevels) - 1)
+        dataSize = sum(len(level[2]) for level in self.__mipLevels)
+        struct.pack_into('<hBBHHq', self.getHeaderBytes(), 0, self.getNameIndex(), self.getFormatIndex(), mipInfo, width, height, dataSize)
+
+        data = self.getBodyBytes()
+        position = 0
+        for level in self.__mipLevels:
+            data[position:position + len(level[2])] = level[2]
+            position += len(level[2])
     
     def applyOffset(self, offset):
-        struct.pack_into('<q',self.getHeaderBytes(),16,-1)
+        struct.pack_into('<q',self.getHeaderBytes(),16,-1 if self.isLinked() else offset)
     
     def headerSize(self):
         return 24
     
     def bodySize(self):
-        return 0
+        if self.isLinked():
+            return 0
+        return ceilEight(sum(len(level[2]) for level in self.__mipLevels))
 
 class PapaIndexBuffer(PapaComponent):
-    def __init__(self, format: int, indices: tuple):
+    dtypeMap = {
+        0:np.dtype("<u2"), # UInt16
+        1:np.dtype("<u4"), # UInt32
+    }
+
+    def __init__(self, format: int, indices):
+        if not format in PapaIndexBuffer.dtypeMap:
+            raise ValueError("Unknown index buffer format " + str(format) + ", expected 0 (UInt16) or 1 (UInt32)")
         self.__format=format
-        self.__indices=indices
+        # stored as a flat array in the on disk type, arrays read from a file are used as is without copying
+        self.__indices=np.asarray(indices, dtype=PapaIndexBuffer.dtypeMap[format])
     
     def getNumIndices(self) -> int:
         return len(self.__indices)
     
     def getIndex(self, ind) -> int:
-        return self.__indices[ind]
+        return int(self.__indices[ind])
+
+    def asarray(self) -> np.ndarray:
+        return self.__indices
     
     def getFormat(self) -> int:
         return self.__format
@@ -177,11 +412,7 @@ class PapaIndexBuffer(PapaComponent):
     
     def buildComponent(self):
         # body
-        data = self.getBodyBytes()
-        if(self.__format == 0): # short
-            struct.pack_into('<'+'H'*len(self.__indices), data, 0, *self.__indices) # * unpacks the elements of the iterable into individual arguments
-        else: # int
-            struct.pack_into('<'+'I'*len(self.__indices), data, 0, *self.__indices)
+        np.frombuffer(self.getBodyBytes(), dtype=self.__indices.dtype, count=len(self.__indices))[:] = self.__indices
         
         struct.pack_into('<BxxxIq', self.getHeaderBytes(), 0, self.__format,len(self.__indices),self.bodySize())
     
@@ -192,7 +423,7 @@ class PapaIndexBuffer(PapaComponent):
         return 24
     
     def bodySize(self):
-        return len(self.__indices) * (2 if self.__format == 0 else 4)
+        return self.__indices.nbytes
 
 class PapaVertex:
     def __init__(self, pos: Vector, norm: Vector = None, binorm: Vector = None, tan: Vector = None, col: list = None,
@@ -258,15 +489,62 @@ class PapaVertexBuffer(PapaComponent):
 		10:"Position3Normal3Tan3Bin3TexCoord4"
     }
 
+    # on disk layout of a single vertex for each format. Field names match the PapaVertex accessors
+    dtypeMap = {
+        0:np.dtype([("position","<f4",3)]),
+        5:np.dtype([("position","<f4",3),("normal","<f4",3),("texcoord1","<f4",2)]),
+        6:np.dtype([("position","<f4",3),("normal","<f4",3),("colour","u1",4),("texcoord1","<f4",2)]),
+        7:np.dtype([("position","<f4",3),("normal","<f4",3),("colour","u1",4),("texcoord1","<f4",2),("texcoord2","<f4",2)]),
+        8:np.dtype([("position","<f4",3),("weights","u1",4),("bones","u1",4),("normal","<f4",3),("texcoord1","<f4",2)]),
+        10:np.dtype([("position","<f4",3),("normal","<f4",3),("tangent","<f4",3),("binormal","<f4",3),("texcoord1","<f4",2),("texcoord2","<f4",2)]),
+    }
+
     def __init__(self, format, vertices):
         self.__format=format
-        self.__vertices=vertices
+        if isinstance(vertices, np.ndarray): # structured array in the format's dtype, PapaVertex objects are made on request
+            self.__vertexData = vertices
+            self.__vertices = [None] * len(vertices)
+        else:
+            self.__vertexData = None
+            self.__vertices = vertices
     
     def getNumVertices(self) -> int:
         return len(self.__vertices)
     
     def getVertex(self, ind) -> PapaVertex:
-        return self.__vertices[ind]
+        vertex = self.__vertices[ind]
+        if vertex == None:
+            vertex = self.__vertexFromRecord(self.__vertexData[ind])
+            self.__vertices[ind] = vertex
+        return vertex
+
+    def hasVertexData(self) -> bool:
+        return self.__vertexData is not None
+
+    def getVertexData(self) -> np.ndarray:
+        # the raw structured array as stored in the file. Note that texture coordinates are not flipped and weights are not normalized
+        return self.__vertexData
+
+    def getColumn(self, name: str) -> np.ndarray:
+        # a (numVertices, n) view of a single field, or None if this format does not have the field
+        if self.__vertexData is None or not name in self.__vertexData.dtype.names:
+            return None
+        return self.__vertexData[name]
+
+    def __vertexFromRecord(self, record) -> PapaVertex:
+        fields = self.__vertexData.dtype.names
+        p = Vector(record["position"].tolist())
+        n = Vector(record["normal"].tolist()) if "normal" in fields else None
+        t = Vector(record["tangent"].tolist()) if "tangent" in fields else None
+        b = Vector(record["binormal"].tolist()) if "binormal" in fields else None
+        c = record["colour"].tolist() if "colour" in fields else None
+        t1 = record["texcoord1"].tolist() if "texcoord1" in fields else None
+        t2 = record["texcoord2"].tolist() if "texcoord2" in fields else None
+        if "weights" in fields:
+            weights = [w/255 for w in record["weights"].tolist()]
+            bones = record["bones"].tolist()
+            return PapaVertex(p, norm=n, texcoord1=t1, bones=bones, weights=weights)
+        return PapaVertex(p, norm=n, binorm=b, tan=t, col=c, texcoord1=t1, texcoord2=t2)
     
     def getFormat(self) -> int:
         return self.__format
@@ -277,72 +555,67 @@ class PapaVertexBuffer(PapaComponent):
     def __str__(self):
         return self.getFormatName() + ": " + str(self.getNumVertices()) +" vertices"
     
+    # every value of a PapaVertex in the order of the format's fields
+    __recordGetters = {
+        0: lambda v: v.getPosition(),
+        5: lambda v: (*v.getPosition(), *v.getNormal(), *v.getTexcoord1()),
+        6: lambda v: (*v.getPosition(), *v.getNormal(), *v.getColour(), *v.getTexcoord1()),
+        7: lambda v: (*v.getPosition(), *v.getNormal(), *v.getColour(), *v.getTexcoord1(), *v.getTexcoord2()),
+        8: lambda v: (*v.getPosition(), *v.getWeights()[:4], *v.getBones()[:4], *v.getNormal(), *v.getTexcoord1()),
+        10: lambda v: (*v.getPosition(), *v.getNormal(), *v.getTangent(), *v.getBinormal(), *v.getTexcoord1(), *v.getTexcoord2()),
+    }
+
+    @classmethod
+    def fromColumns(cls, format: int, **columns):
+        # builds a buffer straight from one array per field of the format, e.g. fromColumns(5, position=p, normal=n, texcoord1=t).
+        # Values are as stored in the file: texture coordinates already flipped and weights and bones as bytes
+        dtype = cls.dtypeMap.get(format)
+        if dtype == None:
+            raise ValueError("Unknown vertex buffer format " + str(format))
+        if set(columns) != set(dtype.names):
+            raise ValueError("Vertex buffer format " + str(format) + " needs the fields " + ", ".join(dtype.names))
+        numberOfVertices = len(columns[dtype.names[0]])
+        vertices = np.empty(numberOfVertices, dtype=dtype)
+        for name in dtype.names:
+            column = columns[name]
+            if not isinstance(column, np.ndarray): # e.g. a list of Vectors, flattened in one pass
+                column = np.fromiter(itertools.chain.from_iterable(column), dtype=np.float64)
+                if column.size != numberOfVertices * dtype[name].shape[0]:
+                    raise ValueError("Vertex " + name + " needs " + str(dtype[name].shape[0]) + " values for each of "
+                        + str(numberOfVertices) + " vertices")
+                column = column.reshape((numberOfVertices,) + dtype[name].shape)
+            if dtype[name].base == np.uint8 and len(column) != 0 and (column.min() < 0 or column.max() > 255):
+                raise ValueError("Vertex " + name + " must be between 0 and 255")
+            vertices[name] = column
+        return cls(format, vertices)
+
+    def __buildVertexData(self) -> np.ndarray:
+        # gathers every PapaVertex into a single structured array, once. All values go through one flat float64 array, which
+        # holds the byte fields exactly
+        dtype = PapaVertexBuffer.dtypeMap[self.__format]
+        numberOfVertices = len(self.__vertices)
+        valuesPerVertex = sum(dtype[name].shape[0] for name in dtype.names)
+        values = np.fromiter(itertools.chain.from_iterable(map(PapaVertexBuffer.__recordGetters[self.__format], self.__vertices)),
+            dtype=np.float64)
+        if values.size != numberOfVertices * valuesPerVertex:
+            raise ValueError("Every vertex of a " + self.getFormatName() + " buffer needs " + str(valuesPerVertex) + " values")
+        values = values.reshape(numberOfVertices, valuesPerVertex)
+
+        vertexData = np.empty(numberOfVertices, dtype=dtype)
+        column = 0
+        for name in dtype.names:
+            field = values[:,column:column + dtype[name].shape[0]]
+            column += dtype[name].shape[0]
+            if dtype[name].base == np.uint8 and field.size != 0 and (field.min() < 0 or field.max() > 255):
+                raise ValueError("Vertex " + name + " must be between 0 and 255")
+            vertexData[name] = field
+        return vertexData
+
     def buildComponent(self):
-        # body
-        vertexFormat = self.getFormat()
-        numberOfVertices = self.getNumVertices()
-        data = self.getBodyBytes()
-        if (vertexFormat == 0): # Position3
-            for i in range(numberOfVertices):
-                loc = self.getVertex(i).getPosition()
-                struct.pack_into('<fff', data, 12 * i,loc[0],loc[1],loc[2])
-
-        elif (vertexFormat == 5): # Position3Normal3TexCoord2
-            for i in range(numberOfVertices):
-                v = self.getVertex(i)
-
-                p = v.getPosition()
-                n = v.getNormal()
-                t1 = v.getTexcoord1()
-
-                struct.pack_into('<ffffffff', data, 32 * i,p[0],p[1],p[2],n[0],n[1],n[2],t1[0],t1[1])
-
-        elif (vertexFormat == 6): # Position3Normal3Color4TexCoord2
-            for i in range(numberOfVertices):
-                v = self.getVertex(i)
-
-                p = v.getPosition()
-                n = v.getNormal()
-                c = v.getColour()
-                t1 = v.getTexcoord1()
-
-                struct.pack_into('<ffffffBBBBff', data, 36 * i,p[0],p[1],p[2],n[0],n[1],n[2],c[0],c[1],c[2],c[3],t1[0],t1[1])
-
-        elif (vertexFormat == 7): # Position3Normal3Color4TexCoord4
-            for i in range(numberOfVertices):
-                v = self.getVertex(i)
-
-                p = v.getPosition()
-                n = v.getNormal()
-                c = v.getColour()
-                t1 = v.getTexcoord1()
-                t2 = v.getTexcoord2()
-
-                struct.pack_into('<ffffffBBBBff', data, 44 * i,p[0],p[1],p[2],n[0],n[1],n[2],c[0],c[1],c[2],c[3],t1[0],t1[1],t2[0],t2[1])
-
-        elif (vertexFormat == 8): # Position3Weights4bBones4bNormal3TexCoord2
-            for i in range(numberOfVertices):
-                v = self.getVertex(i)
-
-                p = v.getPosition()
-                w = v.getWeights()
-                b = v.getBones()
-                n = v.getNormal()
-                t1 = v.getTexcoord1()
-                struct.pack_into('<fffBBBBBBBBfffff', data, 40 * i,p[0],p[1],p[2],w[0],w[1],w[2],w[3],b[0],b[1],b[2],b[3],n[0],n[1],n[2],t1[0],t1[1])
-                
-        elif (vertexFormat == 10): # Position3Normal3Tan3Bin3TexCoord4
-            for i in range(numberOfVertices):
-                v = self.getVertex(i)
-
-                p = v.getPosition()
-                n = v.getNormal()
-                t = v.getTangent()
-                b = v.getBinormal()
-                t1 = v.getTexcoord1()
-                t2 = v.getTexcoord2()
-
-                struct.pack_into('<ffffffffffffffff', data, 64 * i,p[0],p[1],p[2],n[0],n[1],n[2],t[0],t[1],t[2],b[0],b[1],b[2],t1[0],t1[1],t2[0],t2[1])
+        # body, every format is written as one interleaved structured array
+        if self.__vertexData is None:
+            self.__vertexData = self.__buildVertexData()
+        np.frombuffer(self.getBodyBytes(), dtype=PapaVertexBuffer.dtypeMap[self.getFormat()], count=self.getNumVertices())[:] = self.__vertexData
         
         struct.pack_into('<BxxxIq', self.getHeaderBytes(), 0, self.__format,len(self.__vertices),self.bodySize())
     
@@ -353,19 +626,10 @@ class PapaVertexBuffer(PapaComponent):
         return 24
     
     def bodySize(self):
-        vertexFormat = self.getFormat()
-        if (vertexFormat == 0): # Position3
-            return 12 * self.getNumVertices()
-        elif (vertexFormat == 5): # Position3Normal3TexCoord2
-            return 32 * self.getNumVertices()
-        elif (vertexFormat == 6): # Position3Normal3Color4TexCoord2
-            return 36 * self.getNumVertices()
-        elif (vertexFormat == 7): # Position3Normal3Color4TexCoord4
-            return 44 * self.getNumVertices()
-        elif (vertexFormat == 8): # Position3Weights4bBones4bNormal3TexCoord2
-            return 40 * self.getNumVertices()
-        elif (vertexFormat == 10): # Position3Normal3Tan3Bin3TexCoord4
-            return 64 * self.getNumVertices()
+        dtype = PapaVertexBuffer.dtypeMap.get(self.getFormat())
+        if dtype == None:
+            raise ValueError("Unknown vertex buffer format " + str(self.getFormat()))
+        return dtype.itemsize * self.getNumVertices()
 
 class PapaMaterialGroup:
     POINTS = 0
@@ -383,6 +647,9 @@ class PapaMaterialGroup:
     
     def getMaterialIndex(self):
         return self.__materialIndex
+
+    def setMaterialIndex(self, index: int):
+        self.__materialIndex = index
     
     def getFirstIndex(self):
         return self.__firstIndex
@@ -413,6 +680,12 @@ class PapaMesh(PapaComponent):
     
     def getIndexBufferIndex(self) -> int:
         return self.__iBuffer
+
+    def setVertexBufferIndex(self, index: int):
+        self.__vBuffer = index
+
+    def setIndexBufferIndex(self, index: int):
+        self.__iBuffer = index
     
     def getNumMaterialGroups(self) -> int:
         return len(self.__materialGroups)
@@ -519,15 +792,19 @@ class PapaSkeleton(PapaComponent):
 
     def buildComponent(self):
 
-        data = self.getBodyBytes()
+        data = memoryview(self.getBodyBytes())
         loc = 0
         for i in range(self.getNumBones()):
             b = self.getBone(i)
-            b.build()
-            data[loc:loc+len(b.getBodyBytes())] = b.getBodyBytes()
+            b.build(bodyBytes=data[loc:loc + b.bodySize()])
             loc += b.bodySize()
         
         struct.pack_into('<Hxxxxxx',self.getHeaderBytes(),0,self.getNumBones())
+
+    def releaseBytes(self):
+        for i in range(self.getNumBones()):
+            self.getBone(i).releaseBytes()
+        super().releaseBytes()
     
     def applyOffset(self, offset):
         struct.pack_into('<q',self.getHeaderBytes(),8,offset)
@@ -774,15 +1051,22 @@ class PapaModel(PapaComponent):
             + "\n\t"+str(self.getNumMeshBindings())+" Mesh Binding(s)"
 
     def buildComponent(self):
+        # the mesh bindings are written into our body, all of their headers first and then all of their bodies
+        data = memoryview(self.getBodyBytes())
+        location = 0
+        bodyLocation = sum(self.getMeshBinding(i).headerSize() for i in range(self.getNumMeshBindings()))
         for i in range(self.getNumMeshBindings()):
-            self.getMeshBinding(i).build()
+            m = self.getMeshBinding(i)
+            m.build(data[location:location + m.headerSize()], data[bodyLocation:bodyLocation + m.bodySize()])
+            location+=m.headerSize()
+            bodyLocation+=m.bodySize()
+
         struct.pack_into('<hhHxx', self.getHeaderBytes(), 0, self.getNameIndex(), self.getSkeletonIndex(), self.getNumMeshBindings())
         m = self.getModelToScene()
         struct.pack_into('<ffffffffffffffff', self.getHeaderBytes(), 8, m[0][0],m[1][0],m[2][0],m[3][0],
                                                                         m[0][1],m[1][1],m[2][1],m[3][1],
                                                                         m[0][2],m[1][2],m[2][2],m[3][2],
                                                                         m[0][3],m[1][3],m[2][3],m[3][3])
-        # data is added in applyOffset since we have to wait for the subcomponents to build
     
     def applyOffset(self, offset):
         localOffset = offset
@@ -799,17 +1083,11 @@ class PapaModel(PapaComponent):
             m = self.getMeshBinding(i)
             m.applyOffset(localOffset)
             localOffset+=m.bodySize()
-        
-        location = 0 # add the mesh bindings to our data array
-        for i in range(self.getNumMeshBindings()):
-            m = self.getMeshBinding(i)
-            self.getBodyBytes()[location:location+len(m.getHeaderBytes())] = m.getHeaderBytes()
-            location+=m.headerSize()
-        
+
+    def releaseBytes(self):
         for i in range(self.getNumMeshBindings()):
-            m = self.getMeshBinding(i)
-            self.getBodyBytes()[location:location+len(m.getBodyBytes())] = m.getBodyBytes()
-            location+=m.bodySize()
+            self.getMeshBinding(i).releaseBytes()
+        super().releaseBytes()
     
     def headerSize(self):
         return 80
@@ -821,11 +1099,13 @@ class PapaModel(PapaComponent):
         return size
 
 class AnimationBone:
-    def __init__(self, nameIndex: int, name: str, translations: list, rotations: list):
+    def __init__(self, nameIndex: int, name: str, translations, rotations):
         self.__nameIndex = nameIndex
         self.__name = name # need both since these structures have no connection to parent papafile
+        # either lists of Vectors / Quaternions, or (numFrames, 3) and (numFrames, 4) views into the animation's transform array
         self.__translations = translations
         self.__rotations = rotations
+        self.__isView = isinstance(translations, np.ndarray)
     
     def getNameIndex(self) -> int:
         return self.__nameIndex
@@ -834,22 +1114,43 @@ class AnimationBone:
         return self.__name
     
     def getTranslation(self, index) -> Vector:
+        if self.__isView:
+            return Vector(self.__translations[index].tolist())
         return self.__translations[index]
     
     def getRotation(self, index) -> Quaternion:
+        if self.__isView:
+            return Quaternion(self.__rotations[index].tolist())
         return self.__rotations[index]
 
+    def getTranslations(self) -> np.ndarray: # (numFrames, 3)
+        if self.__isView:
+            return self.__translations
+        return np.array([tuple(t) for t in self.__translations], dtype=np.float32).reshape(-1, 3)
+
+    def getRotations(self) -> np.ndarray: # (numFrames, 4)
+        if self.__isView:
+            return self.__rotations
+        return np.array([tuple(q) for q in self.__rotations], dtype=np.float32).reshape(-1, 4)
+
     def setNameIndex(self, index):
         self.__nameIndex = index
     
     def setTranslation(self, index: int, translation: Vector):
-        self.__translations[index] = translation
+        if self.__isView:
+            self.__translations[index] = tuple(translation)
+        else:
+            self.__translations[index] = translation
     
     def setRotation(self, index: int, rotation: Quaternion):
-        self.__rotations[index] = rotation
+        if self.__isView:
+            self.__rotations[index] = tuple(rotation)
+        else:
+            self.__rotations[index] = rotation
 
 class PapaAnimation(PapaComponent):
-    def __init__(self, nameIndex: int, numBones: int, numFrames: int, fpsNumerator:int, fpsDenominator: int, transformData: AnimationBone):
+    def __init__(self, nameIndex: int, numBones: int, numFrames: int, fpsNumerator:int, fpsDenominator: int, transformData: AnimationBone,
+                transforms: np.ndarray = None):
         self.__nameIndex = nameIndex
         self.__numBones = numBones
         self.__numFrames = numFrames
@@ -857,6 +1158,7 @@ class PapaAnimation(PapaComponent):
         self.__fpsDenominator = fpsDenominator
         self.__animationSpeed = fpsNumerator / fpsDenominator
         self.__transformData = transformData
+        self.__transforms = transforms # (numFrames, numBones, 7) float32 array backing the bones, if they were read from a file
         self.__transformMap = {}
         for bone in transformData:
             self.__transformMap[bone.getName()] = bone
@@ -879,6 +1181,17 @@ class PapaAnimation(PapaComponent):
     def getFpsDenominator(self) -> int:
         return self.__fpsDenominator
     
+    def getTransforms(self) -> np.ndarray:
+        # every transform of the animation as a (numFrames, numBones, 7) array of [tx, ty, tz, qx, qy, qz, qw]
+        if self.__transforms is not None:
+            return self.__transforms
+        transforms = np.zeros((self.getNumFrames(), self.getNumBones(), 7), dtype=np.float32)
+        for x in range(self.getNumBones()):
+            bone = self.getAnimationBone(x)
+            transforms[:,x,0:3] = bone.getTranslations()
+            transforms[:,x,3:7] = bone.getRotations()
+        return transforms
+
     def getAnimationBone(self, index) -> AnimationBone:
         if type(index) == int:
             return self.__transformData[index]
@@ -898,6 +1211,13 @@ class PapaAnimation(PapaComponent):
             struct.pack_into('<H',data,2 * x, self.getAnimationBone(x).getNameIndex())
         off = ceilEight(self.getNumBones() * 2)
 
+        if self.__transforms is not None:
+            np.frombuffer(data, dtype="<f4", count=self.__transforms.size, offset=off)[:] = self.__transforms.ravel()
+        else:
+            self.__packTransforms(data, off)
+        struct.pack_into('<hHIII',self.getHeaderBytes(),0,self.getNameIndex(),self.getNumBones(),self.getNumFrames(),self.getFpsNumerator(), self.getFpsDenominator())
+
+    def __packTransforms(self, data, off):
         for f in range(self.getNumFrames()):
             for b in range(self.getNumBones()):
                 bone = self.getAnimationBone(b)
@@ -905,7 +1225,6 @@ class PapaAnimation(PapaComponent):
                 q = bone.getRotation(f)
                 struct.pack_into('<fffffff', data, off,t[0],t[1],t[2],q[0],q[1],q[2],q[3])
                 off+=28
-        struct.pack_into('<hHIII',self.getHeaderBytes(),0,self.getNameIndex(),self.getNumBones(),self.getNumFrames(),self.getFpsNumerator(), self.getFpsDenominator())
     
     def applyOffset(self, offset):
         if(self.getNumBones() !=0):
@@ -924,12 +1243,297 @@ class PapaAnimation(PapaComponent):
     def bodySize(self):
         return ceilEight(2 * self.getNumBones()) + (28 * self.getNumBones() * self.getNumFrames())
 
+class PapaFileInfo:
+    # lightweight summary of a papa file, see PapaFile.peek
+    def __init__(self, filepath: str, signature: str, counts: dict, textures: list, models: list, animations: list):
+        self.__filepath = filepath
+        self.__signature = signature
+        self.__counts = counts
+        self.__textures = textures
+        self.__models = models
+        self.__animations = animations
+
+    def getFilepath(self) -> str:
+        return self.__filepath
+
+    def getSignature(self) -> str:
+        return self.__signature
+
+    def getCounts(self) -> dict: # section name -> number of components
+        return self.__counts
+
+    def getCount(self, section: str) -> int:
+        return self.__counts[section]
+
+    def getTextures(self) -> list: # one dict per texture: name, format, width, height, srgb, mips, linked
+        return self.__textures
+
+    def getModelNames(self) -> list:
+        return self.__models
+
+    def getAnimationNames(self) -> list:
+        return self.__animations
+
+    def __str__(self):
+        string = "PapaFileInfo: " + str(self.__filepath)
+        if self.__signature != "":
+            string += " (" + self.__signature + ")"
+        for section, count in self.__counts.items():
+            if count != 0:
+                string += "\n\t" + section + ": " + str(count)
+        for texture in self.__textures:
+            string += "\n\tTexture \"" + texture["name"] + "\": " + texture["format"] + " (" + str(texture["width"]) + ", " + str(texture["height"]) + ")" \
+                + (" linked" if texture["linked"] else "")
+        for name in self.__models:
+            string += "\n\tModel \"" + name + "\""
+        for name in self.__animations:
+            string += "\n\tAnimation \"" + name + "\""
+        return string
+
+class PapaTextureCache:
+    # Process wide cache of textures read through links, so textures shared by many files are only decoded once. Entries are
+    # keyed by the real path and modification time of the texture file and evicted least recently used first once the
+    # decoded data exceeds the budget.
+    __instance = None
+    defaultBudget = 128 * 1024 * 1024 # bytes, the add-on replaces it with its preference
+
+    def __init__(self, budget: int = defaultBudget):
+        self.__budget = budget
+        self.__size = 0
+        self.__entries = OrderedDict() # key -> (texture, name, size)
+        self.__mediaDirectories = {} # directory -> the directory holding its 'pa' or 'pa_ex1' ancestor, or None
+        self.__lock = threading.Lock()
+
+    @staticmethod
+    def __textureSize(texture: PapaTexture) -> int:
+        imageData = texture.getImageData()
+        size = imageData.nbytes if isinstance(imageData, np.ndarray) else len(imageData) * 4
+        for level in texture.getMipLevels() or []:
+            size += len(level[2])
+        return size
+
+    @staticmethod
+    def __key(filepath: str, mipLevel: int, pixelFormat: str):
+        # None if the file does not exist
+        realPath = path.realpath(filepath)
+        try:
+            stat = os.stat(realPath)
+        except OSError:
+            return None
+        return (path.normcase(realPath), stat.st_mtime_ns, stat.st_size, mipLevel, pixelFormat)
+
+    def findMediaDirectory(self, filepath: str):
+        # keep looking up the path until we are in the 'pa' or 'pa_ex1' directory, then step out of it into 'media'
+        directory = str(Path(filepath).parent)
+        with self.__lock:
+            if directory in self.__mediaDirectories:
+                return self.__mediaDirectories[directory]
+
+        current = Path(directory)
+        lastPath = None
+        while current != lastPath and current.name.lower() != "pa" and current.name.lower() != "pa_ex1":
+            lastPath = current
+            current = current.parent
+        mediaDirectory = None if current == lastPath else str(current.parent)
+
+        with self.__lock:
+            self.__mediaDirectories[directory] = mediaDirectory
+        return mediaDirectory
+
+    def getTexture(self, filepath: str, mipLevel: int, pixelFormat: str):
+        # returns (texture, name) if the file is cached and unchanged, None otherwise
+        key = PapaTextureCache.__key(filepath, mipLevel, pixelFormat)
+        with self.__lock:
+            entry = self.__entries.get(key)
+            if entry == None:
+                return None
+            self.__entries.move_to_end(key)
+            return entry[0], entry[1]
+
+    def addTexture(self, filepath: str, mipLevel: int, pixelFormat: str, texture: PapaTexture, name: str):
+        key = PapaTextureCache.__key(filepath, mipLevel, pixelFormat)
+        size = PapaTextureCache.__textureSize(texture)
+        if key == None or size > self.__budget:
+            return
+        if isinstance(texture.getImageData(), np.ndarray): # shared by every file that links it
+            texture.getImageData().setflags(write=False)
+        with self.__lock:
+            if key in self.__entries:
+                self.__size -= self.__entries.pop(key)[2]
+            self.__entries[key] = (texture, name, size)
+            self.__size += size
+            self.__evict()
+
+    def __evict(self):
+        while self.__size > self.__budget and len(self.__entries) != 0:
+            self.__size -= self.__entries.popitem(last=False)[1][2]
+
+    def clear(self):
+        with self.__lock:
+            self.__entries.clear()
+            self.__mediaDirectories.clear()
+            self.__size = 0
+
+    def getSize(self) -> int:
+        return self.__size
+
+    def getNumTextures(self) -> int:
+        return len(self.__entries)
+
+    def getBudget(self) -> int:
+        return self.__budget
+
+    def setBudget(self, budget: int):
+        # a budget of 0 disables the cache
+        with self.__lock:
+            self.__budget = budget
+            self.__evict()
+
+    @classmethod
+    def getInstance(cls):
+        return cls.__instance
+
+    @classmethod
+    def setup(cls, budget: int = defaultBudget):
+        cls.__instance = PapaTextureCache(budget)
+
+class PapaBufferPool:
+    # Process wide pool of destination arrays for decoded pixels. A batch import decodes many textures of the same few sizes,
+    # so arrays handed back once their pixels have been copied into Blender are given out again instead of allocating new
+    # ones for every texture. Released arrays are kept until the budget is exceeded, oldest first.
+    __instance = None
+    defaultBudget = 256 * 1024 * 1024 # bytes
+
+    def __init__(self, budget: int = defaultBudget):
+        self.__budget = budget
+        self.__size = 0
+        self.__free = [] # oldest first
+        self.__lock = threading.Lock()
+
+    def acquire(self, count: int, dtype) -> np.ndarray:
+        # a 1D array of count values, the contents are undefined
+        dtype = np.dtype(dtype)
+        with self.__lock:
+            for i in range(len(self.__free) - 1, -1, -1):
+                array = self.__free[i]
+                if array.size == count and array.dtype == dtype:
+                    del self.__free[i]
+                    self.__size -= array.nbytes
+                    return array
+        return np.empty(count, dtype=dtype)
+
+    def release(self, array):
+        # only arrays nothing else can see are taken: views, read only (shared) arrays and lists are ignored. The caller
+        # must not use the array afterwards
+        if not isinstance(array, np.ndarray) or array.base is not None or not array.flags.owndata or not array.flags.writeable \
+                or array.ndim != 1 or array.nbytes > self.__budget:
+            return
+        with self.__lock:
+            if any(array is other for other in self.__free):
+                return
+            self.__free.append(array)
+            self.__size += array.nbytes
+            self.__evict()
+
+    def __evict(self):
+        while self.__size > self.__budget and len(self.__free) != 0:
+            self.__size -= self.__free.pop(0).nbytes
+
+    def clear(self):
+        with self.__lock:
+            self.__free.clear()
+            self.__size = 0
+
+    def getSize(self) -> int:
+        return self.__size
+
+    def getNumBuffers(self) -> int:
+        return len(self.__free)
+
+    def getBudget(self) -> int:
+        return self.__budget
+
+    def setBudget(self, budget: int):
+        # a budget of 0 disables the pool
+        with self.__lock:
+            self.__budget = budget
+            self.__evict()
+
+    @classmethod
+    def getInstance(cls):
+        return cls.__instance
+
+    @classmethod
+    def setup(cls, budget: int = defaultBudget):
+        cls.__instance = PapaBufferPool(budget)
+
 class PapaFile:
 
     textureLibrary = None
+    textureLibraryPath = None # where the loaded library came from
+    textureLibraryVersion = 2 # must match PTEX_VERSION in texture.c
+    __libraryBuild = None # the thread building the texture library, started by the first texture that needs it
+    __libraryBuildLock = threading.Lock()
+    textureLibraryPrototypes = { # name: (restype, argtypes)
+        "getLibraryVersion": (ctypes.c_int, ()),
+        "getSimdLevel": (ctypes.c_int, ()),
+        "setSimdLevel": (ctypes.c_int, (ctypes.c_int,)),
+        "getProcessorCount": (ctypes.c_int, ()),
+        "textureDataSize": (ctypes.c_longlong, (ctypes.c_int, ctypes.c_int, ctypes.c_int)),
+        "decodedTextureSize": (ctypes.c_longlong, (ctypes.c_int, ctypes.c_int, ctypes.c_int)),
+        "decodeTexture": (None, (ctypes.c_char_p, ctypes.c_int, ctypes.c_int, ctypes.c_int, ctypes.c_void_p)),
+        "decodeTextureBytes": (None, (ctypes.c_char_p, ctypes.c_int, ctypes.c_int, ctypes.c_int, ctypes.c_void_p)),
+        "decodeTextureMT": (None, (ctypes.c_char_p, ctypes.c_int, ctypes.c_int, ctypes.c_int, ctypes.c_void_p, ctypes.c_int)),
+        "decodeTextureBytesMT": (None, (ctypes.c_char_p, ctypes.c_int, ctypes.c_int, ctypes.c_int, ctypes.c_void_p, ctypes.c_int)),
+        "decodeTextureInto": (ctypes.c_int, (ctypes.c_char_p, ctypes.c_longlong, ctypes.c_int, ctypes.c_int, ctypes.c_int, ctypes.c_int,
+            ctypes.c_void_p, ctypes.c_longlong, ctypes.c_int)),
+        "decodeMipLevel": (ctypes.c_int, (ctypes.c_char_p, ctypes.c_longlong, ctypes.c_int, ctypes.c_int, ctypes.c_int, ctypes.c_int,
+            ctypes.c_int, ctypes.c_void_p, ctypes.c_longlong, ctypes.c_int)),
+        "decodeTextureRegion": (ctypes.c_int, (ctypes.c_char_p, ctypes.c_longlong, ctypes.c_int, ctypes.c_int, ctypes.c_int, ctypes.c_int,
+            ctypes.c_int, ctypes.c_int, ctypes.c_int, ctypes.c_int, ctypes.c_void_p, ctypes.c_longlong)),
+        "encodeTexture": (ctypes.c_int, (ctypes.c_void_p, ctypes.c_int, ctypes.c_int, ctypes.c_int, ctypes.c_int, ctypes.c_void_p)),
+        "encodeTextureMT": (ctypes.c_int, (ctypes.c_void_p, ctypes.c_int, ctypes.c_int, ctypes.c_int, ctypes.c_int, ctypes.c_void_p,
+            ctypes.c_int)),
+    }
+    # textureWorkers is the number of textures in a file decoded at once, 0 uses every processor and 1 decodes them one after
+    # another. textureThreads is the number of threads a single native decode or encode uses, 0 uses every processor. When
+    # several textures decode at once textureWorkers wins: textureThreads (or every processor) is split between the workers
+    # so that a file never runs more decoding threads than that in total
+    textureThreads = 0
+    textureWorkers = 0
+    __workerThreads = threading.local() # the share of textureThreads a pool worker's decodes use
+    buildOrder = [7,5,4,1,2,3,6,8,0] # the order the compiler writes the tables in
+    sectionNames = ["strings", "textures", "vertexBuffers", "indexBuffers", "materials", "meshes", "skeletons", "models", "animations"]
+
+    @classmethod
+    def loadTextureLibrary(cls, threads: int = None, build: bool = True):
+        # threads replaces textureThreads when given. A library next to this file is preferred, then one already built into
+        # the per user cache. Otherwise texture.c is compiled into the cache when build is set, which can take a while, so
+        # importing this module never builds and requestTextureLibrary builds on demand
+        if threads != None:
+            cls.textureThreads = threads
+        cls.textureLibrary = None
+        cls.textureLibraryPath = None
+        cls.__findTextureLibrary(build)
+
+    @classmethod
+    def requestTextureLibrary(cls, wait: bool = False) -> bool:
+        # starts building the texture library on a background thread the first time a texture needs it. Until the build has
+        # finished textures are decoded with NumPy, wait blocks until it has. Returns whether the library is loaded
+        if cls.textureLibrary:
+            return True
+        with cls.__libraryBuildLock:
+            if cls.__libraryBuild == None:
+                cls.__libraryBuild = threading.Thread(target=cls.__findTextureLibrary, args=(True,), name="Papa IO texture library build",
+                    daemon=True)
+                cls.__libraryBuild.start()
+            libraryBuild = cls.__libraryBuild
+        if wait:
+            libraryBuild.join()
+        return cls.textureLibrary != None
 
     @classmethod
-    def loadTextureLibrary(cls):
+    def __findTextureLibrary(cls, build: bool):
         # Code sourced from https://stackoverflow.com/questions/50168719/python-load-library-from-different-platform-windows-linux-or-os-x
         platName = platform.uname()[0]
         libName = ""
@@ -940,30 +1544,176 @@ class PapaFile:
         else:
             libName = "PTex.dylib"
         libPath = path.dirname(path.abspath(__file__)) + path.sep + libName
-        if path.exists(libPath):
-            try:
-                cls.textureLibrary = ctypes.cdll.LoadLibrary(libPath)
-                cls.textureLibrary.argTypes = (ctypes.c_char_p, ctypes.c_int, ctypes.c_int, ctypes.c_int, ctypes.POINTER(ctypes.POINTER(ctypes.c_float)))
-                cls.textureLibrary.resType = None
-                print("Papa IO: Texture library "+libName+" successfully loaded.")
-                return
-            except Exception as e:
-                print("Papa IO: Error loading texture library "+libName+", Python decompiler will be used. ("+str(e)+")")
+        if path.exists(libPath) and cls.__loadLibraryFile(libPath):
+            print("Papa IO: Texture library "+libName+" successfully loaded.")
+            return
+
+        libPath = cls.__textureLibraryCachePath(libName)
+        if libPath != None and path.exists(libPath) and cls.__loadLibraryFile(libPath):
+            print("Papa IO: Texture library "+libPath+" successfully loaded.")
+            return
+        if build:
+            if libPath != None and not path.exists(libPath) and cls.__buildTextureLibrary(libPath) and cls.__loadLibraryFile(libPath):
+                print("Papa IO: Texture library "+libPath+" successfully loaded.")
                 return
-        print("Papa IO: Texture library "+libName+" not found, Python decompiler will be used.")
+            print("Papa IO: Texture library "+libName+" not available, NumPy decoder will be used.")
+
+    @classmethod
+    def __loadLibraryFile(cls, libPath: str) -> bool:
+        try:
+            library = ctypes.cdll.LoadLibrary(libPath)
+            version = library.getLibraryVersion() if hasattr(library, "getLibraryVersion") else 1
+            if version != cls.textureLibraryVersion: # the exports of a stale build won't match the prototypes below
+                print("Papa IO: Texture library "+libPath+" is version "+str(version)+", expected version "
+                    +str(cls.textureLibraryVersion)+". Rebuild it from texture.c.")
+                return False
+            for name, (restype, argtypes) in cls.textureLibraryPrototypes.items():
+                function = getattr(library, name)
+                function.restype = restype
+                function.argtypes = argtypes
+        except Exception as e:
+            print("Papa IO: Error loading texture library "+libPath+". ("+str(e)+")")
+            return False
+        cls.textureLibrary = library
+        cls.textureLibraryPath = libPath
+        return True
+
+    @staticmethod
+    def textureLibraryCacheDirectory() -> str:
+        platName = platform.uname()[0]
+        if platName == "Windows":
+            base = os.environ.get("LOCALAPPDATA") or path.expanduser("~")
+        elif platName == "Darwin":
+            base = path.join(path.expanduser("~"), "Library", "Caches")
+        else:
+            base = os.environ.get("XDG_CACHE_HOME") or path.join(path.expanduser("~"), ".cache")
+        return path.join(base, "papa_io")
+
+    @classmethod
+    def __textureLibraryCachePath(cls, libName: str):
+        # builds are keyed by the source and the machine so an edited source or a shared home directory never picks up the
+        # wrong build. Returns None without a texture.c to build from
+        sourcePath = path.join(path.dirname(path.abspath(__file__)), "texture.c")
+        if not path.exists(sourcePath):
+            return None
+        with open(sourcePath, 'rb') as file:
+            source = file.read()
+        key = hashlib.sha256(source + platform.machine().encode() + str(struct.calcsize("P")).encode()).hexdigest()[:16]
+        return path.join(cls.textureLibraryCacheDirectory(), key, libName)
+
+    @staticmethod
+    def __buildTextureLibrary(libPath: str) -> bool:
+        # compiles texture.c with the system C compiler into libPath
+        sourcePath = path.join(path.dirname(path.abspath(__file__)), "texture.c")
+        libName = path.basename(libPath)
+        compiler = os.environ.get("CC") or shutil.which("cc") or shutil.which("gcc") or shutil.which("clang")
+        if compiler == None:
+            print("Papa IO: No C compiler found to build the texture library.")
+            return False
+        print("Papa IO: Building texture library with " + compiler + "...")
+        tempPath = None
+        try:
+            os.makedirs(path.dirname(libPath), exist_ok=True)
+            # build next to the destination and move it into place so that concurrent builds never load a partial file
+            fileHandle, tempPath = tempfile.mkstemp(suffix=path.splitext(libName)[1], dir=path.dirname(libPath))
+            os.close(fileHandle)
+            command = shlex.split(compiler) + ["-O2", "-shared", "-fPIC", "-o", tempPath, sourcePath]
+            if platform.uname()[0] != "Windows":
+                command += ["-pthread", "-lm"]
+            result = subprocess.run(command, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, timeout=300)
+            if result.returncode != 0:
+                print("Papa IO: Building the texture library failed:\n" + result.stdout.decode(errors="replace"))
+                return False
+            os.replace(tempPath, libPath)
+            tempPath = None
+        except (OSError, subprocess.SubprocessError) as e:
+            print("Papa IO: Building the texture library failed. (" + str(e) + ")")
+            return False
+        finally:
+            if tempPath != None and path.exists(tempPath):
+                os.remove(tempPath)
+        return True
 
-    def __init__(self, filepath: str = None, verbose = False, readLinked = False, signature = ""):
+    @classmethod
+    def getTextureDecoder(cls) -> str:
+        # the decoder used when none is requested, "native" or "numpy"
+        return "native" if cls.textureLibrary else "numpy"
+
+    def __init__(self, filepath: str = None, verbose = False, readLinked = False, signature = "", lazy = False, sections = None, mipLevel = 0,
+                pixelFormat = "float"):
         self.__verbose = verbose
         self.__filepath = filepath
         self.__readLinked = readLinked
+        self.__mipLevel = mipLevel # the mip level to decode textures at, clamped to the smallest level each texture has
+        if not pixelFormat in PapaTexture.pixelFormats:
+            raise ValueError("Unknown pixel format \"" + str(pixelFormat) + "\"")
+        self.__pixelFormat = pixelFormat # the layout textures are decoded into, see PapaTexture.pixelFormats
         self.__signature = signature
+        self.__lazy = lazy # only parse the headers, each component is decoded the first time it is requested
+        if sections != None: # names from sectionNames, the string table is always read so that lookups keep working
+            for section in sections:
+                if not section in PapaFile.sectionNames:
+                    raise ValueError("Unknown papa file section \"" + str(section) + "\"")
+            sections = set(sections)
+            sections.add("strings")
+        self.__sections = sections
+        self.__file = None
         self.__setupData()
         if filepath != None:
             file = open(filepath, 'rb')
             try:
-                self.__parseData(file)
+                if lazy: # the file is kept mapped until close() is called
+                    self.__file = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+                    self.__parseData(self.__file)
+                else:
+                    self.__file = file
+                    self.__parseData(file)
+                    self.__loadAll()
             finally:
                 file.close()
+                if not lazy:
+                    self.__file = None
+
+    def close(self):
+        # releases the mapped file of a lazy PapaFile. Components that have not been requested yet can no longer be loaded
+        if self.__file != None:
+            self.__file.close()
+            self.__file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, excType, excValue, traceback):
+        self.close()
+
+    def isLazy(self):
+        return self.__lazy
+
+    @classmethod
+    def peek(cls, filepath: str) -> PapaFileInfo:
+        # summarizes a file using only the header, the table headers and the referenced strings. No payload data is decoded
+        with cls(filepath, lazy=True) as papaFile:
+            return papaFile.__readInfo()
+
+    def __readInfo(self) -> PapaFileInfo:
+        counts = {}
+        for x in range(len(PapaFile.sectionNames)):
+            counts[PapaFile.sectionNames[x]] = len(self.__allComponents[x])
+
+        textures = []
+        for header in self.__textureHeaders:
+            textures.append({
+                "name": self.getString(header[0]),
+                "format": PapaTexture.formatMap.get(header[1], "UNKNOWN"),
+                "width": header[3],
+                "height": header[4],
+                "srgb": header[2] & 0b1000_0000 == 0b1000_0000,
+                "mips": PapaTexture.mipLevelCount(header[1], header[3], header[4], header[2] & 0b0000_1111, header[5]),
+                "linked": header[5] == -1 or header[6] == -1,
+            })
+        models = [self.getString(header[0]) for header in self.__modelHeaders]
+        animations = [self.getString(header[0]) for header in self.__animationHeaders]
+        return PapaFileInfo(self.__filepath, self.__signature, counts, textures, models, animations)
 
     def logv(self, string):
         if(self.__verbose):
@@ -983,8 +1733,29 @@ class PapaFile:
         self.__allComponents = [self.__stringTable, self.__textureTable, self.__vertexBufferTable, self.__indexBufferTable, self.__materialTable, 
             self.__meshTable, self.__skeletonTable, self.__modelTable, self.__animationTable]
 
+        # the index of each entry keyed by string value for the string table and by identity for the rest, so the add methods don't
+        # have to scan. Built on first use and then kept in step by __appendComponent and __setComponent
+        self.__internTables = [None] * len(self.__allComponents)
+
+        # the per table headers as read from the file, one tuple per component
+        self.__stringHeaders = []
+        self.__textureHeaders = []
+        self.__vertexBufferHeaders = []
+        self.__indexBufferHeaders = []
+        self.__materialHeaders = []
+        self.__meshHeaders = []
+        self.__skeletonHeaders = []
+        self.__modelHeaders = []
+        self.__animationHeaders = []
+
+        self.__componentReaders = [self.__readString, self.__readTexture, self.__readVBuffer, self.__readIBuffer, self.__readMaterial,
+            self.__readMesh, self.__readSkeleton, self.__readModel, self.__readAnimation]
+
     # ---------- decompiler portion -------------
 
+    __unloaded = object() # placeholder for a component that has not been decoded yet
+    __tableNames = ["Strings", "Textures", "Vertex Buffers", "Index Buffers", "Materials", "Meshes", "Skeletons", "Models", "Animations"]
+
     def __parseData(self, file):
         #PapaFile, I=UINT(32), H=USHORT(16), q=LONG(64)
         header = struct.unpack('<IHHHHHHHHHHHHHHqqqqqqqqq', file.read(104))
@@ -1024,36 +1795,109 @@ class PapaFile:
         self.__offsetModelHeader = header[22]
         self.__offsetAnimationHeader = header[23]
 
-        self.__readStrings(file)
-        self.__readTextures(file)
-        self.__readVBuffers(file)
-        self.__readIBuffers(file)
-        self.__readMaterials(file)
-        self.__readMeshes(file)
-        self.__readSkeletons(file)
-        self.__readModels(file)
-        self.__readAnimations(file)
-        
-    def __readStrings(self, file):
-        if (self.__offsetStringsHeader < 0):
+        self.__stringHeaders = self.__readTableHeader(file, self.__offsetStringsHeader, self.__numberOfStrings, '<qq')
+        self.__textureHeaders = self.__readTableHeader(file, self.__offsetTexturesHeader, self.__numberOfTextures, '<hBBHHqq')
+        self.__vertexBufferHeaders = self.__readTableHeader(file, self.__offsetVerticesHeader, self.__numberOfVertexBuffers, '<IIqq')
+        self.__indexBufferHeaders = self.__readTableHeader(file, self.__offsetIndicesHeader, self.__numberOfIndexBuffers, '<BxxxIqq')
+        self.__materialHeaders = self.__readTableHeader(file, self.__offsetMaterialsHeader, self.__numberOfMaterials, '<HHHHqqq')
+        self.__meshHeaders = self.__readTableHeader(file, self.__offsetMeshHeader, self.__numberOfMeshes, '<HHHxxq')
+        self.__skeletonHeaders = self.__readTableHeader(file, self.__offsetSkeletonHeader, self.__numberOfSkeletons, '<Hxxxxxxq')
+        self.__modelHeaders = self.__readTableHeader(file, self.__offsetModelHeader, self.__numberOfModels, '<hhHxxffffffffffffffffq')
+        self.__animationHeaders = self.__readTableHeader(file, self.__offsetAnimationHeader, self.__numberOfAnimations, '<hHIIIqq')
+
+        tableHeaders = [self.__stringHeaders, self.__textureHeaders, self.__vertexBufferHeaders, self.__indexBufferHeaders, self.__materialHeaders,
+            self.__meshHeaders, self.__skeletonHeaders, self.__modelHeaders, self.__animationHeaders]
+        for x in range(len(self.__allComponents)):
+            # skipped sections keep their size so that indices into them stay valid
+            skipped = self.__sections != None and not PapaFile.sectionNames[x] in self.__sections
+            self.__allComponents[x].extend([None if skipped else PapaFile.__unloaded] * len(tableHeaders[x]))
+
+    def __readTableHeader(self, file, offset, count, fmt):
+        if offset < 0:
+            return []
+        file.seek(offset)
+        return list(struct.iter_unpack(fmt, file.read(struct.calcsize(fmt) * count)))
+
+    def __loadAll(self):
+        for x in range(len(self.__allComponents)):
+            table = self.__allComponents[x]
+            if not PapaFile.__unloaded in table:
+                continue
+            self.logv("Loading " + PapaFile.__tableNames[x] + "...")
+            if table is self.__textureTable and table.count(PapaFile.__unloaded) > 1 and PapaFile.textureWorkers != 1:
+                self.__loadTextures()
+                continue
+            for i in range(len(table)):
+                self.__getComponent(x, i)
+
+    def __loadTextures(self):
+        # the file is read serially, then every texture (embedded or linked) is decoded on a bounded thread pool. The native
+        # library and NumPy release the GIL while decoding. Textures are finished in table order so that the strings they add,
+        # and therefore the indices texture parameters depend on, are the same as reading them one after another
+        indices = [i for i in range(len(self.__textureTable)) if self.__textureTable[i] is PapaFile.__unloaded]
+        if self.__file == None:
+            raise IOError("Cannot load entry " + str(indices[0]) + " of " + PapaFile.__tableNames[1] + ", the file has been closed")
+        sources = [self.__readTextureSource(self.__file, i) for i in indices]
+        processors = os.cpu_count() or 1
+        workers = min(PapaFile.textureWorkers if PapaFile.textureWorkers > 0 else processors, len(indices))
+        if workers == 1:
+            results = list(map(self.__decodeTexture, indices, sources))
+        else:
+            threads = max(1, (PapaFile.textureThreads if PapaFile.textureThreads > 0 else processors) // workers)
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                results = list(executor.map(lambda x, source: self.__decodeTextureShared(x, source, threads), indices, sources))
+        for i, (source, result) in zip(indices, results):
+            self.__setComponent(1, i, self.__finishTexture(i, source, result))
+
+    def __getComponent(self, tableIndex: int, index: int):
+        table = self.__allComponents[tableIndex]
+        component = table[index]
+        if component is PapaFile.__unloaded:
+            if self.__file == None:
+                raise IOError("Cannot load entry " + str(index) + " of " + PapaFile.__tableNames[tableIndex] + ", the file has been closed")
+            if index < 0:
+                index += len(table)
+            component = self.__componentReaders[tableIndex](self.__file, index)
+            self.__setComponent(tableIndex, index, component)
+        return component
+
+    def __setComponent(self, tableIndex: int, index: int, component):
+        self.__allComponents[tableIndex][index] = component
+        self.__internComponent(tableIndex, index, component)
+
+    def __appendComponent(self, tableIndex: int, component) -> int:
+        table = self.__allComponents[tableIndex]
+        table.append(component)
+        self.__internComponent(tableIndex, len(table) - 1, component)
+        return len(table) - 1
+
+    def __internComponent(self, tableIndex: int, index: int, component):
+        internTable = self.__internTables[tableIndex]
+        if internTable == None or component is None or component is PapaFile.__unloaded:
             return
-        
-        file.seek(self.__offsetStringsHeader)
-        self.logv("Loading Strings...")
-        for i in range(0, self.__numberOfStrings):
-            currentString = struct.unpack('<qq', file.read(16))
-            length = currentString[0]
-            stringOffset = currentString[1]
-            
-            restore = file.tell() # returns the current position reading from in the file
-
-            file.seek(stringOffset)
-            self.__stringTable.append(PapaString(file.read(length).decode("utf-8")))
-            self.logv("\"" + str(self.__stringTable[len(self.__stringTable) - 1]) + "\"")
-
-            file.seek(restore)
-
-    def __dxtDecodeColourMap(self, data):
+        # the first entry wins, the same one a scan from the start would find
+        internTable.setdefault(component.getString() if tableIndex == 0 else component, index)
+
+    def __getInternTable(self, tableIndex: int) -> dict:
+        internTable = self.__internTables[tableIndex]
+        if internTable == None:
+            internTable = self.__internTables[tableIndex] = {}
+            table = self.__allComponents[tableIndex]
+            for index in range(len(table)):
+                # strings have to be read to be keyed, unloaded components can't be the object being looked up
+                component = self.__getComponent(0, index) if tableIndex == 0 else table[index]
+                self.__internComponent(tableIndex, index, component)
+        return internTable
+
+    def __readString(self, file, x):
+        length, stringOffset = self.__stringHeaders[x]
+        file.seek(stringOffset)
+        string = PapaString(file.read(length).decode("utf-8"))
+        self.logv("\"" + str(string) + "\"")
+        return string
+
+    @staticmethod
+    def __dxtDecodeColourMap(data):
         colours = [None, None, None, None] # [R, G, B]
         colour0 = ((data[0]) | (data[1] << 8))
         colour1 = ((data[2]) | (data[3] << 8))
@@ -1082,7 +1926,8 @@ class PapaFile:
         colours[1][2]/=255
         return colours
 
-    def __dxtDecodeAlphaMap(self, data):
+    @staticmethod
+    def __dxtDecodeAlphaMap(data):
         alphaValues = [None] * 16
 
         alphaMap = [None] * 8
@@ -1110,536 +1955,768 @@ class PapaFile:
             alphaBits>>=3
         return alphaValues
 
-    def __readTextures(self, file):
-        if(self.__offsetTexturesHeader < 0):
-            return
-
-        file.seek(self.__offsetTexturesHeader)
-        self.logv("Loading Textures...")
-        papaTexturesHeader = []
-        for x in range(self.__numberOfTextures):
-            papaTexturesHeader.append(struct.unpack('<hBBHHqq', file.read(24))) # ignore mipmaps
-
-        # this is a compressed down version of PTexEdit's texture reader
-        for x in range(self.__numberOfTextures):
-            nameIndex = papaTexturesHeader[x][0]
-            formatIndex = papaTexturesHeader[x][1]
-            srgb = papaTexturesHeader[x][2] & 0b1000_0000 == 0b1000_0000
-            width = papaTexturesHeader[x][3]
-            height = papaTexturesHeader[x][4]
-            heightZero = height - 1 # 0 based index
-            dataSize = papaTexturesHeader[x][5] # unused
-            offsetTexture = papaTexturesHeader[x][6]
-
-            if(dataSize == -1 or offsetTexture == -1): # the texture is linked, see if we can find the source...
-                path = Path(self.__filepath)
-                lastPath = None
-                while path != lastPath and path.name.lower() != "pa" and path.name.lower() != "pa_ex1": # keep looking up the path until we are in the 'pa' or 'pa_ex1' directory
-                    lastPath = path
-                    path = path.parent
-
-                if path == lastPath or not Path(str(path.parent) + self.getString(nameIndex)).exists(): # failed to find it
-                    # we append None here because even if we miss, we should respect that the texture was meant to exist.
-                    # Not appending None would mean that indices would become incorrect later on (Texture Parameters)
-                    self.__textureTable.append(None)
-                    self.logv("Linked file for texture \"" + self.getString(nameIndex) + "\" cannot be found. Ignoring.")
-                    continue
+    @staticmethod
+    def __dxtDecodeExplicitAlphaMap(data):
+        alphaValues = [None] * 16
+        for i in range(8): # DXT3 stores 4 bits per texel, low bits first
+            alphaValues[i * 2] = (data[i] & 0b1111) * 17 / 255
+            alphaValues[i * 2 + 1] = (data[i] >> 4) * 17 / 255
+        return alphaValues
 
-                path = path.parent # move into 'media' directory (deferring this allows for better mod file support)
-                fullPath = str(path) + self.getString(nameIndex)
+    @classmethod
+    def decodeTextureData(cls, rawData: bytes, width: int, height: int, formatIndex: int, decoder: str = None, pixelFormat: str = "float",
+                out: np.ndarray = None):
+        # decodes a single mip level into a bottom up RGBA array. decoder may force "native", "numpy" or "python".
+        # pixelFormat "float" gives float32 values from 0 to 1, "byte" gives uint8 values at a quarter of the memory.
+        # out may be a contiguous array of width * height * 4 values of the pixel format's type, it is filled and returned
+        if not pixelFormat in PapaTexture.pixelFormats:
+            raise ValueError("Unknown pixel format \"" + str(pixelFormat) + "\"")
+        if out is not None:
+            pixelType = np.uint8 if pixelFormat == "byte" else np.float32
+            if out.dtype != pixelType or out.size != width * height * 4 or not out.flags.c_contiguous or not out.flags.writeable:
+                raise ValueError("Output array must be a writable contiguous " + np.dtype(pixelType).name + " array of "
+                    + str(width * height * 4) + " values")
+        if decoder == None:
+            cls.requestTextureLibrary()
+            decoder = cls.getTextureDecoder()
+
+        if decoder == "native":
+            if not cls.requestTextureLibrary(wait=True):
+                raise ReferenceError("Texture library is not loaded")
+            return cls.__decodeTextureNative(rawData, width, height, formatIndex, pixelFormat, out)
+        elif decoder == "numpy":
+            return cls.__decodeTextureNumpy(rawData, width, height, formatIndex, pixelFormat, out)
+        elif decoder == "python":
+            texData = cls.__decodeTexturePython(rawData, width, height, formatIndex)
+            if pixelFormat == "byte":
+                texData = np.rint(np.asarray(texData, dtype=np.float64) * 255).astype(np.uint8)
+        else:
+            raise ValueError("Unknown texture decoder \"" + str(decoder) + "\"")
+        if out is None:
+            return texData
+        out[:] = texData if len(texData) != 0 else 0
+        return out
 
-                if not self.__readLinked: # keep the texture stub anyway
-                    self.__stringTable.append(PapaString(fullPath))
-                    tex = PapaTexture(len(self.__stringTable)-1,-1,False,-1,-1,[], fullPath)
-                    self.__textureTable.append(tex)
-                    self.logv("(texture stub)")
-                    self.logv(self.__textureTable[len(self.__textureTable) - 1])
-                    continue
+    @classmethod
+    def decodeTextureRegion(cls, rawData: bytes, width: int, height: int, formatIndex: int, x: int, y: int, regionWidth: int,
+                regionHeight: int, pixelFormat: str = "float") -> np.ndarray:
+        # decodes the rectangle at (x, y) of a single mip level, measured from the top left like the file, into a bottom up
+        # RGBA array of regionWidth * regionHeight pixels. The native library only decodes the blocks covering the rectangle
+        if not pixelFormat in PapaTexture.pixelFormats:
+            raise ValueError("Unknown pixel format \"" + str(pixelFormat) + "\"")
+        if x < 0 or y < 0 or regionWidth <= 0 or regionHeight <= 0 or x + regionWidth > width or y + regionHeight > height:
+            raise ValueError("Region (" + str(x) + ", " + str(y) + ", " + str(regionWidth) + ", " + str(regionHeight)
+                + ") is outside of the " + str(width) + "x" + str(height) + " texture")
+        pixelType = np.uint8 if pixelFormat == "byte" else np.float32
+        if cls.requestTextureLibrary() and cls.textureLibrary.textureDataSize(formatIndex, width, height) != 0:
+            cls.__checkTextureDataSize(rawData, width, height, formatIndex)
+            texData = np.empty(regionWidth * regionHeight * 4, dtype=pixelType)
+            if cls.textureLibrary.decodeTextureRegion(rawData, len(rawData), width, height, formatIndex, PapaTexture.pixelFormats.index(pixelFormat),
+                    x, y, regionWidth, regionHeight, texData.ctypes.data, texData.nbytes):
+                return texData
+
+        texData = np.asarray(cls.decodeTextureData(rawData, width, height, formatIndex, pixelFormat=pixelFormat), dtype=pixelType)
+        if len(texData) == 0:
+            return np.zeros(regionWidth * regionHeight * 4, dtype=pixelType)
+        rows = texData.reshape(height, width, 4)[height - y - regionHeight:height - y, x:x + regionWidth]
+        return np.ascontiguousarray(rows).ravel()
 
-                subfile = PapaFile(fullPath)
-                if subfile.getNumTextures() != 1:
-                    self.__stringTable.append(PapaString(fullPath))
-                    tex = PapaTexture(len(self.__stringTable)-1,-1,False,-1,-1,[], fullPath)
-                    self.__textureTable.append(tex)
-                    self.logv("Linked file for texture \"" + self.getString(nameIndex) + "\" malformed. Creating texture stub")
-                    self.logv(tex)
-                    continue
-                
-                # copy the data to a new PapaTexture and create a new string for it (mildly jank)
-                tex = subfile.getTexture(0)
-                texName = subfile.getString(tex.getNameIndex())
-                self.__stringTable.append(PapaString(texName))
-                tex = PapaTexture(len(self.__stringTable)-1,tex.getFormatIndex(),tex.getSRGB(),tex.getWidth(),tex.getHeight(),tex.getImageData(), tex.getFilepath())
-
-                self.__textureTable.append(tex) # acquire the linked texture
-                self.logv("(externally loaded)")
-                self.logv(self.__textureTable[len(self.__textureTable) - 1])
-                continue
+    @classmethod
+    def __checkTextureDataSize(cls, rawData: bytes, width: int, height: int, formatIndex: int):
+        required = cls.textureLibrary.textureDataSize(formatIndex, width, height)
+        if len(rawData) < required:
+            raise IOError("Texture data is " + str(len(rawData)) + " bytes, a " + str(width) + "x" + str(height) + " "
+                + PapaTexture.formatMap.get(formatIndex, "UNKNOWN") + " texture needs " + str(required))
 
-            numberOfPixels = width * height
-            numberOfValues = numberOfPixels * 4 # (destination, not source)
-            texData = []
-
-            if PapaFile.textureLibrary:
-                file.seek(offsetTexture)
-                if(formatIndex==13): # R8
-                    rawData = file.read(numberOfPixels)
-                elif formatIndex == 1 or formatIndex == 2 or formatIndex == 3:
-                    rawData = file.read(numberOfValues)
-                elif formatIndex == 4: # DXT1
-                    rawData = file.read(ceil(width/4) * ceil(height / 4) * 8) # 8 bytes per block
-                elif formatIndex == 6: # DXT5
-                    rawData = file.read(ceil(width/4) * ceil(height / 4) * 16) # 16 bytes per block
-                
-                if (numberOfValues & (numberOfValues-1)) == 0: # test if the number of values is a power of two
-                    # if it is, we can allocate our array faster using this method (don't ask why this is faster because i don't know)
-                    texData = array('f',[0.0])
-                    for _ in range(int(log2(numberOfValues))):
-                        texData.extend(texData)
-                else:
-                    texData = array('f',[0.0] * numberOfValues)
-                dataPointer = texData.buffer_info()[0]
-                PapaFile.textureLibrary.decodeTexture(ctypes.c_char_p(rawData), ctypes.c_int(width), ctypes.c_int(height),
-                    ctypes.c_int(formatIndex), ctypes.cast(dataPointer,ctypes.POINTER(ctypes.c_float)))
+    @classmethod
+    def encodeTextureData(cls, pixels, width: int, height: int, formatIndex: int, highQuality: bool = False, encoder: str = None) -> bytes:
+        # the inverse of decodeTextureData, encodes bottom up RGBA pixels of either pixel format into the raw data of a
+        # single mip level. encoder may force the DXT encoder to "native" or "numpy", highQuality selects the slower mode of
+        # the native encoder. The NumPy encoder only has the fast mode, so highQuality waits for the native library to build and
+        # only falls back to NumPy, with a warning, when it is not available
+        pixels = np.asarray(pixels)
+        if pixels.dtype != np.uint8:
+            pixels = np.rint(np.clip(pixels, 0, 1) * 255).astype(np.uint8)
+        pixels = np.ascontiguousarray(pixels.reshape(height, width, 4)[::-1]) # back to top down
+
+        if formatIndex == 1: # RGBA8888
+            return pixels.tobytes()
+        elif formatIndex == 2: # RGBX8888
+            pixels[:,:,3] = 255
+            return pixels.tobytes()
+        elif formatIndex == 3: # BGRA8888
+            return pixels[:,:,[2,1,0,3]].tobytes()
+        elif formatIndex == 13: # R8
+            return pixels[:,:,0].tobytes()
+        elif formatIndex == 4 or formatIndex == 6: # DXT1, DXT5
+            if encoder == "numpy" and highQuality:
+                raise ValueError("The NumPy texture encoder has no high quality mode")
+            hasEncoder = cls.requestTextureLibrary(wait=encoder == "native" or highQuality)
+            if encoder == None:
+                encoder = "native" if hasEncoder else "numpy"
+                if highQuality and not hasEncoder:
+                    print("Papa IO: Texture library not available, high quality compression falls back to the NumPy encoder's fast mode.")
+            if encoder == "numpy":
+                return cls.__encodeTextureNumpy(pixels, width, height, formatIndex)
+            elif encoder != "native":
+                raise ValueError("Unknown texture encoder \"" + str(encoder) + "\"")
+            if not hasEncoder:
+                raise ReferenceError("Texture library is not loaded")
+            data = np.empty(PapaTexture.levelDataSize(formatIndex, width, height), dtype=np.uint8)
+            if cls.textureThreads != 1:
+                cls.textureLibrary.encodeTextureMT(pixels.ctypes.data, width, height, formatIndex, 1 if highQuality else 0, data.ctypes.data,
+                    cls.textureThreads)
             else:
-                # for some reason blender flips this data across the x axis, so we must invert y
-                file.seek(offsetTexture)
-                if formatIndex == 1: # RGBA8888
-                    texData = [None] * numberOfValues
-                    tempData = struct.unpack('<' + 'B' * numberOfValues,file.read(numberOfValues))
-                    for y in range(height):
-                        for x in range(width):
-                            i = (x + (heightZero - y) * width) * 4
-                            i2 = (x + y * width) * 4
-                            texData[i] = tempData[i2] / 255
-                            texData[i+1] = tempData[i2+1] / 255
-                            texData[i+2] = tempData[i2+2] / 255
-                            texData[i+3] = tempData[i2+3] / 255
-                elif formatIndex == 2: # RGBX8888
-                    texData = [None] * numberOfValues
-                    tempData = struct.unpack('<' + 'B' * numberOfValues,file.read(numberOfValues)) # ignore alpha data
-                    for y in range(height):
-                        for x in range(width):
-                            i = (x + (heightZero - y) * width) * 4
-                            i2 = (x + y * width) * 4
-                            texData[i]=tempData[i2]/255
-                            texData[i+1]=tempData[i2+1]/255
-                            texData[i+2]=tempData[i2+2]/255
-                            texData[i+3]=1
-                elif formatIndex == 3: #BGRA8888
-                    texData = [None] * numberOfValues
-                    tempData = struct.unpack('<' + 'B' * numberOfValues,file.read(numberOfValues))
-                    for y in range(height):
-                        for x in range(width):
-                            i = (x + (heightZero - y) * width) * 4
-                            i2 = (x + y * width) * 4
-                            texData[i]=tempData[i2]/255
-                            texData[i+1]=tempData[i2+1]/255
-                            texData[i+2]=tempData[i2+2]/255
-                            texData[i+3]=tempData[i2+3]/255
-                            t = texData[i]
-                            texData[i] = texData[i2+2]
-                            texData[i+2] = t
-                elif formatIndex == 4: # DXT1
-                    texData = [None] * numberOfValues
-
-                    for y in range(0,height,4):
-                        for x in range(0,width,4):
-                            colourBuffer = struct.unpack('<BBBB',file.read(4))
-                            colours = self.__dxtDecodeColourMap(colourBuffer)
-
-                            bits = struct.unpack('<I',file.read(4))[0]
-                            for yy in range(4):
-                                for xx in range(4):
-                                    colourIndex = bits & 0b11
-                                    if yy + y < height and xx + x < width: # copy our colour data into the array
-                                        idx = (xx + x + (heightZero - (yy + y)) * width) * 4
-                                        col = colours[colourIndex]
-                                        texData[idx] = col[0]
-                                        texData[idx+1] = col[1]
-                                        texData[idx+2] = col[2]
-                                        texData[idx+3] = 1
-                                    bits>>=2
-                elif formatIndex == 6: # DXT5
-
-                    texData = [None] * numberOfValues
-
-                    for y in range(0,height,4):
-                        for x in range(0,width,4):
-
-                            alphaBuffer = struct.unpack('<BBBBBBBB',file.read(8))
-                            alphaValues = self.__dxtDecodeAlphaMap(alphaBuffer)
-
-                            colourBuffer = struct.unpack('<BBBB',file.read(4))
-                            colours = self.__dxtDecodeColourMap(colourBuffer)
-
-                            bits = struct.unpack('<I',file.read(4))[0]
-                            for yy in range(4):
-                                for xx in range(4):
-                                    colourIndex = bits & 0b11
-                                    if yy + y < height and xx + x < width: # copy our colour data into the array
-                                        idx = (xx+x + (heightZero-(yy+y)) * width) * 4
-                                        col = colours[colourIndex]
-                                        texData[idx] = col[0]
-                                        texData[idx+1] = col[1]
-                                        texData[idx+2] = col[2]
-                                        texData[idx+3] = alphaValues[xx + yy * 4]
-                                    bits>>=2
-                elif formatIndex == 13: # R8
-                    temp = struct.unpack('<' + 'B' * numberOfPixels,file.read(numberOfPixels))
-                    texData = [None] * numberOfValues
-                    for y in range(height):
-                        for x in range(width):
-                            idx = x + (heightZero - y) * width * 4
-                            idx2 = x + y * width
-                            texData[idx] = temp[idx2] / 255 # copy just the red channel
-                            texData[idx + 1] = 0 # G
-                            texData[idx + 2] = 0 # B
-                            texData[idx + 3] = 1 # A
-            self.__textureTable.append(PapaTexture(nameIndex, formatIndex, srgb, width, height, texData, self.__filepath))
-            self.logv(self.__textureTable[len(self.__textureTable) - 1])
-
-
-    def __readVBuffers(self, file):
-        if(self.__offsetVerticesHeader < 0):
-            return
-        
-        self.logv("Loading Vertex Buffers...")
-        file.seek(self.__offsetVerticesHeader)
-        papaVerticesHeader = []
-        for x in range(self.__numberOfVertexBuffers):
-            papaVerticesHeader.append(struct.unpack('<IIqq', file.read(24)))
-
-        for x in range(self.__numberOfVertexBuffers):
-
-            vertexFormat = papaVerticesHeader[x][0]
-            numberOfVertices = papaVerticesHeader[x][1]
-            offsetVertices = papaVerticesHeader[x][3]
-            #PapaVertex
-
-            vertices = []
-
-            file.seek(offsetVertices)
-            if (vertexFormat == 0): # Position3
-                for _ in range(numberOfVertices):
-                    currentVertex = struct.unpack('<fff', file.read(12))
-
-                    p = Vector([currentVertex[0],currentVertex[1],currentVertex[2]])
-
-                    vertices.append(PapaVertex(p))
-            
-            elif (vertexFormat == 5): # Position3Normal3TexCoord2
-                for _ in range(numberOfVertices):
-                    currentVertex = struct.unpack('<ffffffff', file.read(32))
-
-                    p = Vector([currentVertex[0],currentVertex[1],currentVertex[2]])
-                    n = Vector([currentVertex[3],currentVertex[4],currentVertex[5]])
-                    t1 = [currentVertex[6],currentVertex[7]]
-
-                    vertices.append(PapaVertex(p, norm=n, texcoord1=t1))
-
-            elif (vertexFormat == 6): # Position3Normal3Color4TexCoord2
-                for _ in range(numberOfVertices):
-                    currentVertex = struct.unpack('<ffffffBBBBff', file.read(36))
+                cls.textureLibrary.encodeTexture(pixels.ctypes.data, width, height, formatIndex, 1 if highQuality else 0, data.ctypes.data)
+            return data.tobytes()
+        raise ValueError("Cannot encode textures of format " + str(formatIndex))
+
+    @staticmethod
+    def __expandColours565(colours):
+        # (n,) 565 colours to (n, 3) 8 bit channels, the way graphics hardware expands them
+        r = (colours >> 11) & 0b11111
+        g = (colours >> 5) & 0b111111
+        b = colours & 0b11111
+        return np.stack(((r << 3) | (r >> 2), (g << 2) | (g >> 4), (b << 3) | (b >> 2)), axis=1)
 
-                    p = Vector([currentVertex[0],currentVertex[1],currentVertex[2]])
-                    n = Vector([currentVertex[3],currentVertex[4],currentVertex[5]])
-                    c = [currentVertex[6],currentVertex[7],currentVertex[8],currentVertex[9]]
-                    t1 = [currentVertex[10],currentVertex[11]]
-
-                    vertices.append(PapaVertex(p, norm=n, col=c, texcoord1=t1))
-
-            elif (vertexFormat == 7): # Position3Normal3Color4TexCoord4
-                for _ in range(numberOfVertices):
-                    currentVertex = struct.unpack('<ffffffBBBBffff', file.read(44))
-
-                    p = Vector([currentVertex[0],currentVertex[1],currentVertex[2]])
-                    n = Vector([currentVertex[3],currentVertex[4],currentVertex[5]])
-                    c = [currentVertex[6],currentVertex[7],currentVertex[8],currentVertex[9]]
-                    t1 = [currentVertex[10],currentVertex[11]]
-                    t2 = [currentVertex[12],currentVertex[13]]
-
-                    vertices.append(PapaVertex(p, norm=n, col=c, texcoord1=t1, texcoord2=t2))
-
-            elif (vertexFormat == 8): # Position3Weights4bBones4bNormal3TexCoord2
-                for _ in range(numberOfVertices):
-                    currentVertex = struct.unpack('<fffBBBBBBBBfffff', file.read(40))
-
-                    p = Vector([currentVertex[0],currentVertex[1],currentVertex[2]])
-                    weight = [currentVertex[3]/255,currentVertex[4]/255,currentVertex[5]/255,currentVertex[6]/255]
-                    bone = [currentVertex[7],currentVertex[8],currentVertex[9],currentVertex[10]]
-                    n = Vector([currentVertex[11],currentVertex[12],currentVertex[13]])
-                    t1 = [currentVertex[14],currentVertex[15]]
-
-                    vertices.append(PapaVertex(p, bones=bone, weights=weight, norm=n, texcoord1=t1))
-                    
-            elif (vertexFormat == 10): # Position3Normal3Tan3Bin3TexCoord4
-                for _ in range(numberOfVertices):
-                    currentVertex = struct.unpack('<ffffffffffffffff', file.read(64))
-
-                    p = Vector([currentVertex[0],currentVertex[1],currentVertex[2]])
-                    n = Vector([currentVertex[3],currentVertex[4],currentVertex[5]])
-                    t = Vector([currentVertex[6],currentVertex[7],currentVertex[8]])
-                    b = Vector([currentVertex[9],currentVertex[10],currentVertex[11]])
-                    t1 = [currentVertex[12],currentVertex[13]]
-                    t2 = [currentVertex[14],currentVertex[15]]
-
-                    vertices.append(PapaVertex(p, norm=n, tan=t, binorm=b, texcoord1=t1, texcoord2=t2))
-            self.__vertexBufferTable.append(PapaVertexBuffer(vertexFormat, vertices))
-            self.logv(self.__vertexBufferTable[len(self.__vertexBufferTable) - 1])
-    
+    @classmethod
+    def __encodeTextureNumpy(cls, pixels, width: int, height: int, formatIndex: int) -> bytes:
+        # vectorized version of the fast mode of the native encoder with identical output, pixels are top down RGBA bytes
+        blocksWide = ceil(width / 4)
+        blocksHigh = ceil(height / 4)
+        blockSize = 8 if formatIndex == 4 else 16
+        pixels = np.pad(pixels, ((0, blocksHigh * 4 - height), (0, blocksWide * 4 - width), (0, 0)), mode="edge")
+        data = np.empty((blocksHigh * blocksWide, blockSize), dtype=np.uint8)
+        texelShift = np.arange(16, dtype=np.uint64)
+
+        for firstRow in range(0, blocksHigh, max(1, 16384 // blocksWide)): # a few block rows at a time to bound the memory used
+            lastRow = min(blocksHigh, firstRow + max(1, 16384 // blocksWide))
+            blocks = pixels[firstRow * 4:lastRow * 4].reshape(lastRow - firstRow, 4, blocksWide, 4, 4).transpose(0, 2, 1, 3, 4)
+            blocks = blocks.reshape(-1, 16, 4).astype(np.int32)
+            out = data[firstRow * blocksWide:lastRow * blocksWide]
+
+            # colour endpoints from the inset bounding box, ordered for four colour mode
+            colours = blocks[:,:,0:3]
+            high = colours.max(axis=1)
+            low = colours.min(axis=1)
+            inset = (high - low) >> 4
+            high -= inset
+            low += inset
+            endpoints = []
+            for endpoint in (high, low):
+                endpoint = (endpoint * np.array([31, 63, 31]) + 127) // 255
+                endpoints.append((endpoint[:,0] << 11) | (endpoint[:,1] << 5) | endpoint[:,2])
+            colour0 = np.maximum(*endpoints)
+            colour1 = np.minimum(*endpoints)
+
+            palette0 = PapaFile.__expandColours565(colour0)
+            palette1 = PapaFile.__expandColours565(colour1)
+            palettes = np.stack((palette0, palette1, (2 * palette0 + palette1) // 3, (palette0 + 2 * palette1) // 3), axis=1)
+            distances = ((colours[:,:,np.newaxis,:] - palettes[:,np.newaxis,:,:]) ** 2).sum(axis=3)
+            indices = distances.argmin(axis=2).astype(np.uint64)
+            indices[colour0 == colour1] = 0
+            bits = (indices << (texelShift * 2)).sum(axis=1, dtype=np.uint64)
+
+            colourOut = out[:,-8:]
+            colourOut[:,0] = colour0 & 0xff
+            colourOut[:,1] = colour0 >> 8
+            colourOut[:,2] = colour1 & 0xff
+            colourOut[:,3] = colour1 >> 8
+            colourOut[:,4:8] = (bits[:,np.newaxis] >> (np.arange(4, dtype=np.uint64) * 8)) & 0xff
+
+            if formatIndex == 6: # alpha endpoints are the min and max, equal endpoints select the six value mode
+                alphas = blocks[:,:,3]
+                alpha0 = alphas.max(axis=1)[:,np.newaxis]
+                alpha1 = alphas.min(axis=1)[:,np.newaxis]
+                i = np.arange(1, 7)
+                sevenStep = np.concatenate((alpha0, alpha1, ((7-i) * alpha0 + i * alpha1 + 3) // 7), axis=1)
+                i = np.arange(1, 5)
+                fiveStep = np.concatenate((alpha0, alpha1, ((5-i) * alpha0 + i * alpha1 + 2) // 5,
+                    np.zeros_like(alpha0), np.full_like(alpha0, 255)), axis=1)
+                palettes = np.where(alpha0 > alpha1, sevenStep, fiveStep)
+                indices = np.abs(alphas[:,:,np.newaxis] - palettes[:,np.newaxis,:]).argmin(axis=2).astype(np.uint64)
+                bits = (indices << (texelShift * 3)).sum(axis=1, dtype=np.uint64)
+                out[:,0] = alpha0[:,0]
+                out[:,1] = alpha1[:,0]
+                out[:,2:8] = (bits[:,np.newaxis] >> (np.arange(6, dtype=np.uint64) * 8)) & 0xff
+        return data.tobytes()
 
+    @classmethod
+    def __decodeTextureNative(cls, rawData: bytes, width: int, height: int, formatIndex: int, pixelFormat: str, out: np.ndarray = None):
+        # formats the library does not know are left zeroed
+        texData = out if out is not None else PapaBufferPool.getInstance().acquire(width * height * 4,
+            np.uint8 if pixelFormat == "byte" else np.float32)
+        if cls.textureLibrary.textureDataSize(formatIndex, width, height) == 0:
+            texData[:] = 0
+            return texData
+        cls.__checkTextureDataSize(rawData, width, height, formatIndex)
+        cls.textureLibrary.decodeTextureInto(rawData, len(rawData), width, height, formatIndex, PapaTexture.pixelFormats.index(pixelFormat),
+            texData.ctypes.data, texData.nbytes, getattr(cls.__workerThreads, "threads", cls.textureThreads))
+        return texData
+
+    @staticmethod
+    def __decodeTexturePython(rawData: bytes, width: int, height: int, formatIndex: int):
+        # reference decoder, very slow
+        heightZero = height - 1 # 0 based index
+        numberOfPixels = width * height
+        numberOfValues = numberOfPixels * 4 # (destination, not source)
+        texData = []
+
+        # for some reason blender flips this data across the x axis, so we must invert y
+        if formatIndex == 1: # RGBA8888
+            texData = [None] * numberOfValues
+            tempData = rawData
+            for y in range(height):
+                for x in range(width):
+                    i = (x + (heightZero - y) * width) * 4
+                    i2 = (x + y * width) * 4
+                    texData[i] = tempData[i2] / 255
+                    texData[i+1] = tempData[i2+1] / 255
+                    texData[i+2] = tempData[i2+2] / 255
+                    texData[i+3] = tempData[i2+3] / 255
+        elif formatIndex == 2: # RGBX8888
+            texData = [None] * numberOfValues
+            tempData = rawData # ignore alpha data
+            for y in range(height):
+                for x in range(width):
+                    i = (x + (heightZero - y) * width) * 4
+                    i2 = (x + y * width) * 4
+                    texData[i]=tempData[i2]/255
+                    texData[i+1]=tempData[i2+1]/255
+                    texData[i+2]=tempData[i2+2]/255
+                    texData[i+3]=1
+        elif formatIndex == 3: #BGRA8888
+            texData = [None] * numberOfValues
+            tempData = rawData
+            for y in range(height):
+                for x in range(width):
+                    i = (x + (heightZero - y) * width) * 4
+                    i2 = (x + y * width) * 4
+                    texData[i]=tempData[i2+2]/255 # swap blue and red
+                    texData[i+1]=tempData[i2+1]/255
+                    texData[i+2]=tempData[i2]/255
+                    texData[i+3]=tempData[i2+3]/255
+        elif formatIndex == 4: # DXT1
+            texData = [None] * numberOfValues
+            bufferLoc = 0
+
+            for y in range(0,height,4):
+                for x in range(0,width,4):
+                    colours = PapaFile.__dxtDecodeColourMap(rawData[bufferLoc:bufferLoc+4])
+                    bits = struct.unpack_from('<I',rawData,bufferLoc+4)[0]
+                    bufferLoc+=8
+                    for yy in range(4):
+                        for xx in range(4):
+                            colourIndex = bits & 0b11
+                            if yy + y < height and xx + x < width: # copy our colour data into the array
+                                idx = (xx + x + (heightZero - (yy + y)) * width) * 4
+                                col = colours[colourIndex]
+                                texData[idx] = col[0]
+                                texData[idx+1] = col[1]
+                                texData[idx+2] = col[2]
+                                texData[idx+3] = 1
+                            bits>>=2
+        elif formatIndex == 5 or formatIndex == 6: # DXT3, DXT5
+
+            texData = [None] * numberOfValues
+            bufferLoc = 0
+
+            for y in range(0,height,4):
+                for x in range(0,width,4):
+                    if formatIndex == 5:
+                        alphaValues = PapaFile.__dxtDecodeExplicitAlphaMap(rawData[bufferLoc:bufferLoc+8])
+                    else:
+                        alphaValues = PapaFile.__dxtDecodeAlphaMap(rawData[bufferLoc:bufferLoc+8])
+                    colours = PapaFile.__dxtDecodeColourMap(rawData[bufferLoc+8:bufferLoc+12])
+                    bits = struct.unpack_from('<I',rawData,bufferLoc+12)[0]
+                    bufferLoc+=16
+                    for yy in range(4):
+                        for xx in range(4):
+                            colourIndex = bits & 0b11
+                            if yy + y < height and xx + x < width: # copy our colour data into the array
+                                idx = (xx+x + (heightZero-(yy+y)) * width) * 4
+                                col = colours[colourIndex]
+                                texData[idx] = col[0]
+                                texData[idx+1] = col[1]
+                                texData[idx+2] = col[2]
+                                texData[idx+3] = alphaValues[xx + yy * 4]
+                            bits>>=2
+        elif formatIndex == 13: # R8
+            temp = rawData
+            texData = [None] * numberOfValues
+            for y in range(height):
+                for x in range(width):
+                    idx = (x + (heightZero - y) * width) * 4
+                    idx2 = x + y * width
+                    texData[idx] = temp[idx2] / 255 # copy just the red channel
+                    texData[idx + 1] = 0 # G
+                    texData[idx + 2] = 0 # B
+                    texData[idx + 3] = 1 # A
+        return texData
+
+    @staticmethod
+    def __dxtColourPalettes(blocks, pixelFormat):
+        # blocks is (n, 8) colour block data, returns the (n, 4, 4) RGBA palettes in the same way as __dxtDecodeColourMap.
+        # They are built as (entry, channel, block) so every operation runs over all blocks at once.
+        colour0 = blocks[:,0].astype(np.int32) | (blocks[:,1].astype(np.int32) << 8)
+        colour1 = blocks[:,2].astype(np.int32) | (blocks[:,3].astype(np.int32) << 8)
+        endpoints = np.empty((2, 3, len(blocks)), dtype=np.int32)
+        for i, colour in enumerate((colour0, colour1)):
+            endpoints[i,0] = (colour>>8) & 0b11111000
+            endpoints[i,1] = (colour>>3) & 0b11111100
+            endpoints[i,2] = (colour<<3) & 0b11111000
+
+        fourColour = colour0 > colour1
+        if pixelFormat == "byte": # the float values scaled to 0-255 and rounded, no interpolation lands on a half
+            c0, c1 = endpoints
+            entries = np.empty((4, 4, len(blocks)), dtype=np.uint8)
+            entries[0,0:3] = c0
+            entries[1,0:3] = c1
+            entries[2,0:3] = np.where(fourColour, (2 * c0 + c1 + 1) // 3, (c0 + c1) // 2)
+            entries[3,0:3] = np.where(fourColour, (c0 + 2 * c1 + 1) // 3, 0)
+            entries[:,3] = 255
+        else: # every numerator is a small integer, so a single precision division rounds the same as the decoder's double one
+            c0, c1 = endpoints.astype(np.float32)
+            entries = np.empty((4, 4, len(blocks)), dtype=np.float32)
+            np.divide(c0, 255, out=entries[0,0:3])
+            np.divide(c1, 255, out=entries[1,0:3])
+            entries[2,0:3] = np.where(fourColour, (2 * c0 + c1) / 765, (c0 + c1) / 510)
+            entries[3,0:3] = np.where(fourColour, (c0 + 2 * c1) / 765, 0)
+            entries[:,3] = 1
+        return np.ascontiguousarray(entries.transpose(2, 0, 1))
+
+    # weights of alpha0 and alpha1, constant and divisor of every DXT5 alpha palette entry. The first set is the seven step
+    # palette used when alpha0 > alpha1, the second the five step palette ending in 0 and 255
+    __dxtAlphaWeights = np.array([
+        [[1,0,6,5,4,3,2,1], [0,1,1,2,3,4,5,6], [0,0,0,0,0,0,0,0], [1,1,7,7,7,7,7,7]],
+        [[1,0,4,3,2,1,0,0], [0,1,1,2,3,4,0,0], [0,0,0,0,0,0,0,255], [1,1,5,5,5,5,1,1]]], dtype=np.float32)[:,:,:,np.newaxis]
+
+    @staticmethod
+    def __dxtAlphaPalettes(blocks, pixelFormat):
+        # blocks is (n, 2) alpha endpoints, returns the (n, 8) alpha palettes in the same way as __dxtDecodeAlphaMap
+        a0 = blocks[:,0].astype(np.float32)
+        a1 = blocks[:,1].astype(np.float32)
+        seven, five = PapaFile.__dxtAlphaWeights
+        palettes = np.where(a0 > a1, (seven[0] * a0 + seven[1] * a1 + seven[2]) / seven[3],
+            (five[0] * a0 + five[1] * a1 + five[2]) / five[3])
+        if pixelFormat == "byte": # sevenths and fifths never land on a half
+            return np.ascontiguousarray(np.rint(palettes).astype(np.uint8).T)
+        palettes /= 255
+        return np.ascontiguousarray(palettes.T)
+
+    @staticmethod
+    def __dxtSpreadIndices(rows, bits):
+        # rows holds four indices of the given number of bits each, returns them one per byte in texel order
+        rows = np.ascontiguousarray(rows, dtype="<u4")
+        if bits == 2:
+            rows = (rows | (rows << 12)) & 0x000f000f
+            rows = (rows | (rows << 6)) & 0x03030303
+        elif bits == 3:
+            rows = (rows | (rows << 10)) & 0x003f003f
+            rows = (rows | (rows << 5)) & 0x07070707
+        else:
+            rows = (rows | (rows << 8)) & 0x00ff00ff
+            rows = (rows | (rows << 4)) & 0x0f0f0f0f
+        return rows.view(np.uint8)
+
+    __dxtStripTexels = 65536 # texels decoded at a time, small enough for the index arrays of a strip to stay in cache
+
+    @staticmethod
+    def __decodeDxtStrip(blocks, formatIndex, pixelFormat, colourOffsets, alphaOffsets, strip):
+        # Decodes (rows, blocksWide, blockSize) blocks into strip, the (rows * 4, blocksWide * 4, 4) contiguous output they
+        # cover. The output is bottom up, so the blocks are flipped and every index below is laid out as (block row, texel
+        # row, block column, texel column) with both rows reversed. The offsets hold where the palette of each texel's block
+        # starts in the flattened palettes of the flipped blocks, in the same layout.
+        blocks = blocks[::-1]
+        texels = strip.shape[0:2]
+
+        # each index byte is one row of four 2 bit colour indices
+        rows = blocks[:,:,-1:-5:-1].transpose(0, 2, 1)
+        indices = colourOffsets + PapaFile.__dxtSpreadIndices(rows, 2).reshape(texels)
+        palettes = PapaFile.__dxtColourPalettes(blocks[:,:,-8:].reshape(-1, 8), pixelFormat)
+        # gather whole RGBA palette entries at once. The indices are in range by construction, and clip mode lets take write
+        # straight into the output instead of through a temporary copy
+        np.take(palettes.reshape(-1, 4), indices, axis=0, out=strip, mode="clip")
+
+        if formatIndex == 6:
+            # the 48 bits after the endpoints hold sixteen 3 bit indices, a row of four in every 12 bits
+            alphaBits = blocks[:,:,2:8].astype(np.uint32)
+            rows = np.empty((blocks.shape[0], 4, blocks.shape[1]), dtype="<u4")
+            for half in range(2): # the top two rows in the first three bytes, the bottom two in the rest
+                bits = alphaBits[:,:,half * 3] | (alphaBits[:,:,half * 3 + 1] << 8) | (alphaBits[:,:,half * 3 + 2] << 16)
+                rows[:,3 - half * 2] = bits & 0xfff
+                rows[:,2 - half * 2] = bits >> 12
+            indices = alphaOffsets + PapaFile.__dxtSpreadIndices(rows, 3).reshape(texels)
+            palettes = PapaFile.__dxtAlphaPalettes(blocks[:,:,0:2].reshape(-1, 2), pixelFormat)
+            strip[:,:,3] = np.take(palettes.ravel(), indices, mode="clip") # faster than taking into the strided alpha directly
+        elif formatIndex == 5:
+            # explicit 4 bit alpha values, a row of four in every 16 bits. The palette is the same for every block
+            rows = blocks[:,:,0:8].view("<u2")[:,:,::-1].transpose(0, 2, 1)
+            indices = PapaFile.__dxtSpreadIndices(rows, 4).reshape(texels)
+            palette = np.arange(16) * 17
+            palette = palette.astype(np.uint8) if pixelFormat == "byte" else (palette / 255).astype(np.float32)
+            strip[:,:,3] = np.take(palette, indices, mode="clip")
 
-    def __readIBuffers(self, file):
-        if(self.__offsetIndicesHeader < 0):
-            return
-        
-        self.logv("Loading Index Buffers...")
-        file.seek(self.__offsetIndicesHeader)
-        papaIndicesHeader = []
-        for x in range(self.__numberOfIndexBuffers):
-            papaIndicesHeader.append(struct.unpack('<BxxxIqq', file.read(24)))
-        for x in range(self.__numberOfIndexBuffers):
-            format = papaIndicesHeader[x][0]
-            numberOfIndices = papaIndicesHeader[x][1]
-            dataSize = papaIndicesHeader[x][2]
-            offsetIndices = papaIndicesHeader[x][3]
-
-            #PapaTriangle
-            file.seek(offsetIndices)
-            if(format == 0):
-                self.__indexBufferTable.append(PapaIndexBuffer(0,struct.unpack('<'+'H'*numberOfIndices,file.read(dataSize))))
-            elif(format == 1):
-                self.__indexBufferTable.append(PapaIndexBuffer(1,struct.unpack('<'+'I'*numberOfIndices,file.read(dataSize))))
+    @classmethod
+    def __decodeTextureNumpy(cls, rawData: bytes, width: int, height: int, formatIndex: int, pixelFormat: str = "float",
+                out: np.ndarray = None):
+        # vectorized decoder, decodes every pixel or block at once
+        data = np.frombuffer(rawData, dtype=np.uint8)
+        byteOutput = pixelFormat == "byte"
+        pixelType = np.uint8 if byteOutput else np.float32
+        opaque = 255 if byteOutput else 1
+        if formatIndex in (1, 2, 3, 4, 5, 6, 13):
+            flatData = out if out is not None else PapaBufferPool.getInstance().acquire(width * height * 4, pixelType)
+            texData = flatData.reshape(height, width, 4)
+
+        if formatIndex == 1 or formatIndex == 2 or formatIndex == 3: # RGBA8888, RGBX8888, BGRA8888
+            pixels = data[:width * height * 4].reshape(height, width, 4)[::-1] # for some reason blender flips this data across the x axis, so we must invert y
+            if formatIndex == 3:
+                pixels = pixels[:,:,[2,1,0,3]]
+            if byteOutput:
+                texData[:] = pixels
             else:
-                raise IOError('Invalid index buffer format for index buffer '+str(x))
-            self.logv(self.__indexBufferTable[len(self.__indexBufferTable) - 1])
-    
-
-
-    def __readMaterials(self, file):
-        if(self.__offsetMaterialsHeader < 0):
-            return
-        
-        self.logv("Loading Materials...")
-        file.seek(self.__offsetMaterialsHeader)
-        for x in range(self.__numberOfMaterials):
-            materialHeader = struct.unpack('<HHHHqqq', file.read(32))
-            restore = file.tell()
-            nameIndex = materialHeader[0]
-            numVectorParams = materialHeader[1]
-            numTextureParams = materialHeader[2]
-            numMatrixParams = materialHeader[3]
-
-            offsetVectorParams = materialHeader[4]
-            offsetTextureParams = materialHeader[5]
-            offsetMatrixParams = materialHeader[6]
-
-            vectorParams = []
-            textureParams = []
-            matrixParams = []
-
-            if numVectorParams > 0:
-                file.seek(offsetVectorParams)
-                for _ in range(numVectorParams):
-                    vectorData = struct.unpack('<Hxxffff',file.read(20))
-                    vectorParams.append(PapaVectorParameter(vectorData[0],Vector([vectorData[1],vectorData[2],vectorData[3],vectorData[4]])))
-
-            if numTextureParams > 0:
-                file.seek(offsetTextureParams)
-                for _ in range(numTextureParams):
-                    textureData = struct.unpack('<HH',file.read(4))
-                    textureParams.append(PapaTextureParameter(textureData[0],textureData[1]))
-
-            if numMatrixParams > 0:
-                file.seek(offsetMatrixParams)
-                for _ in range(numMatrixParams):
-                    matrixData = struct.unpack('<Hxxffffffffffffffff',file.read(68))
-                    A =(matrixData[1],matrixData[5],matrixData[9],matrixData[13])
-                    B =(matrixData[2],matrixData[6],matrixData[10],matrixData[14])
-                    C =(matrixData[3],matrixData[7],matrixData[11],matrixData[15])
-                    D =(matrixData[4],matrixData[8],matrixData[12],matrixData[16])
-                    mat = (A,B,C,D)
-                    matrixParams.append(PapaMatrixParameter(matrixData[0],Matrix(mat)))
-            mat = PapaMaterial(nameIndex, vectorParams,textureParams,matrixParams)
-            self.__materialTable.append(mat)
-            self.logv(str(mat) + " (shader = " + self.getString(mat.getShaderNameIndex())+")")
-            file.seek(restore)
-
-
-
-    def __readMeshes(self, file):
-        if(self.__offsetMeshHeader < 0):
-            return
-        
-        self.logv("Loading Meshes...")
-        file.seek(self.__offsetMeshHeader)
-        for _ in range(self.__numberOfMeshes):
-            meshHeader = struct.unpack('<HHHxxq', file.read(16))
-            restore = file.tell()
-            vbuf = meshHeader[0]
-            ibuf = meshHeader[1]
-            numMatGroups = meshHeader[2]
-            offset = meshHeader[3]
-
-            matGroups = []
-
-            if(numMatGroups > 0):
-                file.seek(offset)
-                for _ in range(numMatGroups):
-                    header = struct.unpack('<HHIIBxxx',file.read(16))
-                    matGroups.append(PapaMaterialGroup(header[0],header[1],header[2],header[3],header[4]))
-
-            self.__meshTable.append(PapaMesh(vbuf,ibuf,matGroups))
-            self.logv(self.__meshTable[len(self.__meshTable) - 1])
-            file.seek(restore)
-
-    
+                np.divide(pixels, np.float32(255), out=texData)
+            if formatIndex == 2: # ignore alpha data
+                texData[:,:,3] = opaque
+        elif formatIndex == 13: # R8
+            texData[:,:,1:3] = 0
+            red = data[:width * height].reshape(height, width)[::-1]
+            if byteOutput:
+                texData[:,:,0] = red
+            else:
+                np.divide(red, np.float32(255), out=texData[:,:,0])
+            texData[:,:,3] = opaque
+        elif formatIndex == 4 or formatIndex == 5 or formatIndex == 6: # DXT1, DXT3, DXT5
+            blocksWide = ceil(width / 4)
+            blocksHigh = ceil(height / 4)
+            blockSize = 8 if formatIndex == 4 else 16
+            blocks = data[:blocksWide * blocksHigh * blockSize].reshape(blocksHigh, blocksWide, blockSize)
+            # partial blocks are decoded whole into a padded image, then cropped
+            paddedWidth = blocksWide * 4
+            paddedHeight = blocksHigh * 4
+            padded = texData
+            if paddedWidth != width or paddedHeight != height:
+                padded = np.empty((paddedHeight, paddedWidth, 4), dtype=pixelType)
+            stripRows = min(blocksHigh, max(1, PapaFile.__dxtStripTexels // (paddedWidth * 4)))
+            blockNumbers = np.arange(stripRows * blocksWide, dtype=np.intp).reshape(stripRows, 1, blocksWide, 1)
+            blockNumbers = np.broadcast_to(blockNumbers, (stripRows, 4, blocksWide, 4)).reshape(stripRows * 4, paddedWidth)
+            colourOffsets = blockNumbers * 4
+            alphaOffsets = blockNumbers * 8 if formatIndex == 6 else None
+            for blockRow in range(0, blocksHigh, stripRows):
+                blockRowEnd = min(blockRow + stripRows, blocksHigh)
+                texelRows = (blockRowEnd - blockRow) * 4
+                PapaFile.__decodeDxtStrip(blocks[blockRow:blockRowEnd], formatIndex, pixelFormat, colourOffsets[:texelRows],
+                    None if alphaOffsets is None else alphaOffsets[:texelRows],
+                    padded[paddedHeight - blockRowEnd * 4:paddedHeight - blockRow * 4])
+            if padded is not texData:
+                texData[:] = padded[paddedHeight - height:,:width]
+        else:
+            if out is not None:
+                out[:] = 0
+                return out
+            return np.empty(0, dtype=pixelType) if byteOutput else []
+
+        return flatData # the flat array itself rather than a view, so it can go back to the buffer pool
+
+
+
+    def __readTexture(self, file, x):
+        return self.__finishTexture(x, *self.__decodeTexture(x, self.__readTextureSource(file, x)))
+
+    def __readTextureSource(self, file, x):
+        # the part of reading a texture that touches the file. Returns the full path of a linked texture (None if it cannot be found)
+        # or the raw data of every level in the mip chain
+        header = self.__textureHeaders[x]
+        nameIndex = header[0]
+        formatIndex = header[1]
+        width = header[3]
+        height = header[4]
+        dataSize = header[5]
+        offsetTexture = header[6]
+
+        if(dataSize == -1 or offsetTexture == -1): # the texture is linked, see if we can find the source...
+            mediaDirectory = PapaTextureCache.getInstance().findMediaDirectory(self.__filepath) # deferring the step into 'media' allows for better mod file support
+            fullPath = None if mediaDirectory == None else mediaDirectory + self.getString(nameIndex)
+            if fullPath == None or not Path(fullPath).exists(): # failed to find it
+                return None
+            return fullPath
+
+        mipBits = header[2] & 0b0000_1111
+        file.seek(offsetTexture)
+        mipLevels = [] # (width, height, raw data) for every level in the chain
+        for level in range(PapaTexture.mipLevelCount(formatIndex, width, height, mipBits, dataSize)):
+            levelWidth, levelHeight = PapaTexture.mipLevelDimensions(width, height, level)
+            mipLevels.append((levelWidth, levelHeight, file.read(PapaTexture.levelDataSize(formatIndex, levelWidth, levelHeight))))
+        return mipLevels
+
+    def __decodeTextureShared(self, x, source, threads):
+        # __decodeTexture on a pool worker, every native decode it makes (linked files included) uses the given threads
+        PapaFile.__workerThreads.threads = threads
+        try:
+            return self.__decodeTexture(x, source)
+        finally:
+            del PapaFile.__workerThreads.threads
+
+    def __decodeTexture(self, x, source):
+        # the expensive part of reading a texture. This does not touch the file or any table, so it may run on any thread
+        header = self.__textureHeaders[x]
+        if source == None or (isinstance(source, str) and not self.__readLinked):
+            return source, None
+
+        if isinstance(source, str): # a linked texture we need to load
+            cache = PapaTextureCache.getInstance()
+            cached = cache.getTexture(source, self.__mipLevel, self.__pixelFormat)
+            if cached != None:
+                return source, cached + (True,)
+            subfile = PapaFile(source, mipLevel=self.__mipLevel, pixelFormat=self.__pixelFormat)
+            if subfile.getNumTextures() != 1:
+                return source, None
+            tex = subfile.getTexture(0)
+            texName = subfile.getString(tex.getNameIndex())
+            cache.addTexture(source, self.__mipLevel, self.__pixelFormat, tex, texName)
+            return source, (tex, texName, False)
+
+        # only the requested level is decoded, the others are kept as raw data
+        mipLevel = min(self.__mipLevel, len(source) - 1)
+        levelWidth, levelHeight, rawData = source[mipLevel]
+        return source, (mipLevel, PapaFile.decodeTextureData(rawData, levelWidth, levelHeight, header[1], pixelFormat=self.__pixelFormat))
+
+    def __finishTexture(self, x, source, result):
+        # creates the PapaTexture, this adds to the string table so it must be called in table order
+        # this is a compressed down version of PTexEdit's texture reader
+        header = self.__textureHeaders[x]
+        nameIndex = header[0]
+        formatIndex = header[1]
+        srgb = header[2] & 0b1000_0000 == 0b1000_0000
+
+        if not isinstance(source, list): # the texture is linked
+            if source == None:
+                # we return None here because even if we miss, we should respect that the texture was meant to exist.
+                # Dropping the entry would mean that indices would become incorrect later on (Texture Parameters)
+                self.logv("Linked file for texture \"" + self.getString(nameIndex) + "\" cannot be found. Ignoring.")
+                return None
+
+            if not self.__readLinked: # keep the texture stub anyway
+                tex = PapaTexture(self.__appendComponent(0, PapaString(source)),-1,False,-1,-1,[], source)
+                self.logv("(texture stub)")
+                self.logv(tex)
+                return tex
+
+            if result == None:
+                tex = PapaTexture(self.__appendComponent(0, PapaString(source)),-1,False,-1,-1,[], source)
+                self.logv("Linked file for texture \"" + self.getString(nameIndex) + "\" malformed. Creating texture stub")
+                self.logv(tex)
+                return tex
+
+            tex, texName, cached = result
+            if cached:
+                self.logv("(cached)")
+
+            # copy the data to a new PapaTexture and create a new string for it (mildly jank)
+            tex = PapaTexture(self.__appendComponent(0, PapaString(texName)),tex.getFormatIndex(),tex.getSRGB(),tex.getWidth(),tex.getHeight(),tex.getImageData(), tex.getFilepath(),
+                mipLevels=tex.getMipLevels(), mipLevel=tex.getMipLevel(), pixelFormat=tex.getPixelFormat(), linked=True)
+
+            self.logv("(externally loaded)") # acquire the linked texture
+            self.logv(tex)
+            return tex
+
+        mipLevel, texData = result
+        levelWidth, levelHeight, _ = source[mipLevel]
+        tex = PapaTexture(nameIndex, formatIndex, srgb, levelWidth, levelHeight, texData, self.__filepath, mipLevels=source, mipLevel=mipLevel,
+            pixelFormat=self.__pixelFormat)
+        self.logv(tex)
+        return tex
+
+    def __readVBuffer(self, file, x):
+        vertexFormat, numberOfVertices, _, offsetVertices = self.__vertexBufferHeaders[x]
+
+        #PapaVertex
+        vertexType = PapaVertexBuffer.dtypeMap.get(vertexFormat)
+        if vertexType == None:
+            raise IOError('Invalid vertex buffer format for vertex buffer '+str(x))
+
+        file.seek(offsetVertices) # one read for the whole buffer, decoded as a structured array
+        vertices = np.frombuffer(file.read(numberOfVertices * vertexType.itemsize), dtype=vertexType, count=numberOfVertices)
+        vBuffer = PapaVertexBuffer(vertexFormat, vertices)
+        self.logv(vBuffer)
+        return vBuffer
+
+    def __readIBuffer(self, file, x):
+        format, numberOfIndices, dataSize, offsetIndices = self.__indexBufferHeaders[x]
+
+        #PapaTriangle
+        indexType = PapaIndexBuffer.dtypeMap.get(format)
+        if indexType == None:
+            raise IOError('Invalid index buffer format for index buffer '+str(x))
+        file.seek(offsetIndices)
+        iBuffer = PapaIndexBuffer(format, np.frombuffer(file.read(dataSize), dtype=indexType, count=numberOfIndices))
+        self.logv(iBuffer)
+        return iBuffer
+
+    def __readMaterial(self, file, x):
+        materialHeader = self.__materialHeaders[x]
+        nameIndex = materialHeader[0]
+        numVectorParams = materialHeader[1]
+        numTextureParams = materialHeader[2]
+        numMatrixParams = materialHeader[3]
+
+        offsetVectorParams = materialHeader[4]
+        offsetTextureParams = materialHeader[5]
+        offsetMatrixParams = materialHeader[6]
+
+        vectorParams = []
+        textureParams = []
+        matrixParams = []
+
+        if numVectorParams > 0:
+            file.seek(offsetVectorParams)
+            for _ in range(numVectorParams):
+                vectorData = struct.unpack('<Hxxffff',file.read(20))
+                vectorParams.append(PapaVectorParameter(vectorData[0],Vector([vectorData[1],vectorData[2],vectorData[3],vectorData[4]])))
+
+        if numTextureParams > 0:
+            file.seek(offsetTextureParams)
+            for _ in range(numTextureParams):
+                textureData = struct.unpack('<HH',file.read(4))
+                textureParams.append(PapaTextureParameter(textureData[0],textureData[1]))
+
+        if numMatrixParams > 0:
+            file.seek(offsetMatrixParams)
+            for _ in range(numMatrixParams):
+                matrixData = struct.unpack('<Hxxffffffffffffffff',file.read(68))
+                A =(matrixData[1],matrixData[5],matrixData[9],matrixData[13])
+                B =(matrixData[2],matrixData[6],matrixData[10],matrixData[14])
+                C =(matrixData[3],matrixData[7],matrixData[11],matrixData[15])
+                D =(matrixData[4],matrixData[8],matrixData[12],matrixData[16])
+                mat = (A,B,C,D)
+                matrixParams.append(PapaMatrixParameter(matrixData[0],Matrix(mat)))
+        mat = PapaMaterial(nameIndex, vectorParams,textureParams,matrixParams)
+        self.logv(str(mat) + " (shader = " + self.getString(mat.getShaderNameIndex())+")")
+        return mat
+
+    def __readMesh(self, file, x):
+        vbuf, ibuf, numMatGroups, offset = self.__meshHeaders[x]
+
+        matGroups = []
+
+        if(numMatGroups > 0):
+            file.seek(offset)
+            for _ in range(numMatGroups):
+                header = struct.unpack('<HHIIBxxx',file.read(16))
+                matGroups.append(PapaMaterialGroup(header[0],header[1],header[2],header[3],header[4]))
+
+        mesh = PapaMesh(vbuf,ibuf,matGroups)
+        self.logv(mesh)
+        return mesh
+
+    def __readSkeleton(self, file, x):
+        numBones, offsetBoneTable = self.__skeletonHeaders[x]
+        bones = []
+        #PapaSkeletonSegment
+        file.seek(offsetBoneTable)
+        for _ in range(0, numBones):
+            currentSegment = struct.unpack('<hhffffffffffffffffffffffffffffffff', file.read(132))
+            nameIndex = currentSegment[0]
+            parentIndex = currentSegment[1]
+
+            # 2 - 4 = translation relative
+            #  5 - 8 = rotation relative
+            # 9 - 17 = shear scale (unused)
+            # 18 - 33 = bind2bone (convert global position to bone's local position)
+
+            offset = Vector([currentSegment[2],currentSegment[3],currentSegment[4]])
+            rotation = Quaternion([currentSegment[5],currentSegment[6],currentSegment[7],currentSegment[8]])
+
+            sA = (currentSegment[9],currentSegment[12],currentSegment[15])
+            sB = (currentSegment[10],currentSegment[13],currentSegment[16])
+            sC = (currentSegment[11],currentSegment[14],currentSegment[17])
+            sMat = (sA,sB,sC)
+            shearScale = Matrix(sMat) # unused
+
+            A =(currentSegment[18],currentSegment[22],currentSegment[26],currentSegment[30])
+            B =(currentSegment[19],currentSegment[23],currentSegment[27],currentSegment[31])
+            C =(currentSegment[20],currentSegment[24],currentSegment[28],currentSegment[32])
+            D =(currentSegment[21],currentSegment[25],currentSegment[29],currentSegment[33])
+            mat = (A,B,C,D)
+            bindToBone = Matrix(mat)
+            bones.append(PapaBone(nameIndex,parentIndex,offset,rotation,shearScale,bindToBone))
+
+        skeleton = PapaSkeleton(bones)
+        self.logv(skeleton)
+        return skeleton
+
+    def __readModel(self, file, x):
+        papaModelHeader = self.__modelHeaders[x]
+        modelNameIndex = papaModelHeader[0]
+        skeletonIndex = papaModelHeader[1]
+        numMeshBindings = papaModelHeader[2]
+        A =(papaModelHeader[3],papaModelHeader[7],papaModelHeader[11],papaModelHeader[15])
+        B =(papaModelHeader[4],papaModelHeader[8],papaModelHeader[12],papaModelHeader[16])
+        C =(papaModelHeader[5],papaModelHeader[9],papaModelHeader[13],papaModelHeader[17])
+        D =(papaModelHeader[6],papaModelHeader[10],papaModelHeader[14],papaModelHeader[18])
+        mat = (A,B,C,D)
+        modelToScene = Matrix(mat)
+        offsetMeshBindings = papaModelHeader[19]
+
+        meshBindings = []
+        # PapaMeshBinding
+        if(numMeshBindings>0):
+            file.seek(offsetMeshBindings)
+            for _ in range(0, numMeshBindings):
+                currentSegment = struct.unpack('<HHHxxffffffffffffffffq', file.read(80))
+
+                boneMappings = []
 
-    def __readSkeletons(self, file):
-        if (self.__offsetSkeletonHeader < 0):
-            return
-        
-        self.logv("Loading Skeletons...")
-        file.seek(self.__offsetSkeletonHeader)
-        papaSkeletonHeader = []
-        for x in range(self.__numberOfSkeletons):
-            papaSkeletonHeader.append(struct.unpack('<Hxxxxxxq', file.read(16)))
-        for x in range(self.__numberOfSkeletons):
-            numBones = papaSkeletonHeader[x][0]
-            offsetBoneTable = papaSkeletonHeader[x][1]
-            bones = []
-            #PapaSkeletonSegment
-            file.seek(offsetBoneTable)
-            for _ in range(0, numBones):
-                currentSegment = struct.unpack('<hhffffffffffffffffffffffffffffffff', file.read(132))
                 nameIndex = currentSegment[0]
-                parentIndex = currentSegment[1]
-
-                # 2 - 4 = translation relative
-                #  5 - 8 = rotation relative
-                # 9 - 17 = shear scale (unused)
-                # 18 - 33 = bind2bone (convert global position to bone's local position)
-
-                offset = Vector([currentSegment[2],currentSegment[3],currentSegment[4]])
-                rotation = Quaternion([currentSegment[5],currentSegment[6],currentSegment[7],currentSegment[8]])
-
-                sA = (currentSegment[9],currentSegment[12],currentSegment[15])
-                sB = (currentSegment[10],currentSegment[13],currentSegment[16])
-                sC = (currentSegment[11],currentSegment[14],currentSegment[17])
-                sMat = (sA,sB,sC)
-                shearScale = Matrix(sMat) # unused
-
-                A =(currentSegment[18],currentSegment[22],currentSegment[26],currentSegment[30])
-                B =(currentSegment[19],currentSegment[23],currentSegment[27],currentSegment[31])
-                C =(currentSegment[20],currentSegment[24],currentSegment[28],currentSegment[32])
-                D =(currentSegment[21],currentSegment[25],currentSegment[29],currentSegment[33])
+                meshIndex = currentSegment[1]
+                numBoneMappings = currentSegment[2]
+                A =(currentSegment[3],currentSegment[7],currentSegment[11],currentSegment[15])
+                B =(currentSegment[4],currentSegment[8],currentSegment[12],currentSegment[16])
+                C =(currentSegment[5],currentSegment[9],currentSegment[13],currentSegment[17])
+                D =(currentSegment[6],currentSegment[10],currentSegment[14],currentSegment[18])
                 mat = (A,B,C,D)
-                bindToBone = Matrix(mat)
-                bones.append(PapaBone(nameIndex,parentIndex,offset,rotation,shearScale,bindToBone))
-
-            self.__skeletonTable.append(PapaSkeleton(bones))
-            self.logv(self.__skeletonTable[len(self.__skeletonTable) - 1])
-
-
-    
-    def __readModels(self, file):
-        if (self.__offsetModelHeader < 0):
-            return
+                meshToModel = Matrix(mat)
+                offsetBoneMap = currentSegment[19]
+
+                restore = file.tell()
+                if(numBoneMappings>0):
+                    file.seek(offsetBoneMap)
+                    boneMappings = list(struct.unpack('<' + 'H' * numBoneMappings, file.read(2 * numBoneMappings)))
+                file.seek(restore)
+
+                meshBindings.append(PapaMeshBinding(nameIndex,meshIndex,meshToModel,boneMappings))
+        model = PapaModel(modelNameIndex,skeletonIndex,modelToScene,meshBindings)
+        self.logv(model)
+        return model
+
+    def __readAnimation(self, file, x):
+        papaAnimationHeader = self.__animationHeaders[x]
+        nameIndex = papaAnimationHeader[0]
+        numBones = papaAnimationHeader[1]
+        numFrames = papaAnimationHeader[2]
+        fpsNumerator = papaAnimationHeader[3]
+        fpsDenominator = papaAnimationHeader[4]
+        boneTableOffset = papaAnimationHeader[5]
+        transformsOffset = papaAnimationHeader[6]
+
+        # load bone names
+        if boneTableOffset >= 0:
+            file.seek(boneTableOffset)
+        boneNameIndexes = struct.unpack('<' + 'H' * numBones, file.read(2 * numBones))
         
-        self.logv("Loading Models...")
-        file.seek(self.__offsetModelHeader)
-        papaModelHeader = []
-        for x in range(self.__numberOfModels):
-            papaModelHeader.append(struct.unpack('<hhHxxffffffffffffffffq', file.read(80)))
-        for x in range(self.__numberOfModels):
-            modelNameIndex = papaModelHeader[x][0]
-            skeletonIndex = papaModelHeader[x][1]
-            numMeshBindings = papaModelHeader[x][2]
-            A =(papaModelHeader[x][3],papaModelHeader[x][7],papaModelHeader[x][11],papaModelHeader[x][15])
-            B =(papaModelHeader[x][4],papaModelHeader[x][8],papaModelHeader[x][12],papaModelHeader[x][16])
-            C =(papaModelHeader[x][5],papaModelHeader[x][9],papaModelHeader[x][13],papaModelHeader[x][17])
-            D =(papaModelHeader[x][6],papaModelHeader[x][10],papaModelHeader[x][14],papaModelHeader[x][18])
-            mat = (A,B,C,D)
-            modelToScene = Matrix(mat)
-            offsetMeshBindings = papaModelHeader[x][19]
-
-            meshBindings = []
-            # PapaMeshBinding
-            if(numMeshBindings>0):
-                file.seek(offsetMeshBindings)
-                for _ in range(0, numMeshBindings):
-                    currentSegment = struct.unpack('<HHHxxffffffffffffffffq', file.read(80))
-
-                    boneMappings = []
-
-                    nameIndex = currentSegment[0]
-                    meshIndex = currentSegment[1]
-                    numBoneMappings = currentSegment[2]
-                    A =(currentSegment[3],currentSegment[7],currentSegment[11],currentSegment[15])
-                    B =(currentSegment[4],currentSegment[8],currentSegment[12],currentSegment[16])
-                    C =(currentSegment[5],currentSegment[9],currentSegment[13],currentSegment[17])
-                    D =(currentSegment[6],currentSegment[10],currentSegment[14],currentSegment[18])
-                    mat = (A,B,C,D)
-                    meshToModel = Matrix(mat)
-                    offsetBoneMap = currentSegment[19]
-
-                    restore = file.tell()
-                    if(numBoneMappings>0):
-                        file.seek(offsetBoneMap)
-                        boneMappings = list(struct.unpack('<' + 'H' * numBoneMappings, file.read(2 * numBoneMappings)))
-                    file.seek(restore)
-
-                    meshBindings.append(PapaMeshBinding(nameIndex,meshIndex,meshToModel,boneMappings))
-            self.__modelTable.append(PapaModel(modelNameIndex,skeletonIndex,modelToScene,meshBindings))
-            self.logv(self.__modelTable[len(self.__modelTable) - 1])
-
-    def __readAnimations(self, file):
-        if(self.__offsetAnimationHeader < 0):
-            return
-        self.logv("Loading Animations...")
-        file.seek(self.__offsetAnimationHeader)
-        papaAnimationHeader = []
-        for x in range(self.__numberOfAnimations):
-            papaAnimationHeader.append(struct.unpack('<hHIIIqq', file.read(32)))
-        for x in range(self.__numberOfAnimations):
-            nameIndex = papaAnimationHeader[x][0]
-            numBones = papaAnimationHeader[x][1]
-            numFrames = papaAnimationHeader[x][2]
-            fpsNumerator = papaAnimationHeader[x][3]
-            fpsDenominator = papaAnimationHeader[x][4]
-            boneTableOffset = papaAnimationHeader[x][5]
-            transformsOffset = papaAnimationHeader[x][6]
-
-            # set up variables
-            boneNameIndexes = []
-            translations = []
-            rotations = []
-            for x in range(numBones):
-                translations.append([])
-                rotations.append([])
-            
-            # load bone names
-            if boneTableOffset >= 0:
-                file.seek(boneTableOffset)
-            currentSegment = struct.unpack('<' + 'H' * numBones, file.read(2 * numBones))
-            for x in range(numBones):
-                boneNameIndexes.append(currentSegment[x])
-            
-            if transformsOffset >= 0:
-                file.seek(transformsOffset)
-            for i in range(numFrames):
-                for k in range(numBones): # (frame1 --> bone1, bone2), (frame2 -->bone1, bone2) ...
-                    currentSegment = struct.unpack('<fffffff', file.read(28))
-                    translations[k].append(Vector((currentSegment[0],currentSegment[1],currentSegment[2])))
-                    rotations[k].append(Quaternion((currentSegment[3],currentSegment[4], currentSegment[5], currentSegment[6])))
-            
-            animationBones = []
-            for i in range(numBones):
-                animationBones.append(AnimationBone(boneNameIndexes[i], self.getString(boneNameIndexes[i]),translations[i],rotations[i]))
-
-            self.__animationTable.append(PapaAnimation(nameIndex, numBones, numFrames, fpsNumerator, fpsDenominator, animationBones))
-            self.logv(self.__animationTable[len(self.__animationTable) - 1])
+        # every transform in a single read. (frame1 --> bone1, bone2), (frame2 -->bone1, bone2) ...
+        if transformsOffset >= 0:
+            file.seek(transformsOffset)
+        transforms = np.frombuffer(bytearray(file.read(28 * numBones * numFrames)), dtype="<f4").reshape(numFrames, numBones, 7)
+        
+        animationBones = []
+        for i in range(numBones):
+            animationBones.append(AnimationBone(boneNameIndexes[i], self.getString(boneNameIndexes[i]),transforms[:,i,0:3],transforms[:,i,3:7]))
+
+        animation = PapaAnimation(nameIndex, numBones, numFrames, fpsNumerator, fpsDenominator, animationBones, transforms)
+        self.logv(animation)
+        return animation
 
     def getSignature(self):
         return self.__signature
@@ -1674,162 +2751,243 @@ class PapaFile:
     def getString(self, index:int) -> str:
         if(index < 0 or index >= len(self.__stringTable)):
             return ""
-        return self.__stringTable[index].getString()
+        return self.__getComponent(0, index).getString()
 
     def getPapaString(self, index: int):
-        return self.__stringTable[index]
+        return self.__getComponent(0, index)
 
     def getTexture(self, index:int) -> PapaTexture:
-        return self.__textureTable[index]
+        return self.__getComponent(1, index)
 
     def getVertexBuffer(self, index:int) -> PapaVertexBuffer:
-        return self.__vertexBufferTable[index]
+        return self.__getComponent(2, index)
 
     def getIndexBuffer(self, index:int) -> PapaIndexBuffer:
-        return self.__indexBufferTable[index]
+        return self.__getComponent(3, index)
 
     def getMaterial(self, index:int) -> PapaMaterial:
-        return self.__materialTable[index]
+        return self.__getComponent(4, index)
 
     def getMesh(self, index:int) -> PapaMesh:
-        return self.__meshTable[index]
+        return self.__getComponent(5, index)
 
     def getSkeleton(self, index:int) -> PapaSkeleton:
-        return self.__skeletonTable[index]
+        return self.__getComponent(6, index)
 
     def getModel(self, index:int) -> PapaModel:
-        return self.__modelTable[index]
+        return self.__getComponent(7, index)
 
     def getAnimation(self, index:int) -> PapaAnimation:
-        return self.__animationTable[index]
+        return self.__getComponent(8, index)
 
     def addString(self, obj: PapaString) -> int:
         idx = self.getStringIndex(obj.getString())
         if idx != -1:
             return idx
-        self.__stringTable.append(obj)
-        return len(self.__stringTable) - 1
+        return self.__appendComponent(0, obj)
 
     def addTexture(self, obj:PapaTexture):
-        if obj in self.__textureTable:
-            return self.__textureTable.index(obj)
-        self.__textureTable.append(obj)
-        return len(self.__textureTable) - 1
+        return self.__addComponent(1, obj)
 
     def addVertexBuffer(self, obj:PapaVertexBuffer):
-        if obj in self.__vertexBufferTable:
-            return self.__vertexBufferTable.index(obj)
-        self.__vertexBufferTable.append(obj)
-        return len(self.__vertexBufferTable) - 1
+        return self.__addComponent(2, obj)
 
     def addIndexBuffer(self, obj:PapaIndexBuffer):
-        if obj in self.__indexBufferTable:
-            return self.__indexBufferTable.index(obj)
-        self.__indexBufferTable.append(obj)
-        return len(self.__indexBufferTable) - 1
+        return self.__addComponent(3, obj)
 
     def addMaterial(self, obj:PapaMaterial):
-        if obj in self.__materialTable:
-            return self.__materialTable.index(obj)
-        self.__materialTable.append(obj)
-        return len(self.__materialTable) - 1
+        return self.__addComponent(4, obj)
 
     def addMesh(self, obj:PapaMesh):
-        if obj in self.__meshTable:
-            return self.__meshTable.index(obj)
-        self.__meshTable.append(obj)
-        return len(self.__meshTable) - 1
+        return self.__addComponent(5, obj)
 
     def addSkeleton(self, obj:PapaSkeleton):
-        if obj in self.__skeletonTable:
-            return self.__skeletonTable.index(obj)
-        self.__skeletonTable.append(obj)
-        return len(self.__skeletonTable) - 1
+        return self.__addComponent(6, obj)
 
     def addModel(self, obj:PapaModel):
-        if obj in self.__modelTable:
-            return self.__modelTable.index(obj)
-        self.__modelTable.append(obj)
-        return len(self.__modelTable) - 1
+        return self.__addComponent(7, obj)
 
     def addAnimation(self, obj:PapaAnimation):
-        if obj in self.__animationTable:
-            return self.__animationTable.index(obj)
-        self.__animationTable.append(obj)
-        return len(self.__animationTable) - 1
+        return self.__addComponent(8, obj)
+
+    def __addComponent(self, tableIndex: int, obj) -> int:
+        idx = self.__getInternTable(tableIndex).get(obj)
+        if idx != None:
+            return idx
+        return self.__appendComponent(tableIndex, obj)
 
     # ---------- compiler portion -------------
     # Note: the compiler is quite simple, it just repacks the data (i.e. calling compile right after opening the file will write the exact same file back). It is
     # up to the programmer to correctly input the data for the compiler to pack
 
-    def compile(self):
-        return self.__compileData()
+    def compile(self, copy: bool = True, deduplicate: bool = False):
+        # every component is written straight into one preallocated buffer. With copy unset that buffer is returned as a memoryview
+        # rather than copied into bytes, which keeps only a single copy of the file in memory. See deduplicate() for its argument
+        if self.__lazy:
+            self.__loadAll()
+        if deduplicate:
+            self.deduplicate()
+        return self.__compileData(copy)
+
+    def write(self, file, deduplicate: bool = False):
+        # writes the compiled file to a path or a writable file object and returns its size. The layout is worked out first so each
+        # component is built on its own and written straight to its final offset, only the largest single component is ever held in
+        # memory. File objects that can't seek get the whole file compiled in memory and written at once
+        if self.__lazy:
+            self.__loadAll()
+        if deduplicate:
+            self.deduplicate()
+        if isinstance(file, (str, bytes, os.PathLike)):
+            with open(file, "wb") as f:
+                return self.write(f)
+
+        if not file.seekable():
+            data = self.__compileData(False)
+            file.write(data)
+            return len(data)
+
+        tableOffsets, fileSize = self.__calcLayout()
+        start = file.tell() # offsets in the file are relative to the papa header, which may not be at the start of the stream
+        header = bytearray(0x68)
+        self.__buildHeader(header, tableOffsets)
+        file.write(header)
+
+        for index in PapaFile.buildOrder:
+            self.__writeComponent(self.__allComponents[index], file, start, tableOffsets[index])
+
+        file.seek(start + fileSize)
+        return fileSize
     
     def getStringIndex(self, string: str):
-        for x in range(self.getNumStrings()):
-            if(self.getString(x) == string):
-                return x
-        return -1
-
-    def __compileData(self):
-
-        data = bytearray(self.__calcFileSize())
-
-        self.__buildHeader(data)
-        headerOffset = 32
-
-        buildOrder = [7,5,4,1,2,3,6,8,0]
-
-        position = 0x68 # the current write pointer
-
-        for index in buildOrder:
-            if(len(self.__allComponents[index]) != 0):
-                struct.pack_into('<q',data,headerOffset + 8 * index, position)
-            else:
-                struct.pack_into('<q',data,headerOffset + 8 * index, -1)
-            
-            position = self.__buildComponent(self.__allComponents[index], data, position)
-
-        return bytes(data)
-
-    def __buildHeader(self, header):
+        return self.__getInternTable(0).get(string, -1)
+
+    def deduplicate(self) -> int:
+        # merges vertex buffers, index buffers and materials that compile to the same bytes, then points the meshes and material
+        # groups at the copies that are kept. Returns the number of components removed. This changes the file's tables in place
+        if self.__lazy:
+            self.__loadAll()
+        removed = 0
+        remaps = {}
+        for tableIndex in (2, 3, 4):
+            remaps[tableIndex], count = self.__deduplicateTable(tableIndex)
+            removed += count
+        if removed == 0:
+            return 0
+
+        def remap(tableIndex, index):
+            table = remaps[tableIndex]
+            return table[index] if 0 <= index < len(table) else index
+
+        remapped = set() # material groups may be shared between meshes
+        for mesh in self.__meshTable:
+            if mesh is None:
+                continue
+            mesh.setVertexBufferIndex(remap(2, mesh.getVertexBufferIndex()))
+            mesh.setIndexBufferIndex(remap(3, mesh.getIndexBufferIndex()))
+            for i in range(mesh.getNumMaterialGroups()):
+                group = mesh.getMaterialGroup(i)
+                if id(group) in remapped:
+                    continue
+                remapped.add(id(group))
+                group.setMaterialIndex(remap(4, group.getMaterialIndex()))
+        self.logv("Removed " + str(removed) + " duplicate component(s)")
+        return removed
+
+    def __deduplicateTable(self, tableIndex: int):
+        # returns the new index of every entry and how many were dropped. Components are keyed by a hash of their built header and
+        # body, offsets are only filled in by applyOffset so they don't take part
+        table = self.__allComponents[tableIndex]
+        kept = []
+        remap = []
+        seen = {}
+        for component in table:
+            if component is None: # missing entries are left where they are
+                remap.append(len(kept))
+                kept.append(component)
+                continue
+            component.build()
+            digest = hashlib.sha256(component.getHeaderBytes())
+            digest.update(component.getBodyBytes())
+            component.releaseBytes()
+            key = (type(component), digest.digest())
+            if not key in seen:
+                seen[key] = len(kept)
+                kept.append(component)
+            remap.append(seen[key])
+
+        removed = len(table) - len(kept)
+        if removed != 0:
+            table[:] = kept # in place, __allComponents holds the same list
+            self.__internTables[tableIndex] = None
+        return remap, removed
+
+    def __compileData(self, copy):
+        tableOffsets, fileSize = self.__calcLayout()
+        data = bytearray(fileSize)
+        view = memoryview(data)
+
+        self.__buildHeader(data, tableOffsets)
+
+        for index in PapaFile.buildOrder:
+            self.__buildComponent(self.__allComponents[index], view, tableOffsets[index])
+
+        if copy:
+            return bytes(data)
+        return view
+
+    def __buildHeader(self, header, tableOffsets):
         sigVal = bytearray(self.__signature)
         for _ in range(len(sigVal),6):
             sigVal.append(0)
         struct.pack_into('<IhhhhhhhhhhhBBBBBB',header,0,0x50617061,0,3,self.getNumStrings(), self.getNumTextures(), self.getNumVertexBuffers(),
             self.getNumIndexBuffers(),self.getNumMaterials(), self.getNumMeshes(), self.getNumSkeletons(), self.getNumModels(), self.getNumAnimations(),
             *sigVal)
+        headerOffset = 32
+        for index in range(len(tableOffsets)):
+            struct.pack_into('<q',header,headerOffset + 8 * index, tableOffsets[index])
 
-    def __buildComponent(self, componentList, data, position): # position is the current write position of the byte array
-        currentSize = 0 # used to offset from the header
-        # calculate the total size of this batch
-        for component in componentList:
-            component.build()
-            currentSize+=component.headerSize() # all headers are aligned to be multiples of 8, so no need to ceilEight
-        
+    def __buildComponent(self, componentList, view, position): # position is where the table starts in the file
+        # a table is all of its headers followed by all of its bodies, each body padded to 8 bytes
+        headerPosition = position
+        bodyPosition = position + sum(component.headerSize() for component in componentList) # headers are multiples of 8
         for component in componentList:
-            component.applyOffset(currentSize + position)
-            currentSize+=ceilEight(component.bodySize())
-        
-        # write the batch into the file bytes
-        for component in componentList:
-            data[position: position + len(component.getHeaderBytes())] = component.getHeaderBytes()
-            position += component.headerSize()
-        
+            headerSize = component.headerSize()
+            bodySize = component.bodySize()
+            component.build(view[headerPosition:headerPosition + headerSize], view[bodyPosition:bodyPosition + bodySize])
+            component.applyOffset(bodyPosition)
+            component.releaseBytes()
+            headerPosition += headerSize
+            bodyPosition += ceilEight(bodySize)
+    
+    def __writeComponent(self, componentList, file, start, position):
+        # the same layout as __buildComponent, but each component gets its own buffers and is written out before the next is built
+        headerPosition = position
+        bodyPosition = position + sum(component.headerSize() for component in componentList)
         for component in componentList:
-            data[position: position + len(component.getBodyBytes())] = component.getBodyBytes()
-            position += component.bodySize()
-            position = ceilEight(position)
-        
-        return position
-        
-    
-    def __calcFileSize(self):
-        totalSize = 0x68 # header
-        for table in self.__allComponents:
+            headerSize = component.headerSize()
+            bodySize = component.bodySize()
+            component.build()
+            component.applyOffset(bodyPosition)
+            file.seek(start + headerPosition)
+            file.write(component.getHeaderBytes())
+            file.seek(start + bodyPosition)
+            file.write(component.getBodyBytes())
+            file.write(bytes(ceilEight(bodySize) - bodySize))
+            component.releaseBytes()
+            headerPosition += headerSize
+            bodyPosition += ceilEight(bodySize)
+
+    def __calcLayout(self):
+        # the offset of every table (-1 when empty) and the size of the whole file, laid out in build order
+        tableOffsets = [-1] * len(self.__allComponents)
+        position = 0x68 # header
+        for index in PapaFile.buildOrder:
+            table = self.__allComponents[index]
+            if len(table) != 0:
+                tableOffsets[index] = position
             for component in table:
-                totalSize+=component.componentSize()
-        return totalSize
+                position+=component.headerSize() + ceilEight(component.bodySize())
+        return tableOffsets, position
 
 
 def ceilEight(num):
@@ -1838,4 +2996,6 @@ def ceilEight(num):
 def ceilNextEight(num):
     return ceilEight(num + 1)
 
-PapaFile.loadTextureLibrary()
\ No newline at end of file
+PapaFile.loadTextureLibrary(build=False)
+PapaTextureCache.setup()
+PapaBufferPool.setup()
\ No newline at end of file
@@ -19,6 +19,21 @@
 // LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
 // OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
 // SOFTWARE.
+#include <math.h>
+#include <stdlib.h>
+#include <string.h>
+#ifdef _WIN32
+#include <windows.h>
+#define EXPORT __declspec(dllexport)
+#else
+#include <pthread.h>
+#include <unistd.h>
+#define EXPORT
+#endif
+
+// version of the exported interface, PapaFile refuses to load a library reporting a different one
+#define PTEX_VERSION 2
+
 void dxtDecodeColourMap( unsigned char* data, int dataLoc, float colours[4][3] ) { // [[R,G,B] * 4]
     unsigned int colour0 = (data[dataLoc+0]) | (data[dataLoc+1] << 8);
     unsigned int colour1 = (data[dataLoc+2]) | (data[dataLoc+3] << 8);
@@ -92,12 +107,530 @@ void dxtDecodeAlphaMap( unsigned char* data, int dataLoc, float alphaValues[16]
     }
 }
 
-void decodeTexture( unsigned char* data, int width, int height, int format, float* dst ) {
+void dxtDecodeExplicitAlphaMap( unsigned char* data, int dataLoc, float alphaValues[16] ) { // DXT3, 4 bits per texel
+    for(int i=0; i<8; i++) {
+        alphaValues[i * 2] = (float)((data[i+dataLoc] & 0xf) * 17) / 255.0;
+        alphaValues[i * 2 + 1] = (float)((data[i+dataLoc] >> 4) * 17) / 255.0;
+    }
+}
+
+// ---------- SIMD DXT decoding -------------
+// The SIMD path decodes a group of horizontally adjacent blocks at once, 4 with SSE2 and 8 with AVX2. The endpoints of every
+// block in the group are expanded from 565 and turned into palettes in SIMD lanes, one block per lane, with no branches on the
+// colour or alpha mode. Each palette value is one correctly rounded float division of the same integers the scalar path divides,
+// so both produce identical floats. The store loops then write each pixel row of the group in one pass into the flipped output.
+// Byte output only has an AVX2 path, which reuses the scalar byte palettes. AVX2 is used by default where the processor has it,
+// SSE2 measures no faster than scalar so it is only used when setSimdLevel asks for it.
+
+#if (defined(__GNUC__) && (defined(__x86_64__) || defined(__i386__))) || (defined(_MSC_VER) && (defined(_M_X64) || defined(_M_IX86)))
+#define SIMD_X86
+#include <immintrin.h>
+// the block helpers are always inlined so they are compiled for the instruction set of the caller, mixing legacy SSE and
+// AVX encodings in one loop is very slow. Helpers using AVX2 instructions also need the target themselves
+#ifdef _MSC_VER
+#define TARGET_SSE2
+#define TARGET_AVX2
+#define SIMD_INLINE static __forceinline
+#define AVX2_INLINE static __forceinline
+#else
+#define TARGET_SSE2 __attribute__((target("sse2")))
+#define TARGET_AVX2 __attribute__((target("avx2")))
+#define SIMD_INLINE static inline __attribute__((always_inline))
+#define AVX2_INLINE static inline __attribute__((always_inline, target("avx2")))
+#endif
+#ifdef _MSC_VER
+#include <intrin.h>
+#endif
+#else
+#define SIMD_INLINE static inline
+#endif
+
+#define SIMD_NONE 0
+#define SIMD_SSE2 1
+#define SIMD_AVX2 2
+
+// simdLevel is only written through setSimdLevel and every decode reads it once, so a change never splits a texture between
+// two paths. supportedSimdLevel, defaultSimdLevel and explicitAlpha are set once by initDecoder
+#ifdef _MSC_VER
+#define loadLevel(level) (*(volatile int*)&(level))
+#define storeLevel(level, value) (*(volatile int*)&(level) = (value))
+#else
+#define loadLevel(level) __atomic_load_n(&(level), __ATOMIC_RELAXED)
+#define storeLevel(level, value) __atomic_store_n(&(level), (value), __ATOMIC_RELAXED)
+#endif
+
+static int supportedSimdLevel = SIMD_NONE;
+static int defaultSimdLevel = SIMD_NONE;
+static int simdLevel = SIMD_NONE;
+static float explicitAlpha[16]; // DXT3 alpha values, the same as dxtDecodeExplicitAlphaMap
+
+static void detectDecoder() {
+    for(int i=0; i<16; i++) {
+        explicitAlpha[i] = (float)(i * 17) / 255.0;
+    }
+    int level = SIMD_NONE;
+#if defined(__GNUC__) && (defined(__x86_64__) || defined(__i386__))
+    __builtin_cpu_init();
+    if(__builtin_cpu_supports("avx2")) {
+        level = SIMD_AVX2;
+    } else if(__builtin_cpu_supports("sse2")) {
+        level = SIMD_SSE2;
+    }
+#elif defined(_MSC_VER) && (defined(_M_X64) || defined(_M_IX86))
+    int info[4];
+    __cpuid(info, 0);
+    int maxLeaf = info[0];
+    __cpuid(info, 1);
+    if(info[3] & (1 << 26)) {
+        level = SIMD_SSE2;
+    }
+    // AVX2 needs the OS to save the YMM registers as well as the CPU flag
+    if(maxLeaf >= 7 && (info[2] & (1 << 27)) && (info[2] & (1 << 28)) && (_xgetbv(0) & 6) == 6) {
+        __cpuidex(info, 7, 0);
+        if(info[1] & (1 << 5)) {
+            level = SIMD_AVX2;
+        }
+    }
+#endif
+    supportedSimdLevel = level;
+    // the SSE2 path only decodes four blocks at a time and measures no faster than scalar, so it has to be asked for
+    defaultSimdLevel = level == SIMD_AVX2 ? SIMD_AVX2 : SIMD_NONE;
+    storeLevel(simdLevel, defaultSimdLevel);
+}
+
+#ifdef _WIN32
+static INIT_ONCE decoderOnce = INIT_ONCE_STATIC_INIT;
+
+static BOOL CALLBACK detectDecoderOnce( PINIT_ONCE once, PVOID parameter, PVOID* context ) {
+    (void)once; (void)parameter; (void)context;
+    detectDecoder();
+    return TRUE;
+}
+
+static void initDecoder() {
+    InitOnceExecuteOnce(&decoderOnce, detectDecoderOnce, NULL, NULL);
+}
+#else
+static pthread_once_t decoderOnce = PTHREAD_ONCE_INIT;
+
+static void initDecoder() {
+    pthread_once(&decoderOnce, detectDecoder);
+}
+#endif
+
+// returns the instruction set used for DXT decoding, 0 = scalar, 1 = SSE2, 2 = AVX2
+EXPORT int getSimdLevel() {
+    initDecoder();
+    return loadLevel(simdLevel);
+}
+
+// limits the instruction set used for DXT decoding. Levels the processor does not support select the highest one it does, a
+// negative level restores the default. Returns the level now in use
+EXPORT int setSimdLevel( int level ) {
+    initDecoder();
+    if(level < 0) {
+        level = defaultSimdLevel;
+    } else if(level > supportedSimdLevel) {
+        level = supportedSimdLevel;
+    }
+    storeLevel(simdLevel, level);
+    return level;
+}
+
+#ifdef SIMD_X86
+
+typedef struct {
+    const unsigned char* data;
+    int blockSize;
+    int alphaShift; // bits per texel of the alpha indices, 3 for DXT5, 4 for DXT3 and 0 for DXT1
+    int width;
+    int heightZero;
+    float* dst;
+} DxtSource;
+
+// palettes and index bits of a group of blocks, laid out for the store loops
+typedef struct {
+    __m128 colours[8][4]; // RGBA entries, the alpha lane is 1 for DXT1 and 0 where the alpha is blended in afterwards
+    float alphas[8][8]; // DXT5 alpha palette of each block
+    unsigned int bits[8]; // colour indices, 2 bits per texel
+    unsigned long long alphaBits[8]; // alpha indices, alphaShift bits per texel
+} DxtGroup;
+
+// the four palette entries of one colour channel, one block per lane. Matches dxtDecodeColourMap
+SIMD_INLINE void dxtChannelSSE2( __m128i channel0, __m128i channel1, __m128 fourColour, __m128 entries[4] ) {
+    __m128 c0 = _mm_cvtepi32_ps(channel0);
+    __m128 c1 = _mm_cvtepi32_ps(channel1);
+    entries[0] = _mm_div_ps(c0, _mm_set1_ps(255.0f));
+    entries[1] = _mm_div_ps(c1, _mm_set1_ps(255.0f));
+    // (2 * c0 + c1) / 765 with four colours, (c0 + c1) / 510 and black with three
+    __m128 middle = _mm_add_ps(_mm_add_ps(c0, c1), _mm_and_ps(fourColour, c0));
+    __m128 divisor = _mm_or_ps(_mm_and_ps(fourColour, _mm_set1_ps(765.0f)), _mm_andnot_ps(fourColour, _mm_set1_ps(510.0f)));
+    entries[2] = _mm_div_ps(middle, divisor);
+    entries[3] = _mm_and_ps(fourColour, _mm_div_ps(_mm_add_ps(c0, _mm_add_ps(c1, c1)), _mm_set1_ps(765.0f)));
+}
+
+SIMD_INLINE __m128 dxtSelectSSE2( __m128 mask, __m128 a, __m128 b ) {
+    return _mm_or_ps(_mm_and_ps(mask, a), _mm_andnot_ps(mask, b));
+}
+
+// builds the palettes of the 4 blocks at blocks into the first 4 group entries
+SIMD_INLINE void dxtLoadGroupSSE2( const DxtSource* src, const unsigned char* blocks, DxtGroup* group ) {
+    __m128 q0, q1, q2, q3; // one dword of every block each: alpha bytes 0-3, alpha bytes 4-7, endpoints, colour indices
+    if(src->blockSize == 8) {
+        __m128 blocks01 = _mm_loadu_ps((const float*)blocks);
+        __m128 blocks23 = _mm_loadu_ps((const float*)(blocks + 16));
+        q2 = _mm_shuffle_ps(blocks01, blocks23, _MM_SHUFFLE(2, 0, 2, 0));
+        q3 = _mm_shuffle_ps(blocks01, blocks23, _MM_SHUFFLE(3, 1, 3, 1));
+        q0 = q1 = _mm_setzero_ps();
+    } else {
+        q0 = _mm_loadu_ps((const float*)blocks);
+        q1 = _mm_loadu_ps((const float*)(blocks + 16));
+        q2 = _mm_loadu_ps((const float*)(blocks + 32));
+        q3 = _mm_loadu_ps((const float*)(blocks + 48));
+        _MM_TRANSPOSE4_PS(q0, q1, q2, q3);
+    }
+    _mm_storeu_si128((__m128i*)group->bits, _mm_castps_si128(q3));
+
+    __m128i endpoints = _mm_castps_si128(q2);
+    __m128i colour0 = _mm_and_si128(endpoints, _mm_set1_epi32(0xffff));
+    __m128i colour1 = _mm_srli_epi32(endpoints, 16);
+    __m128 fourColour = _mm_castsi128_ps(_mm_cmpgt_epi32(colour0, colour1));
+    __m128 red[4], green[4], blue[4];
+    dxtChannelSSE2(_mm_and_si128(_mm_srli_epi32(colour0, 8), _mm_set1_epi32(0xf8)),
+        _mm_and_si128(_mm_srli_epi32(colour1, 8), _mm_set1_epi32(0xf8)), fourColour, red);
+    dxtChannelSSE2(_mm_and_si128(_mm_srli_epi32(colour0, 3), _mm_set1_epi32(0xfc)),
+        _mm_and_si128(_mm_srli_epi32(colour1, 3), _mm_set1_epi32(0xfc)), fourColour, green);
+    dxtChannelSSE2(_mm_and_si128(_mm_slli_epi32(colour0, 3), _mm_set1_epi32(0xf8)),
+        _mm_and_si128(_mm_slli_epi32(colour1, 3), _mm_set1_epi32(0xf8)), fourColour, blue);
+    __m128 alpha = _mm_set1_ps(src->blockSize == 8 ? 1.0f : 0.0f);
+    for(int k=0; k<4; k++) {
+        __m128 r = red[k], g = green[k], b = blue[k], a = alpha;
+        _MM_TRANSPOSE4_PS(r, g, b, a);
+        group->colours[0][k] = r;
+        group->colours[1][k] = g;
+        group->colours[2][k] = b;
+        group->colours[3][k] = a;
+    }
+
+    if(src->alphaShift == 0) {
+        return;
+    }
+    for(int i=0; i<4; i++) {
+        memcpy(group->alphaBits + i, blocks + i * 16, 8);
+        if(src->alphaShift == 3) { // the first two bytes are the DXT5 endpoints
+            group->alphaBits[i] >>= 16;
+        }
+    }
+    if(src->alphaShift == 4) {
+        return;
+    }
+
+    // DXT5, the same arithmetic as dxtDecodeAlphaMap. The products and sums are small integers so they are exact in floats
+    __m128i alphaWord = _mm_castps_si128(q0);
+    __m128 alpha0 = _mm_cvtepi32_ps(_mm_and_si128(alphaWord, _mm_set1_epi32(0xff)));
+    __m128 alpha1 = _mm_cvtepi32_ps(_mm_and_si128(_mm_srli_epi32(alphaWord, 8), _mm_set1_epi32(0xff)));
+    __m128 sevenAlpha = _mm_cmpgt_ps(alpha0, alpha1);
+    __m128 divisor = dxtSelectSSE2(sevenAlpha, _mm_set1_ps(7.0f), _mm_set1_ps(5.0f));
+    __m128 entries[8];
+    entries[0] = _mm_div_ps(alpha0, _mm_set1_ps(255.0f));
+    entries[1] = _mm_div_ps(alpha1, _mm_set1_ps(255.0f));
+    for(int i=1; i<7; i++) {
+        __m128 seven = _mm_add_ps(_mm_mul_ps(_mm_set1_ps((float)(7 - i)), alpha0), _mm_mul_ps(_mm_set1_ps((float)i), alpha1));
+        if(i < 5) {
+            __m128 five = _mm_add_ps(_mm_mul_ps(_mm_set1_ps((float)(5 - i)), alpha0), _mm_mul_ps(_mm_set1_ps((float)i), alpha1));
+            entries[i + 1] = _mm_div_ps(_mm_div_ps(dxtSelectSSE2(sevenAlpha, seven, five), divisor), _mm_set1_ps(255.0f));
+        } else {
+            __m128 value = _mm_div_ps(_mm_div_ps(seven, _mm_set1_ps(7.0f)), _mm_set1_ps(255.0f));
+            entries[i + 1] = dxtSelectSSE2(sevenAlpha, value, _mm_set1_ps(i == 5 ? 0.0f : 1.0f));
+        }
+    }
+    _MM_TRANSPOSE4_PS(entries[0], entries[1], entries[2], entries[3]);
+    _MM_TRANSPOSE4_PS(entries[4], entries[5], entries[6], entries[7]);
+    for(int i=0; i<4; i++) {
+        _mm_storeu_ps(group->alphas[i], entries[i]);
+        _mm_storeu_ps(group->alphas[i] + 4, entries[i + 4]);
+    }
+}
+
+// the texel of a block at a given position, with its alpha moved into the last lane
+SIMD_INLINE __m128 dxtTexelSSE2( const DxtSource* src, const DxtGroup* group, int block, int texel ) {
+    __m128 value = group->colours[block][(group->bits[block] >> (texel * 2)) & 0b11];
+    if(src->alphaShift) {
+        unsigned int index = (unsigned int)(group->alphaBits[block] >> (texel * src->alphaShift)) & ((1 << src->alphaShift) - 1);
+        const float* alpha = src->alphaShift == 4 ? explicitAlpha + index : group->alphas[block] + index;
+        value = _mm_or_ps(value, _mm_castsi128_ps(_mm_slli_si128(_mm_castps_si128(_mm_load_ss(alpha)), 12)));
+    }
+    return value;
+}
+
+// writes the visible columns and rows of a block that is cut off by the edge of the texture
+SIMD_INLINE void dxtStorePartialBlock( const DxtSource* src, const DxtGroup* group, int block, int x, int y, int columns, int rows ) {
+    for(int yy=0; yy<rows; yy++) {
+        float* row = src->dst + ((size_t)(src->heightZero - (y + yy)) * src->width + x) * 4;
+        for(int xx=0; xx<columns; xx++) {
+            _mm_storeu_ps(row + xx * 4, dxtTexelSSE2(src, group, block, xx + yy * 4));
+        }
+    }
+}
+
+// the group starting at block column blockX, padded with empty blocks past the right edge of the texture
+SIMD_INLINE const unsigned char* dxtGroupBlocks( const DxtSource* src, const unsigned char* blocks, int blockX, int blocksWide, int groupSize,
+        unsigned char* padded ) {
+    if(blockX + groupSize <= blocksWide) {
+        return blocks;
+    }
+    memset(padded, 0, (size_t)groupSize * src->blockSize);
+    memcpy(padded, blocks, (size_t)(blocksWide - blockX) * src->blockSize);
+    return padded;
+}
+
+TARGET_SSE2 static void decodeDxtRowsSSE2( const DxtSource* src, int rowStart, int rowEnd ) {
+    int height = src->heightZero + 1;
+    int blocksWide = (src->width + 3) / 4;
+    size_t rowStride = (size_t)src->width * 4;
+    DxtGroup group;
+    unsigned char padded[4 * 16];
+
+    for(int y=rowStart; y<rowEnd; y+=4) {
+        const unsigned char* blockRow = src->data + (size_t)(y / 4) * blocksWide * src->blockSize;
+        for(int blockX=0; blockX<blocksWide; blockX+=4) {
+            dxtLoadGroupSSE2(src, dxtGroupBlocks(src, blockRow + (size_t)blockX * src->blockSize, blockX, blocksWide, 4, padded),
+                &group);
+            int blocks = blocksWide - blockX < 4 ? blocksWide - blockX : 4;
+            int x = blockX * 4;
+
+            if(x + blocks * 4 > src->width || y + 4 > height) {
+                for(int block=0; block<blocks; block++) {
+                    int blockLeft = x + block * 4;
+                    dxtStorePartialBlock(src, &group, block, blockLeft, y, src->width - blockLeft < 4 ? src->width - blockLeft : 4,
+                        height - y < 4 ? height - y : 4);
+                }
+                continue;
+            }
+
+            // every pixel row of the group is written left to right before moving down the output
+            float* row = src->dst + ((size_t)(src->heightZero - y) * src->width + x) * 4;
+            for(int yy=0; yy<4; yy++, row -= rowStride) {
+                float* texel = row;
+                for(int block=0; block<blocks; block++) {
+                    unsigned int bits = group.bits[block] >> (yy * 8);
+                    const __m128* colours = group.colours[block];
+                    if(src->alphaShift == 0) {
+                        _mm_storeu_ps(texel, colours[bits & 0b11]);
+                        _mm_storeu_ps(texel + 4, colours[(bits >> 2) & 0b11]);
+                        _mm_storeu_ps(texel + 8, colours[(bits >> 4) & 0b11]);
+                        _mm_storeu_ps(texel + 12, colours[(bits >> 6) & 0b11]);
+                    } else {
+                        // the colour is stored whole and its alpha lane overwritten with the looked up alpha
+                        int shift = src->alphaShift;
+                        unsigned int mask = (1u << shift) - 1;
+                        unsigned int alphaBits = (unsigned int)(group.alphaBits[block] >> (yy * 4 * shift));
+                        const float* alphas = shift == 4 ? explicitAlpha : group.alphas[block];
+                        for(int xx=0; xx<4; xx++) {
+                            _mm_storeu_ps(texel + xx * 4, colours[(bits >> (xx * 2)) & 0b11]);
+                            texel[xx * 4 + 3] = alphas[(alphaBits >> (xx * shift)) & mask];
+                        }
+                    }
+                    texel += 16;
+                }
+            }
+        }
+    }
+}
+
+// 8 block version of dxtChannelSSE2
+AVX2_INLINE void dxtChannelAVX2( __m256i channel0, __m256i channel1, __m256 fourColour, __m256 entries[4] ) {
+    __m256 c0 = _mm256_cvtepi32_ps(channel0);
+    __m256 c1 = _mm256_cvtepi32_ps(channel1);
+    entries[0] = _mm256_div_ps(c0, _mm256_set1_ps(255.0f));
+    entries[1] = _mm256_div_ps(c1, _mm256_set1_ps(255.0f));
+    __m256 middle = _mm256_add_ps(_mm256_add_ps(c0, c1), _mm256_and_ps(fourColour, c0));
+    entries[2] = _mm256_div_ps(middle, _mm256_blendv_ps(_mm256_set1_ps(510.0f), _mm256_set1_ps(765.0f), fourColour));
+    entries[3] = _mm256_and_ps(fourColour, _mm256_div_ps(_mm256_add_ps(c0, _mm256_add_ps(c1, c1)), _mm256_set1_ps(765.0f)));
+}
+
+// transposes four registers of 8 lanes so that each 128 bit half holds one lane of all four, the low halves of the results
+// are lanes 0-3 and the high halves lanes 4-7
+#define TRANSPOSE4_AVX(row0, row1, row2, row3) do { \
+        __m256 t0 = _mm256_unpacklo_ps(row0, row1), t1 = _mm256_unpacklo_ps(row2, row3); \
+        __m256 t2 = _mm256_unpackhi_ps(row0, row1), t3 = _mm256_unpackhi_ps(row2, row3); \
+        row0 = _mm256_shuffle_ps(t0, t1, _MM_SHUFFLE(1, 0, 1, 0)); \
+        row1 = _mm256_shuffle_ps(t0, t1, _MM_SHUFFLE(3, 2, 3, 2)); \
+        row2 = _mm256_shuffle_ps(t2, t3, _MM_SHUFFLE(1, 0, 1, 0)); \
+        row3 = _mm256_shuffle_ps(t2, t3, _MM_SHUFFLE(3, 2, 3, 2)); \
+    } while(0)
+
+AVX2_INLINE __m256 dxtLoadPairAVX2( const unsigned char* low, const unsigned char* high ) {
+    return _mm256_insertf128_ps(_mm256_castps128_ps256(_mm_loadu_ps((const float*)low)), _mm_loadu_ps((const float*)high), 1);
+}
+
+AVX2_INLINE void dxtStoreHalvesAVX2( __m256 value, __m128* low, __m128* high ) {
+    *low = _mm256_castps256_ps128(value);
+    *high = _mm256_extractf128_ps(value, 1);
+}
+
+// builds the palettes of the 8 blocks at blocks into every group entry
+AVX2_INLINE void dxtLoadGroupAVX2( const DxtSource* src, const unsigned char* blocks, DxtGroup* group ) {
+    __m256 q0, q1, q2, q3; // as in dxtLoadGroupSSE2, lanes are blocks 0 to 7
+    if(src->blockSize == 8) {
+        __m256 blocks0145 = dxtLoadPairAVX2(blocks, blocks + 32);
+        __m256 blocks2367 = dxtLoadPairAVX2(blocks + 16, blocks + 48);
+        q2 = _mm256_shuffle_ps(blocks0145, blocks2367, _MM_SHUFFLE(2, 0, 2, 0));
+        q3 = _mm256_shuffle_ps(blocks0145, blocks2367, _MM_SHUFFLE(3, 1, 3, 1));
+        q0 = _mm256_setzero_ps();
+    } else {
+        q0 = dxtLoadPairAVX2(blocks, blocks + 64);
+        q1 = dxtLoadPairAVX2(blocks + 16, blocks + 80);
+        q2 = dxtLoadPairAVX2(blocks + 32, blocks + 96);
+        q3 = dxtLoadPairAVX2(blocks + 48, blocks + 112);
+        TRANSPOSE4_AVX(q0, q1, q2, q3);
+    }
+    _mm256_storeu_si256((__m256i*)group->bits, _mm256_castps_si256(q3));
+
+    __m256i endpoints = _mm256_castps_si256(q2);
+    __m256i colour0 = _mm256_and_si256(endpoints, _mm256_set1_epi32(0xffff));
+    __m256i colour1 = _mm256_srli_epi32(endpoints, 16);
+    __m256 fourColour = _mm256_castsi256_ps(_mm256_cmpgt_epi32(colour0, colour1));
+    __m256 red[4], green[4], blue[4];
+    dxtChannelAVX2(_mm256_and_si256(_mm256_srli_epi32(colour0, 8), _mm256_set1_epi32(0xf8)),
+        _mm256_and_si256(_mm256_srli_epi32(colour1, 8), _mm256_set1_epi32(0xf8)), fourColour, red);
+    dxtChannelAVX2(_mm256_and_si256(_mm256_srli_epi32(colour0, 3), _mm256_set1_epi32(0xfc)),
+        _mm256_and_si256(_mm256_srli_epi32(colour1, 3), _mm256_set1_epi32(0xfc)), fourColour, green);
+    dxtChannelAVX2(_mm256_and_si256(_mm256_slli_epi32(colour0, 3), _mm256_set1_epi32(0xf8)),
+        _mm256_and_si256(_mm256_slli_epi32(colour1, 3), _mm256_set1_epi32(0xf8)), fourColour, blue);
+    __m256 alpha = _mm256_set1_ps(src->blockSize == 8 ? 1.0f : 0.0f);
+    for(int k=0; k<4; k++) {
+        __m256 r = red[k], g = green[k], b = blue[k], a = alpha;
+        TRANSPOSE4_AVX(r, g, b, a);
+        dxtStoreHalvesAVX2(r, &group->colours[0][k], &group->colours[4][k]);
+        dxtStoreHalvesAVX2(g, &group->colours[1][k], &group->colours[5][k]);
+        dxtStoreHalvesAVX2(b, &group->colours[2][k], &group->colours[6][k]);
+        dxtStoreHalvesAVX2(a, &group->colours[3][k], &group->colours[7][k]);
+    }
+
+    if(src->alphaShift == 0) {
+        return;
+    }
+    for(int i=0; i<8; i++) {
+        memcpy(group->alphaBits + i, blocks + i * 16, 8);
+        if(src->alphaShift == 3) {
+            group->alphaBits[i] >>= 16;
+        }
+    }
+    if(src->alphaShift == 4) {
+        return;
+    }
+
+    __m256i alphaWord = _mm256_castps_si256(q0);
+    __m256 alpha0 = _mm256_cvtepi32_ps(_mm256_and_si256(alphaWord, _mm256_set1_epi32(0xff)));
+    __m256 alpha1 = _mm256_cvtepi32_ps(_mm256_and_si256(_mm256_srli_epi32(alphaWord, 8), _mm256_set1_epi32(0xff)));
+    __m256 sevenAlpha = _mm256_cmp_ps(alpha0, alpha1, _CMP_GT_OQ);
+    __m256 divisor = _mm256_blendv_ps(_mm256_set1_ps(5.0f), _mm256_set1_ps(7.0f), sevenAlpha);
+    __m256 entries[8];
+    entries[0] = _mm256_div_ps(alpha0, _mm256_set1_ps(255.0f));
+    entries[1] = _mm256_div_ps(alpha1, _mm256_set1_ps(255.0f));
+    for(int i=1; i<7; i++) {
+        __m256 seven = _mm256_add_ps(_mm256_mul_ps(_mm256_set1_ps((float)(7 - i)), alpha0), _mm256_mul_ps(_mm256_set1_ps((float)i), alpha1));
+        if(i < 5) {
+            __m256 five = _mm256_add_ps(_mm256_mul_ps(_mm256_set1_ps((float)(5 - i)), alpha0), _mm256_mul_ps(_mm256_set1_ps((float)i), alpha1));
+            entries[i + 1] = _mm256_div_ps(_mm256_div_ps(_mm256_blendv_ps(five, seven, sevenAlpha), divisor), _mm256_set1_ps(255.0f));
+        } else {
+            __m256 value = _mm256_div_ps(_mm256_div_ps(seven, _mm256_set1_ps(7.0f)), _mm256_set1_ps(255.0f));
+            entries[i + 1] = _mm256_blendv_ps(_mm256_set1_ps(i == 5 ? 0.0f : 1.0f), value, sevenAlpha);
+        }
+    }
+    TRANSPOSE4_AVX(entries[0], entries[1], entries[2], entries[3]);
+    TRANSPOSE4_AVX(entries[4], entries[5], entries[6], entries[7]);
+    for(int i=0; i<4; i++) {
+        dxtStoreHalvesAVX2(entries[i], (__m128*)group->alphas[i], (__m128*)group->alphas[i + 4]);
+        dxtStoreHalvesAVX2(entries[i + 4], (__m128*)(group->alphas[i] + 4), (__m128*)(group->alphas[i + 4] + 4));
+    }
+}
+
+TARGET_AVX2 static void decodeDxtRowsAVX2( const DxtSource* src, int rowStart, int rowEnd ) {
+    int height = src->heightZero + 1;
+    int blocksWide = (src->width + 3) / 4;
+    size_t rowStride = (size_t)src->width * 4;
+    DxtGroup group;
+    unsigned char padded[8 * 16];
+    // each pair of texels takes its alpha from lanes 3 and 7, permutevar8x32 only looks at the low 3 bits of the index
+    const __m256i alphaShifts[2] = { _mm256_setr_epi32(0, 0, 0, 0, 3, 3, 3, 3), _mm256_setr_epi32(6, 6, 6, 6, 9, 9, 9, 9) };
+    const __m256i explicitShifts[2] = { _mm256_setr_epi32(0, 0, 0, 0, 4, 4, 4, 4), _mm256_setr_epi32(8, 8, 8, 8, 12, 12, 12, 12) };
+    __m256 explicitLow = _mm256_loadu_ps(explicitAlpha);
+    __m256 explicitHigh = _mm256_loadu_ps(explicitAlpha + 8);
+
+    for(int y=rowStart; y<rowEnd; y+=4) {
+        const unsigned char* blockRow = src->data + (size_t)(y / 4) * blocksWide * src->blockSize;
+        for(int blockX=0; blockX<blocksWide; blockX+=8) {
+            dxtLoadGroupAVX2(src, dxtGroupBlocks(src, blockRow + (size_t)blockX * src->blockSize, blockX, blocksWide, 8, padded), &group);
+            int blocks = blocksWide - blockX < 8 ? blocksWide - blockX : 8;
+            int x = blockX * 4;
+
+            if(x + blocks * 4 > src->width || y + 4 > height) {
+                for(int block=0; block<blocks; block++) {
+                    int blockLeft = x + block * 4;
+                    dxtStorePartialBlock(src, &group, block, blockLeft, y, src->width - blockLeft < 4 ? src->width - blockLeft : 4,
+                        height - y < 4 ? height - y : 4);
+                }
+                continue;
+            }
+
+            float* row = src->dst + ((size_t)(src->heightZero - y) * src->width + x) * 4;
+            for(int yy=0; yy<4; yy++, row -= rowStride) {
+                float* texel = row;
+                for(int block=0; block<blocks; block++, texel += 16) {
+                    unsigned int bits = group.bits[block] >> (yy * 8);
+                    const __m128* colours = group.colours[block];
+                    __m256 pair0 = _mm256_insertf128_ps(_mm256_castps128_ps256(colours[bits & 0b11]), colours[(bits >> 2) & 0b11], 1);
+                    __m256 pair1 = _mm256_insertf128_ps(_mm256_castps128_ps256(colours[(bits >> 4) & 0b11]), colours[(bits >> 6) & 0b11], 1);
+                    if(src->alphaShift == 3) {
+                        __m256 palette = _mm256_loadu_ps(group.alphas[block]);
+                        __m256i indices = _mm256_set1_epi32((int)(group.alphaBits[block] >> (yy * 12)));
+                        pair0 = _mm256_blend_ps(pair0, _mm256_permutevar8x32_ps(palette, _mm256_srlv_epi32(indices, alphaShifts[0])), 0x88);
+                        pair1 = _mm256_blend_ps(pair1, _mm256_permutevar8x32_ps(palette, _mm256_srlv_epi32(indices, alphaShifts[1])), 0x88);
+                    } else if(src->alphaShift == 4) {
+                        // 16 explicit values, bit 3 of each index picks the table half through the sign bit
+                        __m256i indices = _mm256_set1_epi32((int)(group.alphaBits[block] >> (yy * 16)));
+                        __m256i index0 = _mm256_srlv_epi32(indices, explicitShifts[0]);
+                        __m256i index1 = _mm256_srlv_epi32(indices, explicitShifts[1]);
+                        __m256 alpha0 = _mm256_blendv_ps(_mm256_permutevar8x32_ps(explicitLow, index0),
+                            _mm256_permutevar8x32_ps(explicitHigh, index0), _mm256_castsi256_ps(_mm256_slli_epi32(index0, 28)));
+                        __m256 alpha1 = _mm256_blendv_ps(_mm256_permutevar8x32_ps(explicitLow, index1),
+                            _mm256_permutevar8x32_ps(explicitHigh, index1), _mm256_castsi256_ps(_mm256_slli_epi32(index1, 28)));
+                        pair0 = _mm256_blend_ps(pair0, alpha0, 0x88);
+                        pair1 = _mm256_blend_ps(pair1, alpha1, 0x88);
+                    }
+                    _mm256_storeu_ps(texel, pair0);
+                    _mm256_storeu_ps(texel + 8, pair1);
+                }
+            }
+        }
+    }
+}
+#endif
+
+// decodes the pixel rows [rowStart, rowEnd) with the given SIMD level. rowStart must be a multiple of 4 so DXT block rows are
+// never split.
+static void decodeTextureRows( unsigned char* data, int width, int height, int format, float* dst, int rowStart, int rowEnd, int simd ) {
 
     int heightZero = height - 1;
 
+#ifdef SIMD_X86
+    if((format == 4 || format == 5 || format == 6) && simd >= SIMD_SSE2) {
+        DxtSource src = { data, format == 4 ? 8 : 16, format == 4 ? 0 : (format == 5 ? 4 : 3), width, heightZero, dst };
+        if(simd >= SIMD_AVX2) {
+            decodeDxtRowsAVX2(&src, rowStart, rowEnd);
+        } else {
+            decodeDxtRowsSSE2(&src, rowStart, rowEnd);
+        }
+        return;
+    }
+#else
+    (void)simd;
+#endif
+
     if(format == 1) { // RGBA8888
-        for(int y=0; y<height; y++) {
+        for(int y=rowStart; y<rowEnd; y++) {
             for (int x = 0; x<width; x++) {
                 int i = (x + (heightZero - y) * width) * 4;
                 int i2 = (x + y * width) * 4;
@@ -108,7 +641,7 @@ void decodeTexture( unsigned char* data, int width, int height, int format, floa
             }
         }
     } else if(format == 2) { // RGBX8888
-        for(int y=0; y<height; y++) {
+        for(int y=rowStart; y<rowEnd; y++) {
             for (int x = 0; x<width; x++) {
                 int i = (x + (heightZero - y) * width) * 4;
                 int i2 = (x + y * width) * 4;
@@ -119,7 +652,7 @@ void decodeTexture( unsigned char* data, int width, int height, int format, floa
             }
         }
     } else if(format == 3) { // BGRA8888
-        for(int y=0; y<height; y++) {
+        for(int y=rowStart; y<rowEnd; y++) {
             for (int x = 0; x<width; x++) {
                 int i = (x + (heightZero - y) * width) * 4;
                 int i2 = (x + y * width) * 4;
@@ -127,15 +660,12 @@ void decodeTexture( unsigned char* data, int width, int height, int format, floa
                 dst[i+1]=(float)data[i2+1]/255.0;
                 dst[i+2]=(float)data[i2+0]/255.0;
                 dst[i+3]=(float)data[i2+3]/255.0;
-                int t = dst[i];
-                dst[i] = dst[i2+2];
-                dst[i+2] = t;
             }
         }
     } else if (format==4) { // DXT1
-        int bufferLoc = 0;
+        int bufferLoc = (rowStart / 4) * ((width + 3) / 4) * 8;
         float colours[4][3];
-        for(int y=0; y<height; y+=4) {
+        for(int y=rowStart; y<rowEnd; y+=4) {
             for(int x=0; x<width; x+=4) {
 
                 dxtDecodeColourMap(data, bufferLoc, colours);
@@ -150,7 +680,7 @@ void decodeTexture( unsigned char* data, int width, int height, int format, floa
                 for(int yy =0; yy<4; yy++) {
                     for(int xx =0; xx<4; xx++) { // copy our colour data into the array
                         unsigned int colourIndex = bits & 0b11;
-                        if(yy+y < height && xx + y < width) {
+                        if(yy+y < height && xx + x < width) {
                             int idx = (xx + x + (heightZero - (yy + y)) * width) * 4;
                             float* col = colours[colourIndex];
                             dst[idx] = col[0];
@@ -163,14 +693,18 @@ void decodeTexture( unsigned char* data, int width, int height, int format, floa
                 }
             }
         }
-    } else if (format==6) { // DXT5
-        int bufferLoc = 0;
+    } else if (format==5 || format==6) { // DXT3, DXT5
+        int bufferLoc = (rowStart / 4) * ((width + 3) / 4) * 16;
         float alphaValues[16];
         float colours[4][3];
-        for(int y=0; y<height; y+=4) {
+        for(int y=rowStart; y<rowEnd; y+=4) {
             for(int x=0; x<width; x+=4) {
 
-                dxtDecodeAlphaMap(data, bufferLoc, alphaValues);
+                if(format == 5) {
+                    dxtDecodeExplicitAlphaMap(data, bufferLoc, alphaValues);
+                } else {
+                    dxtDecodeAlphaMap(data, bufferLoc, alphaValues);
+                }
                 bufferLoc+=8;
 
                 dxtDecodeColourMap(data, bufferLoc, colours);
@@ -199,9 +733,9 @@ void decodeTexture( unsigned char* data, int width, int height, int format, floa
             }
         }
     } else if (format == 13) {
-        for(int y=0; y<height; y++) {
+        for(int y=rowStart; y<rowEnd; y++) {
             for (int x = 0; x<width; x++) {
-                int idx = x + (heightZero-y) * width * 4;
+                int idx = (x + (heightZero-y) * width) * 4;
                 int idx2 = x + y * width;
                 dst[idx] = (float)data[idx2]/255.0; // R
                 dst[idx+1] = 0.0; // G
@@ -211,3 +745,811 @@ void decodeTexture( unsigned char* data, int width, int height, int format, floa
         }
     }
 }
+
+// ---------- 8 bit decoding -------------
+// Writes bottom up RGBA bytes instead of floats, a quarter of the memory. Every value is the float output scaled by 255 and
+// rounded to the nearest integer (none of the DXT interpolations land on a half).
+
+SIMD_INLINE void dxtColourPaletteBytes( const unsigned char* block, unsigned char palette[4][4] ) {
+    unsigned int colour0 = block[0] | (block[1] << 8);
+    unsigned int colour1 = block[2] | (block[3] << 8);
+    int c0[3] = { (colour0>>8) & 0b11111000, (colour0>>3) & 0b11111100, (colour0<<3) & 0b11111000 };
+    int c1[3] = { (colour1>>8) & 0b11111000, (colour1>>3) & 0b11111100, (colour1<<3) & 0b11111000 };
+
+    for(int i=0; i<3; i++) {
+        palette[0][i] = c0[i];
+        palette[1][i] = c1[i];
+        if(colour0 > colour1) {
+            palette[2][i] = (2 * c0[i] + c1[i] + 1) / 3;
+            palette[3][i] = (c0[i] + 2 * c1[i] + 1) / 3;
+        } else {
+            palette[2][i] = (c0[i] + c1[i]) / 2;
+            palette[3][i] = 0;
+        }
+    }
+    for(int i=0; i<4; i++) {
+        palette[i][3] = 255;
+    }
+}
+
+SIMD_INLINE void dxtAlphaPaletteBytes( const unsigned char* block, unsigned char palette[8] ) {
+    int alpha0 = block[0];
+    int alpha1 = block[1];
+    palette[0] = alpha0;
+    palette[1] = alpha1;
+    if(alpha0 > alpha1) {
+        for(int i=1; i<7; i++) {
+            palette[i+1] = ((7-i) * alpha0 + i * alpha1 + 3) / 7;
+        }
+    } else {
+        for(int i=1; i<5; i++) {
+            palette[i+1] = ((5-i) * alpha0 + i * alpha1 + 2) / 5;
+        }
+        palette[6] = 0;
+        palette[7] = 255;
+    }
+}
+
+// palettes and index bits of one byte block, alphas is unused for DXT1. The byte helpers are inlined into the AVX2 loop too
+SIMD_INLINE void dxtBlockPalettesBytes( const unsigned char* block, int format, unsigned char colours[4][4], unsigned char alphas[16],
+        unsigned int* bits, unsigned long long* alphaBits ) {
+    const unsigned char* colourBlock = block + (format == 4 ? 0 : 8);
+    dxtColourPaletteBytes(colourBlock, colours);
+    *bits = colourBlock[4] | (colourBlock[5] << 8) | (colourBlock[6] << 16) | ((unsigned int)colourBlock[7] << 24);
+    *alphaBits = 0;
+    if(format == 5) { // explicit alpha, every 4 bit value scaled to 8 bits
+        for(int i=0; i<16; i++) {
+            alphas[i] = (unsigned char)(i * 17);
+        }
+        for(int i=0; i<8; i++) {
+            *alphaBits |= ((unsigned long long) block[i]) << (i * 8);
+        }
+    } else if(format == 6) {
+        dxtAlphaPaletteBytes(block, alphas);
+        for(int i=2; i<8; i++) {
+            *alphaBits |= ((unsigned long long) block[i]) << ((i-2) * 8);
+        }
+    }
+}
+
+// writes the texels of a block at (x, y) that are inside the texture
+SIMD_INLINE void dxtStoreBlockBytes( const unsigned char colours[4][4], const unsigned char alphas[16], unsigned int bits,
+        unsigned long long alphaBits, int format, unsigned char* dst, int x, int y, int width, int height ) {
+    int alphaShift = format == 5 ? 4 : 3;
+    unsigned int alphaMask = (1 << alphaShift) - 1;
+    for(int yy=0; yy<4; yy++) {
+        for(int xx=0; xx<4; xx++) {
+            if(yy + y < height && xx + x < width) {
+                unsigned char* texel = dst + ((size_t)(height - 1 - (yy + y)) * width + xx + x) * 4;
+                memcpy(texel, colours[bits & 0b11], 4);
+                if(format != 4) {
+                    texel[3] = alphas[alphaBits & alphaMask];
+                }
+            }
+            bits >>= 2;
+            alphaBits >>= alphaShift;
+        }
+    }
+}
+
+#ifdef SIMD_X86
+// Byte output with AVX2. The palettes come from the scalar helpers above, so the output is identical, and each whole block is
+// written two pixel rows per vector by looking its indices up in the palette held in a register.
+static TARGET_AVX2 void decodeDxtRowsBytesAVX2( unsigned char* data, int width, int height, int format, unsigned char* dst,
+        int rowStart, int rowEnd ) {
+    int blockSize = format == 4 ? 8 : 16;
+    size_t rowStride = (size_t)width * 4;
+    const __m256i colourShifts = _mm256_setr_epi32(0, 2, 4, 6, 8, 10, 12, 14);
+    const __m256i alphaShifts = _mm256_setr_epi32(0, 3, 6, 9, 12, 15, 18, 21);
+    const __m256i explicitShifts = _mm256_setr_epi32(0, 4, 8, 12, 16, 20, 24, 28);
+    const __m256i colourMask = _mm256_set1_epi32(0x00FFFFFF);
+    const unsigned char* block = data + (size_t)(rowStart / 4) * ((width + 3) / 4) * blockSize;
+    unsigned char colours[4][4];
+    unsigned char alphas[16];
+    unsigned int bits;
+    unsigned long long alphaBits;
+    for(int y=rowStart; y<rowEnd; y+=4) {
+        for(int x=0; x<width; x+=4, block += blockSize) {
+            dxtBlockPalettesBytes(block, format, colours, alphas, &bits, &alphaBits);
+            if(x + 4 > width || y + 4 > height) {
+                dxtStoreBlockBytes(colours, alphas, bits, alphaBits, format, dst, x, y, width, height);
+                continue;
+            }
+
+            __m256i palette = _mm256_broadcastsi128_si256(_mm_loadu_si128((const __m128i*)colours));
+            __m256i alphaPalette = _mm256_slli_epi32(_mm256_cvtepu8_epi32(_mm_loadl_epi64((const __m128i*)alphas)), 24);
+            unsigned char* row = dst + ((size_t)(height - 1 - y) * width + x) * 4;
+            for(int half=0; half<2; half++, row -= 2 * rowStride) {
+                __m256i indices = _mm256_and_si256(_mm256_srlv_epi32(_mm256_set1_epi32((int)(bits >> (half * 16))), colourShifts),
+                    _mm256_set1_epi32(3));
+                __m256i texels = _mm256_permutevar8x32_epi32(palette, indices);
+                if(format == 6) {
+                    __m256i alphaIndices = _mm256_srlv_epi32(_mm256_set1_epi32((int)(alphaBits >> (half * 24))), alphaShifts);
+                    texels = _mm256_or_si256(_mm256_and_si256(texels, colourMask), _mm256_permutevar8x32_epi32(alphaPalette, alphaIndices));
+                } else if(format == 5) { // i * 17 is i in both nibbles of the alpha byte
+                    __m256i alphaIndices = _mm256_and_si256(_mm256_srlv_epi32(_mm256_set1_epi32((int)(alphaBits >> (half * 32))),
+                        explicitShifts), _mm256_set1_epi32(15));
+                    __m256i alpha = _mm256_slli_epi32(_mm256_or_si256(alphaIndices, _mm256_slli_epi32(alphaIndices, 4)), 24);
+                    texels = _mm256_or_si256(_mm256_and_si256(texels, colourMask), alpha);
+                }
+                _mm_storeu_si128((__m128i*)row, _mm256_castsi256_si128(texels));
+                _mm_storeu_si128((__m128i*)(row - rowStride), _mm256_extracti128_si256(texels, 1));
+            }
+        }
+    }
+}
+#endif
+
+// same as decodeTextureRows, writing 4 bytes per texel. Only AVX2 has a byte path, lower levels decode with the scalar loop
+static void decodeTextureRowsBytes( unsigned char* data, int width, int height, int format, unsigned char* dst, int rowStart, int rowEnd,
+        int simd ) {
+
+    int heightZero = height - 1;
+
+    if(format == 1 || format == 2 || format == 3) { // RGBA8888, RGBX8888, BGRA8888
+        for(int y=rowStart; y<rowEnd; y++) {
+            unsigned char* src = data + (size_t)y * width * 4;
+            unsigned char* row = dst + (size_t)(heightZero - y) * width * 4;
+            if(format == 1) {
+                memcpy(row, src, (size_t)width * 4);
+                continue;
+            }
+            for (int x = 0; x<width; x++) {
+                int i = x * 4;
+                row[i] = src[i + (format == 3 ? 2 : 0)];
+                row[i+1] = src[i+1];
+                row[i+2] = src[i + (format == 3 ? 0 : 2)];
+                row[i+3] = format == 2 ? 255 : src[i+3];
+            }
+        }
+    } else if(format == 4 || format == 5 || format == 6) { // DXT1, DXT3, DXT5
+#ifdef SIMD_X86
+        if(simd >= SIMD_AVX2) {
+            decodeDxtRowsBytesAVX2(data, width, height, format, dst, rowStart, rowEnd);
+            return;
+        }
+#else
+        (void)simd;
+#endif
+        int blockSize = format == 4 ? 8 : 16;
+        const unsigned char* block = data + (size_t)(rowStart / 4) * ((width + 3) / 4) * blockSize;
+        unsigned char colours[4][4];
+        unsigned char alphas[16];
+        unsigned int bits;
+        unsigned long long alphaBits;
+        for(int y=rowStart; y<rowEnd; y+=4) {
+            for(int x=0; x<width; x+=4, block += blockSize) {
+                dxtBlockPalettesBytes(block, format, colours, alphas, &bits, &alphaBits);
+                dxtStoreBlockBytes(colours, alphas, bits, alphaBits, format, dst, x, y, width, height);
+            }
+        }
+    } else if (format == 13) { // R8
+        for(int y=rowStart; y<rowEnd; y++) {
+            unsigned char* src = data + (size_t)y * width;
+            unsigned char* row = dst + (size_t)(heightZero - y) * width * 4;
+            for (int x = 0; x<width; x++) {
+                row[x * 4] = src[x]; // R
+                row[x * 4 + 1] = 0; // G
+                row[x * 4 + 2] = 0; // B
+                row[x * 4 + 3] = 255; // A
+            }
+        }
+    }
+}
+
+EXPORT void decodeTexture( unsigned char* data, int width, int height, int format, float* dst ) {
+    decodeTextureRows(data, width, height, format, dst, 0, height, getSimdLevel());
+}
+
+EXPORT void decodeTextureBytes( unsigned char* data, int width, int height, int format, unsigned char* dst ) {
+    decodeTextureRowsBytes(data, width, height, format, dst, 0, height, getSimdLevel());
+}
+
+// ---------- DXT encoding -------------
+// Encodes top down RGBA bytes (file order) into DXT1 or DXT5 blocks. The fast mode fits the endpoints to the bounding box
+// of the block, the quality mode fits them to the principal axis of the colours and refines them with least squares.
+// Endpoints are evaluated the way graphics hardware expands them, with the high bits replicated into the low bits.
+
+static int clampByte( int value ) {
+    return value < 0 ? 0 : (value > 255 ? 255 : value);
+}
+
+static unsigned int packColour565( const int colour[3] ) {
+    int r = (clampByte(colour[0]) * 31 + 127) / 255;
+    int g = (clampByte(colour[1]) * 63 + 127) / 255;
+    int b = (clampByte(colour[2]) * 31 + 127) / 255;
+    return (r << 11) | (g << 5) | b;
+}
+
+static void unpackColour565( unsigned int colour, int dst[3] ) {
+    int r = (colour >> 11) & 0b11111;
+    int g = (colour >> 5) & 0b111111;
+    int b = colour & 0b11111;
+    dst[0] = (r << 3) | (r >> 2);
+    dst[1] = (g << 2) | (g >> 4);
+    dst[2] = (b << 3) | (b >> 2);
+}
+
+// copies a 4x4 block, repeating the last row and column for blocks that hang over the edge of the image
+static void fetchBlock( const unsigned char* rgba, int width, int height, int x, int y, unsigned char block[16][4] ) {
+    for(int yy=0; yy<4; yy++) {
+        int row = y + yy < height ? y + yy : height - 1;
+        for(int xx=0; xx<4; xx++) {
+            int column = x + xx < width ? x + xx : width - 1;
+            memcpy(block[xx + yy * 4], rgba + ((size_t)row * width + column) * 4, 4);
+        }
+    }
+}
+
+// picks the closest palette entry for every texel of a four colour block, colour0 must be greater than colour1
+static unsigned int dxtColourIndices( const unsigned char block[16][4], unsigned int colour0, unsigned int colour1, long long* error ) {
+    int palette[4][3];
+    unpackColour565(colour0, palette[0]);
+    unpackColour565(colour1, palette[1]);
+    for(int i=0; i<3; i++) {
+        palette[2][i] = (2 * palette[0][i] + palette[1][i]) / 3;
+        palette[3][i] = (palette[0][i] + 2 * palette[1][i]) / 3;
+    }
+
+    unsigned int bits = 0;
+    long long total = 0;
+    for(int i=0; i<16; i++) {
+        int best = 0;
+        int bestDistance = 0x7fffffff;
+        for(int j=0; j<4; j++) {
+            int dr = block[i][0] - palette[j][0];
+            int dg = block[i][1] - palette[j][1];
+            int db = block[i][2] - palette[j][2];
+            int distance = dr * dr + dg * dg + db * db;
+            if(distance < bestDistance) {
+                bestDistance = distance;
+                best = j;
+            }
+        }
+        bits |= (unsigned int)best << (i * 2);
+        total += bestDistance;
+    }
+    *error = total;
+    return bits;
+}
+
+// orders the endpoints for four colour mode and picks the indices, returns the error
+static long long dxtFitColours( const unsigned char block[16][4], const int high[3], const int low[3], unsigned int* colour0,
+        unsigned int* colour1, unsigned int* bits ) {
+    unsigned int c0 = packColour565(high);
+    unsigned int c1 = packColour565(low);
+    long long error;
+    if(c0 < c1) {
+        unsigned int t = c0;
+        c0 = c1;
+        c1 = t;
+    }
+    if(c0 == c1) { // a single colour, all indices 0 select colour0 in either mode
+        int colour[3];
+        unpackColour565(c0, colour);
+        error = 0;
+        for(int i=0; i<16; i++) {
+            for(int j=0; j<3; j++) {
+                error += (block[i][j] - colour[j]) * (block[i][j] - colour[j]);
+            }
+        }
+        *bits = 0;
+    } else {
+        *bits = dxtColourIndices(block, c0, c1, &error);
+    }
+    *colour0 = c0;
+    *colour1 = c1;
+    return error;
+}
+
+static void dxtEncodeColourFast( const unsigned char block[16][4], unsigned int* colour0, unsigned int* colour1, unsigned int* bits ) {
+    int high[3] = { 0, 0, 0 };
+    int low[3] = { 255, 255, 255 };
+    for(int i=0; i<16; i++) {
+        for(int j=0; j<3; j++) {
+            if(block[i][j] > high[j]) {
+                high[j] = block[i][j];
+            }
+            if(block[i][j] < low[j]) {
+                low[j] = block[i][j];
+            }
+        }
+    }
+    for(int j=0; j<3; j++) { // pull the box in slightly so the interpolated colours land on the bulk of the block
+        int inset = (high[j] - low[j]) >> 4;
+        high[j] -= inset;
+        low[j] += inset;
+    }
+    dxtFitColours(block, high, low, colour0, colour1, bits);
+}
+
+static void dxtEncodeColourQuality( const unsigned char block[16][4], unsigned int* colour0, unsigned int* colour1, unsigned int* bits ) {
+    float mean[3] = { 0, 0, 0 };
+    for(int i=0; i<16; i++) {
+        for(int j=0; j<3; j++) {
+            mean[j] += block[i][j];
+        }
+    }
+    for(int j=0; j<3; j++) {
+        mean[j] /= 16.0f;
+    }
+
+    float covariance[6] = { 0, 0, 0, 0, 0, 0 }; // rr rg rb gg gb bb
+    for(int i=0; i<16; i++) {
+        float r = block[i][0] - mean[0];
+        float g = block[i][1] - mean[1];
+        float b = block[i][2] - mean[2];
+        covariance[0] += r * r;
+        covariance[1] += r * g;
+        covariance[2] += r * b;
+        covariance[3] += g * g;
+        covariance[4] += g * b;
+        covariance[5] += b * b;
+    }
+
+    // the principal axis by power iteration
+    float axis[3] = { 1.0f, 1.0f, 1.0f };
+    for(int iteration=0; iteration<8; iteration++) {
+        float next[3];
+        next[0] = covariance[0] * axis[0] + covariance[1] * axis[1] + covariance[2] * axis[2];
+        next[1] = covariance[1] * axis[0] + covariance[3] * axis[1] + covariance[4] * axis[2];
+        next[2] = covariance[2] * axis[0] + covariance[4] * axis[1] + covariance[5] * axis[2];
+        float length = next[0] * next[0] + next[1] * next[1] + next[2] * next[2];
+        if(length < 1e-12f) {
+            break;
+        }
+        length = 1.0f / sqrtf(length);
+        for(int j=0; j<3; j++) {
+            axis[j] = next[j] * length;
+        }
+    }
+
+    int lowIndex = 0;
+    int highIndex = 0;
+    float lowProjection = 1e30f;
+    float highProjection = -1e30f;
+    for(int i=0; i<16; i++) {
+        float projection = block[i][0] * axis[0] + block[i][1] * axis[1] + block[i][2] * axis[2];
+        if(projection < lowProjection) {
+            lowProjection = projection;
+            lowIndex = i;
+        }
+        if(projection > highProjection) {
+            highProjection = projection;
+            highIndex = i;
+        }
+    }
+    int high[3] = { block[highIndex][0], block[highIndex][1], block[highIndex][2] };
+    int low[3] = { block[lowIndex][0], block[lowIndex][1], block[lowIndex][2] };
+    long long bestError = dxtFitColours(block, high, low, colour0, colour1, bits);
+
+    // refine the endpoints with a least squares fit to the chosen indices
+    static const float weights[4] = { 1.0f, 0.0f, 2.0f / 3.0f, 1.0f / 3.0f };
+    for(int iteration=0; iteration<2 && bestError > 0; iteration++) {
+        float aa = 0, ab = 0, bb = 0;
+        float ax[3] = { 0, 0, 0 };
+        float bx[3] = { 0, 0, 0 };
+        for(int i=0; i<16; i++) {
+            float a = weights[(*bits >> (i * 2)) & 0b11];
+            float b = 1.0f - a;
+            aa += a * a;
+            ab += a * b;
+            bb += b * b;
+            for(int j=0; j<3; j++) {
+                ax[j] += a * block[i][j];
+                bx[j] += b * block[i][j];
+            }
+        }
+        float determinant = aa * bb - ab * ab;
+        if(fabsf(determinant) < 1e-6f) {
+            break;
+        }
+        for(int j=0; j<3; j++) {
+            high[j] = (int)lrintf((ax[j] * bb - bx[j] * ab) / determinant);
+            low[j] = (int)lrintf((bx[j] * aa - ax[j] * ab) / determinant);
+        }
+        unsigned int c0, c1, b;
+        long long error = dxtFitColours(block, high, low, &c0, &c1, &b);
+        if(error >= bestError) {
+            break;
+        }
+        bestError = error;
+        *colour0 = c0;
+        *colour1 = c1;
+        *bits = b;
+    }
+}
+
+// picks the closest of the eight alpha values for every texel, with the same rounding as the byte decoder
+static unsigned long long dxtAlphaIndices( const unsigned char block[16][4], int alpha0, int alpha1, long long* error ) {
+    unsigned char palette[8];
+    unsigned char endpoints[2] = { (unsigned char)alpha0, (unsigned char)alpha1 };
+    dxtAlphaPaletteBytes(endpoints, palette);
+
+    unsigned long long bits = 0;
+    long long total = 0;
+    for(int i=0; i<16; i++) {
+        int best = 0;
+        int bestDistance = 0x7fffffff;
+        for(int j=0; j<8; j++) {
+            int distance = (block[i][3] - palette[j]) * (block[i][3] - palette[j]);
+            if(distance < bestDistance) {
+                bestDistance = distance;
+                best = j;
+            }
+        }
+        bits |= (unsigned long long)best << (i * 3);
+        total += bestDistance;
+    }
+    *error = total;
+    return bits;
+}
+
+static void dxtEncodeAlpha( const unsigned char block[16][4], int quality, unsigned char* dst ) {
+    int low = 255;
+    int high = 0;
+    int innerLow = 255; // range of the values that are not 0 or 255, for the six value mode
+    int innerHigh = 0;
+    for(int i=0; i<16; i++) {
+        int alpha = block[i][3];
+        low = alpha < low ? alpha : low;
+        high = alpha > high ? alpha : high;
+        if(alpha != 0 && alpha != 255) {
+            innerLow = alpha < innerLow ? alpha : innerLow;
+            innerHigh = alpha > innerHigh ? alpha : innerHigh;
+        }
+    }
+
+    // alpha0 > alpha1 selects eight interpolated values, equal endpoints fall into the six value mode which still starts at alpha0
+    int alpha0 = high;
+    int alpha1 = low;
+    long long error;
+    unsigned long long bits = dxtAlphaIndices(block, alpha0, alpha1, &error);
+
+    if(quality && error > 0) {
+        if(innerLow > innerHigh) { // only 0 and 255 in the block
+            innerLow = innerHigh = 0;
+        }
+        long long sixError;
+        unsigned long long sixBits = dxtAlphaIndices(block, innerLow, innerHigh, &sixError);
+        if(sixError < error) {
+            alpha0 = innerLow;
+            alpha1 = innerHigh;
+            bits = sixBits;
+        }
+    }
+
+    dst[0] = alpha0;
+    dst[1] = alpha1;
+    for(int i=0; i<6; i++) {
+        dst[i+2] = (bits >> (i * 8)) & 0xff;
+    }
+}
+
+static void dxtEncodeColour( const unsigned char block[16][4], int quality, unsigned char* dst ) {
+    unsigned int colour0, colour1, bits;
+    if(quality) {
+        dxtEncodeColourQuality(block, &colour0, &colour1, &bits);
+    } else {
+        dxtEncodeColourFast(block, &colour0, &colour1, &bits);
+    }
+    dst[0] = colour0 & 0xff;
+    dst[1] = colour0 >> 8;
+    dst[2] = colour1 & 0xff;
+    dst[3] = colour1 >> 8;
+    for(int i=0; i<4; i++) {
+        dst[i+4] = (bits >> (i * 8)) & 0xff;
+    }
+}
+
+// encodes the pixel rows [rowStart, rowEnd). rowStart must be a multiple of 4
+static void encodeTextureRows( const unsigned char* rgba, int width, int height, int format, int quality, unsigned char* dst,
+        int rowStart, int rowEnd ) {
+    int blockSize = format == 4 ? 8 : 16;
+    int blocksWide = (width + 3) / 4;
+    unsigned char block[16][4];
+    for(int y=rowStart; y<rowEnd; y+=4) {
+        unsigned char* out = dst + (size_t)(y / 4) * blocksWide * blockSize;
+        for(int x=0; x<width; x+=4) {
+            fetchBlock(rgba, width, height, x, y, block);
+            if(format == 6) {
+                dxtEncodeAlpha(block, quality, out);
+                out += 8;
+            }
+            dxtEncodeColour(block, quality, out);
+            out += 8;
+        }
+    }
+}
+
+// ---------- threading -------------
+
+#define MAX_THREADS 64
+
+// works on the pixel rows [rowStart, rowEnd), rowStart is always a multiple of 4
+typedef void (*RowWork)( void* context, int rowStart, int rowEnd );
+
+typedef struct {
+    RowWork work;
+    void* context;
+    int rowStart;
+    int rowEnd;
+} ThreadJob;
+
+static void runThreadJob( ThreadJob* job ) {
+    job->work(job->context, job->rowStart, job->rowEnd);
+}
+
+#ifdef _WIN32
+static DWORD WINAPI threadJob( LPVOID arg ) {
+    runThreadJob((ThreadJob*)arg);
+    return 0;
+}
+#else
+static void* threadJob( void* arg ) {
+    runThreadJob((ThreadJob*)arg);
+    return NULL;
+}
+#endif
+
+EXPORT int getProcessorCount() {
+#ifdef _WIN32
+    SYSTEM_INFO info;
+    GetSystemInfo(&info);
+    return (int)info.dwNumberOfProcessors;
+#else
+    long count = sysconf(_SC_NPROCESSORS_ONLN);
+    return count > 0 ? (int)count : 1;
+#endif
+}
+
+// splits the block rows of the image evenly across the given number of threads. threads <= 0 uses every processor.
+static void runRowsThreaded( RowWork work, void* context, int height, int threads ) {
+    if(threads <= 0) {
+        threads = getProcessorCount();
+    }
+    if(threads > MAX_THREADS) {
+        threads = MAX_THREADS;
+    }
+    int blockRows = (height + 3) / 4;
+    if(threads > blockRows) {
+        threads = blockRows;
+    }
+    if(threads <= 1) {
+        work(context, 0, height);
+        return;
+    }
+
+    ThreadJob jobs[MAX_THREADS];
+#ifdef _WIN32
+    HANDLE handles[MAX_THREADS];
+#else
+    pthread_t handles[MAX_THREADS];
+#endif
+    int started[MAX_THREADS];
+
+    for(int i=0; i<threads; i++) {
+        jobs[i].work = work;
+        jobs[i].context = context;
+        jobs[i].rowStart = (int)((long long)blockRows * i / threads) * 4;
+        jobs[i].rowEnd = (int)((long long)blockRows * (i + 1) / threads) * 4;
+        if(jobs[i].rowEnd > height) {
+            jobs[i].rowEnd = height;
+        }
+    }
+
+    // the calling thread works on the first slice itself
+    for(int i=1; i<threads; i++) {
+#ifdef _WIN32
+        handles[i] = CreateThread(NULL, 0, threadJob, &jobs[i], 0, NULL);
+        started[i] = handles[i] != NULL;
+#else
+        started[i] = pthread_create(&handles[i], NULL, threadJob, &jobs[i]) == 0;
+#endif
+        if(!started[i]) { // fall back to working on the slice on this thread
+            runThreadJob(&jobs[i]);
+        }
+    }
+    runThreadJob(&jobs[0]);
+
+    for(int i=1; i<threads; i++) {
+        if(started[i]) {
+#ifdef _WIN32
+            WaitForSingleObject(handles[i], INFINITE);
+            CloseHandle(handles[i]);
+#else
+            pthread_join(handles[i], NULL);
+#endif
+        }
+    }
+}
+
+typedef struct {
+    unsigned char* data;
+    int width;
+    int height;
+    int format;
+    float* dst;
+    unsigned char* byteDst; // used instead of dst when set
+    int simd; // SIMD level read once for the whole texture
+} DecodeContext;
+
+static void decodeRowsWork( void* context, int rowStart, int rowEnd ) {
+    DecodeContext* job = (DecodeContext*)context;
+    if(job->byteDst) {
+        decodeTextureRowsBytes(job->data, job->width, job->height, job->format, job->byteDst, rowStart, rowEnd, job->simd);
+    } else {
+        decodeTextureRows(job->data, job->width, job->height, job->format, job->dst, rowStart, rowEnd, job->simd);
+    }
+}
+
+// same as decodeTexture, but splits the block rows across the given number of threads. threads <= 0 uses every processor.
+EXPORT void decodeTextureMT( unsigned char* data, int width, int height, int format, float* dst, int threads ) {
+    DecodeContext context = { data, width, height, format, dst, NULL, getSimdLevel() };
+    runRowsThreaded(decodeRowsWork, &context, height, threads);
+}
+
+EXPORT void decodeTextureBytesMT( unsigned char* data, int width, int height, int format, unsigned char* dst, int threads ) {
+    DecodeContext context = { data, width, height, format, NULL, dst, getSimdLevel() };
+    runRowsThreaded(decodeRowsWork, &context, height, threads);
+}
+
+EXPORT int getLibraryVersion() {
+    return PTEX_VERSION;
+}
+
+// size in bytes of a single level of encoded data, 0 for formats the library cannot decode
+EXPORT long long textureDataSize( int format, int width, int height ) {
+    long long blocks = (long long)((width + 3) / 4) * ((height + 3) / 4);
+    if(width <= 0 || height <= 0) {
+        return 0;
+    }
+    switch(format) {
+        case 1: case 2: case 3: return (long long)width * height * 4; // RGBA8888, RGBX8888, BGRA8888
+        case 4: return blocks * 8; // DXT1
+        case 5: case 6: return blocks * 16; // DXT3, DXT5
+        case 13: return (long long)width * height; // R8
+    }
+    return 0;
+}
+
+// size in bytes of decoded pixels, pixelFormat 0 is RGBA float and 1 is RGBA bytes
+EXPORT long long decodedTextureSize( int width, int height, int pixelFormat ) {
+    if(width <= 0 || height <= 0 || pixelFormat < 0 || pixelFormat > 1) {
+        return 0;
+    }
+    return (long long)width * height * 4 * (pixelFormat == 0 ? sizeof(float) : 1);
+}
+
+// decodes a single level into dst after checking the size of both buffers. Returns 0 without writing anything if the format
+// cannot be decoded or either buffer is too small. threads <= 0 uses every processor.
+EXPORT int decodeTextureInto( const unsigned char* data, long long dataSize, int width, int height, int format, int pixelFormat,
+        void* dst, long long dstSize, int threads ) {
+    long long required = textureDataSize(format, width, height);
+    long long decodedSize = decodedTextureSize(width, height, pixelFormat);
+    if(required == 0 || decodedSize == 0 || dataSize < required || dstSize < decodedSize) {
+        return 0;
+    }
+    DecodeContext context = { (unsigned char*)data, width, height, format, pixelFormat == 0 ? (float*)dst : NULL,
+        pixelFormat == 0 ? NULL : (unsigned char*)dst, getSimdLevel() };
+    runRowsThreaded(decodeRowsWork, &context, height, threads);
+    return 1;
+}
+
+// decodes one level of a mip chain stored one level after another, each level half the size of the last down to 1x1
+EXPORT int decodeMipLevel( const unsigned char* data, long long dataSize, int width, int height, int format, int level, int pixelFormat,
+        void* dst, long long dstSize, int threads ) {
+    if(level < 0 || level > 31) {
+        return 0;
+    }
+    long long offset = 0;
+    for(int i=0; i<level; i++) {
+        int levelWidth = width >> i > 0 ? width >> i : 1;
+        int levelHeight = height >> i > 0 ? height >> i : 1;
+        long long size = textureDataSize(format, levelWidth, levelHeight);
+        if(size == 0) {
+            return 0;
+        }
+        offset += size;
+    }
+    if(offset >= dataSize) {
+        return 0;
+    }
+    return decodeTextureInto(data + offset, dataSize - offset, width >> level > 0 ? width >> level : 1,
+        height >> level > 0 ? height >> level : 1, format, pixelFormat, dst, dstSize, threads);
+}
+
+// decodes the rectangle at (x, y) of the texture, measured from the top left like the file. Only the rows (and for DXT the
+// blocks) covering the rectangle are decoded. dst holds regionWidth * regionHeight pixels, bottom up like every other decode.
+EXPORT int decodeTextureRegion( const unsigned char* data, long long dataSize, int width, int height, int format, int pixelFormat,
+        int x, int y, int regionWidth, int regionHeight, void* dst, long long dstSize ) {
+    long long required = textureDataSize(format, width, height);
+    long long decodedSize = decodedTextureSize(regionWidth, regionHeight, pixelFormat);
+    if(required == 0 || decodedSize == 0 || dataSize < required || dstSize < decodedSize
+            || x < 0 || y < 0 || x + regionWidth > width || y + regionHeight > height) {
+        return 0;
+    }
+    int simd = getSimdLevel();
+    size_t texelSize = pixelFormat == 0 ? 4 * sizeof(float) : 4;
+
+    if(format < 4 || format > 6) { // the region rows form a smaller texture of their own
+        int bytesPerTexel = (int)(textureDataSize(format, 1, 1));
+        unsigned char* region = malloc((size_t)regionWidth * regionHeight * bytesPerTexel);
+        if(!region) {
+            return 0;
+        }
+        for(int row=0; row<regionHeight; row++) {
+            memcpy(region + (size_t)row * regionWidth * bytesPerTexel, data + ((size_t)(y + row) * width + x) * bytesPerTexel,
+                (size_t)regionWidth * bytesPerTexel);
+        }
+        DecodeContext context = { region, regionWidth, regionHeight, format, pixelFormat == 0 ? (float*)dst : NULL,
+            pixelFormat == 0 ? NULL : (unsigned char*)dst, simd };
+        decodeRowsWork(&context, 0, regionHeight);
+        free(region);
+        return 1;
+    }
+
+    // gather the covering blocks into a block aligned texture, decode it, then crop out the rectangle
+    int blockSize = format == 4 ? 8 : 16;
+    int blocksWide = (width + 3) / 4;
+    int blockX = x / 4, blockY = y / 4;
+    int regionBlocksWide = (x + regionWidth + 3) / 4 - blockX;
+    int regionBlocksHigh = (y + regionHeight + 3) / 4 - blockY;
+    int alignedWidth = regionBlocksWide * 4, alignedHeight = regionBlocksHigh * 4;
+    unsigned char* blocks = malloc((size_t)regionBlocksWide * regionBlocksHigh * blockSize);
+    unsigned char* decoded = malloc((size_t)alignedWidth * alignedHeight * texelSize);
+    if(!blocks || !decoded) {
+        free(blocks);
+        free(decoded);
+        return 0;
+    }
+    for(int row=0; row<regionBlocksHigh; row++) {
+        memcpy(blocks + (size_t)row * regionBlocksWide * blockSize, data + ((size_t)(blockY + row) * blocksWide + blockX) * blockSize,
+            (size_t)regionBlocksWide * blockSize);
+    }
+    DecodeContext context = { blocks, alignedWidth, alignedHeight, format, pixelFormat == 0 ? (float*)decoded : NULL,
+        pixelFormat == 0 ? NULL : decoded, simd };
+    decodeRowsWork(&context, 0, alignedHeight);
+
+    for(int row=0; row<regionHeight; row++) { // both buffers are bottom up
+        int alignedRow = alignedHeight - 1 - (y + row - blockY * 4);
+        memcpy((unsigned char*)dst + (size_t)(regionHeight - 1 - row) * regionWidth * texelSize,
+            decoded + ((size_t)alignedRow * alignedWidth + (x - blockX * 4)) * texelSize, (size_t)regionWidth * texelSize);
+    }
+    free(blocks);
+    free(decoded);
+    return 1;
+}
+
+typedef struct {
+    const unsigned char* rgba;
+    int width;
+    int height;
+    int format;
+    int quality;
+    unsigned char* dst;
+} EncodeContext;
+
+static void encodeRowsWork( void* context, int rowStart, int rowEnd ) {
+    EncodeContext* job = (EncodeContext*)context;
+    encodeTextureRows(job->rgba, job->width, job->height, job->format, job->quality, job->dst, rowStart, rowEnd);
+}
+
+// encodes top down RGBA bytes into format 4 (DXT1) or 6 (DXT5), quality != 0 selects the slower quality mode.
+// dst must hold ceil(width / 4) * ceil(height / 4) blocks. Returns 0 if the format cannot be encoded.
+EXPORT int encodeTexture( const unsigned char* rgba, int width, int height, int format, int quality, unsigned char* dst ) {
+    if(format != 4 && format != 6) {
+        return 0;
+    }
+    encodeTextureRows(rgba, width, height, format, quality, dst, 0, height);
+    return 1;
+}
+
+EXPORT int encodeTextureMT( const unsigned char* rgba, int width, int height, int format, int quality, unsigned char* dst, int threads ) {
+    if(format != 4 && format != 6) {
+        return 0;
+    }
+    EncodeContext context = { rgba, width, height, format, quality, dst };
+    runRowsThreaded(encodeRowsWork, &context, height, threads);
+    return 1;
+}
@@ -0,0 +1,248 @@
+# The MIT License
+#
+# Copyright (c) 2021        Marcus Der      marcusder@hotmail.com
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+# Texture decoder parity and throughput checks. Synthetic textures are encoded in every format and decoded through every
+# available path (native at each SIMD level, single and multithreaded, NumPy and the reference Python decoder) in both pixel
+# formats. Every path must agree with the reference, and the lossless formats must give back the source pixels.
+#
+# Run with Blender's python (or any python with numpy and mathutils) from this directory:
+#   python texture_benchmark.py [--sizes small medium] [--formats 4 6] [--repeat 5] [--speedup] [--simd]
+# The exit code is 1 if any output diverges. --speedup also times the NumPy decoder against the reference Python decoder on
+# 2048x2048 DXT textures and fails if it is less than 50 times faster. The reference takes several seconds per texture.
+# --simd times the SIMD level the native library picks for this processor against its scalar path on 1024x1024 DXT
+# textures, single threaded, and fails unless it is faster.
+
+import argparse
+import sys
+import time
+import numpy as np
+
+if __package__:
+    from .papafile import *
+else:
+    from papafile import *
+
+sizeClasses = { # (width, height), the odd sizes exercise partial DXT blocks
+    "tiny": [(1, 1), (3, 5), (4, 4)],
+    "small": [(64, 64), (30, 18)],
+    "medium": [(256, 256), (253, 131)],
+    "large": [(1024, 1024), (1021, 1023)],
+}
+pythonPixelLimit = 256 * 256 # the reference decoder is far too slow beyond this
+speedupSize = (2048, 2048)
+minimumSpeedup = 50 # NumPy over the reference Python decoder
+simdSize = (1024, 1024)
+simdNames = ["scalar", "sse2", "avx2"]
+
+def syntheticImage(width: int, height: int, seed: int = 0) -> np.ndarray:
+    # bottom up RGBA bytes with smooth gradients, hard edges and noise so every DXT mode gets used
+    rng = np.random.default_rng(seed)
+    y, x = np.mgrid[0:height, 0:width]
+    image = np.empty((height, width, 4), dtype=np.uint8)
+    image[:,:,0] = (x * 255 // max(1, width - 1))
+    image[:,:,1] = (y * 255 // max(1, height - 1))
+    image[:,:,2] = np.where((x // 8 + y // 8) % 2 == 0, 40, 220)
+    image[:,:,3] = np.clip((x + y) * 255 // max(1, width + height - 2) + rng.integers(-24, 25, (height, width)), 0, 255)
+    noise = rng.random((height, width)) < 0.05
+    image[noise,0:3] = rng.integers(0, 256, (int(noise.sum()), 3))
+    return image.ravel()
+
+def encodeImage(image: np.ndarray, width: int, height: int, formatIndex: int) -> bytes:
+    if formatIndex != 5:
+        return PapaFile.encodeTextureData(image, width, height, formatIndex, encoder="numpy")
+    # DXT3 has no encoder, reuse the DXT5 colour blocks and pack the alpha into explicit 4 bit values
+    data = np.frombuffer(PapaFile.encodeTextureData(image, width, height, 6, encoder="numpy"), dtype=np.uint8).reshape(-1, 16).copy()
+    blocksWide = (width + 3) // 4
+    blocksHigh = (height + 3) // 4
+    alpha = image.reshape(height, width, 4)[::-1,:,3] # top down like the file
+    alpha = np.pad(alpha, ((0, blocksHigh * 4 - height), (0, blocksWide * 4 - width)), mode="edge")
+    nibbles = (alpha.reshape(blocksHigh, 4, blocksWide, 4).transpose(0, 2, 1, 3).reshape(-1, 16).astype(np.int32) * 15 + 127) // 255
+    data[:,0:8] = nibbles[:,0::2] | (nibbles[:,1::2] << 4)
+    return data.tobytes()
+
+def expectedPixels(image: np.ndarray, formatIndex: int):
+    # what a lossless format must decode to, None for the DXT formats
+    pixels = image.reshape(-1, 4).copy()
+    if formatIndex == 2:
+        pixels[:,3] = 255
+    elif formatIndex == 13:
+        pixels[:,1:3] = 0
+        pixels[:,3] = 255
+    elif formatIndex not in (1, 3):
+        return None
+    return pixels.ravel()
+
+def decodePaths(pixelFormat: str, includePython: bool) -> list:
+    # (name, decode function) for every path this machine has, the first is the reference
+    paths = []
+    if includePython:
+        paths.append(("python", lambda raw, w, h, f: PapaFile.decodeTextureData(raw, w, h, f, decoder="python", pixelFormat=pixelFormat)))
+    paths.append(("numpy", lambda raw, w, h, f: PapaFile.decodeTextureData(raw, w, h, f, decoder="numpy", pixelFormat=pixelFormat)))
+    library = PapaFile.textureLibrary
+    if library:
+        maxLevel = library.setSimdLevel(2)
+        for level in range(maxLevel + 1):
+            for threads in (1, 0):
+                def decode(raw, w, h, f, level=level, threads=threads):
+                    library.setSimdLevel(level)
+                    PapaFile.textureThreads = threads
+                    return PapaFile.decodeTextureData(raw, w, h, f, decoder="native", pixelFormat=pixelFormat)
+                paths.append(("native " + simdNames[level] + (" mt" if threads != 1 else ""), decode))
+    return paths
+
+def timeDecode(decode, rawData: bytes, width: int, height: int, formatIndex: int, repeat: int):
+    # best of repeat runs, returns (seconds, output)
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        output = decode(rawData, width, height, formatIndex)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best == None else min(best, elapsed)
+    return best, np.asarray(output)
+
+def run(sizes: list, formats: list, repeat: int = 3, tolerance: float = 1e-6, includePython: bool = True) -> bool:
+    PapaFile.requestTextureLibrary(wait=True) # compare against the native decoder even on a first run
+    savedThreads = PapaFile.textureThreads
+    savedLevel = PapaFile.textureLibrary.getSimdLevel() if PapaFile.textureLibrary else None
+    passed = True
+    print("Papa IO: texture decoder " + PapaFile.getTextureDecoder() + ("" if not PapaFile.textureLibraryPath else
+        " (" + PapaFile.textureLibraryPath + ")"))
+    print("%-9s %-10s %-6s %-18s %10s  %s" % ("format", "size", "pixel", "path", "MB/s", "result"))
+    try:
+        for formatIndex in formats:
+            for sizeClass in sizes:
+                for width, height in sizeClasses[sizeClass]:
+                    image = syntheticImage(width, height, formatIndex)
+                    rawData = encodeImage(image, width, height, formatIndex)
+                    for pixelFormat in PapaTexture.pixelFormats:
+                        usePython = includePython and width * height <= pythonPixelLimit
+                        reference = None
+                        for name, decode in decodePaths(pixelFormat, usePython):
+                            seconds, output = timeDecode(decode, rawData, width, height, formatIndex, 1 if name == "python" else repeat)
+                            result = "ok"
+                            if reference is None:
+                                reference = output
+                                result = "reference"
+                                expected = expectedPixels(image, formatIndex)
+                                if expected is not None:
+                                    if pixelFormat == "float":
+                                        expected = expected / 255
+                                    if output.shape != expected.shape or np.abs(output.astype(np.float64) - expected).max() > tolerance:
+                                        result = "FAILED (does not match the source pixels)"
+                            elif output.shape != reference.shape:
+                                result = "FAILED (" + str(output.size) + " values, expected " + str(reference.size) + ")"
+                            else:
+                                difference = np.abs(output.astype(np.float64) - reference.astype(np.float64)).max()
+                                if difference > (tolerance if pixelFormat == "float" else 0):
+                                    result = "FAILED (differs by " + str(difference) + ")"
+                            passed = passed and not result.startswith("FAILED")
+                            megabytes = width * height * 4 * (4 if pixelFormat == "float" else 1) / 1e6
+                            print("%-9s %-10s %-6s %-18s %10.1f  %s" % (PapaTexture.formatMap[formatIndex], str(width) + "x" + str(height),
+                                pixelFormat, name, megabytes / max(seconds, 1e-9), result))
+    finally:
+        PapaFile.textureThreads = savedThreads
+        if savedLevel != None:
+            PapaFile.textureLibrary.setSimdLevel(savedLevel)
+    print("All decoders agree." if passed else "Decoder outputs diverge.")
+    return passed
+
+def checkSpeedup(formats: list, repeat: int = 3, minimum: float = minimumSpeedup) -> bool:
+    # the reference decoder runs once, its time barely varies next to the seconds it takes
+    width, height = speedupSize
+    passed = True
+    print("%-9s %-10s %-6s %12s %12s %9s  %s" % ("format", "size", "pixel", "python (s)", "numpy (s)", "speedup", "result"))
+    for formatIndex in formats:
+        if not formatIndex in (4, 5, 6):
+            continue
+        rawData = encodeImage(syntheticImage(width, height, formatIndex), width, height, formatIndex)
+        for pixelFormat in PapaTexture.pixelFormats:
+            pythonSeconds, _ = timeDecode(lambda raw, w, h, f: PapaFile.decodeTextureData(raw, w, h, f, decoder="python",
+                pixelFormat=pixelFormat), rawData, width, height, formatIndex, 1)
+            numpySeconds, _ = timeDecode(lambda raw, w, h, f: PapaFile.decodeTextureData(raw, w, h, f, decoder="numpy",
+                pixelFormat=pixelFormat), rawData, width, height, formatIndex, repeat)
+            speedup = pythonSeconds / max(numpySeconds, 1e-9)
+            result = "ok" if speedup >= minimum else "FAILED (expected at least " + str(minimum) + "x)"
+            passed = passed and speedup >= minimum
+            print("%-9s %-10s %-6s %12.3f %12.4f %8.1fx  %s" % (PapaTexture.formatMap[formatIndex], str(width) + "x" + str(height),
+                pixelFormat, pythonSeconds, numpySeconds, speedup, result))
+    return passed
+
+def checkSimd(formats: list, repeat: int = 3) -> bool:
+    # the level the library selects by default must beat its scalar path, otherwise it should not be selected
+    PapaFile.requestTextureLibrary(wait=True)
+    library = PapaFile.textureLibrary
+    if not library:
+        print("Papa IO: texture library not available, no SIMD levels to check")
+        return True
+    savedThreads = PapaFile.textureThreads
+    savedLevel = library.getSimdLevel()
+    selected = library.setSimdLevel(-1)
+    if selected == 0:
+        library.setSimdLevel(savedLevel)
+        print("Papa IO: the scalar decoder is selected on this processor, no SIMD level to check")
+        return True
+    width, height = simdSize
+    passed = True
+    print("%-9s %-10s %-6s %12s %12s %9s  %s" % ("format", "size", "pixel", "scalar (ms)", simdNames[selected] + " (ms)", "speedup", "result"))
+    try:
+        PapaFile.textureThreads = 1
+        for formatIndex in formats:
+            if not formatIndex in (4, 5, 6):
+                continue
+            rawData = encodeImage(syntheticImage(width, height, formatIndex), width, height, formatIndex)
+            for pixelFormat in PapaTexture.pixelFormats:
+                seconds = []
+                for level in (0, selected):
+                    def decode(raw, w, h, f, level=level):
+                        library.setSimdLevel(level)
+                        return PapaFile.decodeTextureData(raw, w, h, f, decoder="native", pixelFormat=pixelFormat)
+                    seconds.append(timeDecode(decode, rawData, width, height, formatIndex, repeat)[0])
+                speedup = seconds[0] / max(seconds[1], 1e-9)
+                result = "ok" if speedup > 1 else "FAILED (not faster than scalar)"
+                passed = passed and speedup > 1
+                print("%-9s %-10s %-6s %12.2f %12.2f %8.2fx  %s" % (PapaTexture.formatMap[formatIndex], str(width) + "x" + str(height),
+                    pixelFormat, seconds[0] * 1000, seconds[1] * 1000, speedup, result))
+    finally:
+        PapaFile.textureThreads = savedThreads
+        library.setSimdLevel(savedLevel)
+    return passed
+
+def main(argv = None) -> int:
+    formats = [f for f in PapaTexture.formatMap if f >= 0]
+    parser = argparse.ArgumentParser(description="Texture decoder parity and throughput checks")
+    parser.add_argument("--sizes", nargs="+", choices=list(sizeClasses), default=["tiny", "small", "medium"])
+    parser.add_argument("--formats", nargs="+", type=int, choices=formats, default=formats)
+    parser.add_argument("--repeat", type=int, default=3, help="runs per path, the fastest is reported")
+    parser.add_argument("--tolerance", type=float, default=1e-6, help="largest allowed difference between float outputs")
+    parser.add_argument("--no-python", action="store_true", help="skip the reference Python decoder")
+    parser.add_argument("--speedup", action="store_true", help="check the NumPy decoder against the reference on large DXT textures")
+    parser.add_argument("--simd", action="store_true", help="check the selected SIMD level against the scalar native decoder")
+    args = parser.parse_args(argv)
+    passed = run(args.sizes, args.formats, args.repeat, args.tolerance, not args.no_python)
+    if args.speedup:
+        passed = checkSpeedup(args.formats, args.repeat) and passed
+    if args.simd:
+        passed = checkSimd(args.formats, args.repeat) and passed
+    return 0 if passed else 1
+
+if __name__ == "__main__":
+    sys.exit(main())